@@ -0,0 +1,292 @@
+import asyncio
+import json
+import os
+from contextlib import asynccontextmanager
+from dotenv import load_dotenv
+from fastapi import FastAPI, File, HTTPException, UploadFile, WebSocket, WebSocketDisconnect
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, PlainTextResponse, StreamingResponse
+from fastapi.staticfiles import StaticFiles
+from src.audio_probe import AudioProbeError, probe_audio
+from src.chunked_transcription import shutdown_pools
+from src.dairization import WhisperTranscriber
+from src.jobs import Job, JobManager, QueueFullError
+from src.pipeline import run_pipeline
+from src.result_store import get_result_store
+from src.streaming import StreamingHub, TooManySessionsError, get_streaming_backend
+from src.tracing import stage_metrics
+from src.worker_pool import WorkerPool
+from src.workspace import JobWorkspace
+
+load_dotenv()
+
+huggingface_token = os.getenv("HUGGINGFACEHUB_API_TOKEN")
+groq_api_key = os.getenv("GROQ_API_KEY")
+result_store = get_result_store()
+
+# With PIPELINE_PROCESSES > 0 jobs run in forked worker processes instead of threads.
+PIPELINE_PROCESSES = int(os.getenv("PIPELINE_PROCESSES", "0"))
+preloaded_transcriber = None
+
+
+def preload_models():
+    global preloaded_transcriber
+    preloaded_transcriber = WhisperTranscriber(None, huggingface_token)
+    preloaded_transcriber.preload()
+
+
+# Recordings longer than this many seconds are transcribed in parallel windows.
+LONG_AUDIO_SECONDS = float(os.getenv("LONG_AUDIO_SECONDS", "1800"))
+# Start the window workers, each with its own model, at startup instead of on the first long recording.
+PRELOAD_CHUNK_POOL = os.getenv("PRELOAD_CHUNK_POOL", "0") == "1"
+# Uploads longer than this many seconds are refused; 0 disables the limit.
+MAX_AUDIO_SECONDS = float(os.getenv("MAX_AUDIO_SECONDS", "0"))
+
+
+def run_job(audio_path, progress):
+    return run_pipeline(audio_path, huggingface_token, groq_api_key, progress=progress,
+                        result_store=result_store, long_audio_seconds=LONG_AUDIO_SECONDS)
+
+
+# A job running longer than this many seconds is abandoned; its pool worker is terminated.
+PIPELINE_JOB_TIMEOUT = float(os.getenv("PIPELINE_JOB_TIMEOUT", "7200"))
+
+worker_pool = None
+if PIPELINE_PROCESSES > 0:
+    worker_pool = WorkerPool(
+        run_job,
+        workers=PIPELINE_PROCESSES,
+        max_queue=int(os.getenv("PIPELINE_MAX_QUEUE", "16")),
+        max_jobs_per_worker=int(os.getenv("PIPELINE_MAX_JOBS_PER_WORKER", "50")),
+        preload=preload_models,
+        job_timeout=PIPELINE_JOB_TIMEOUT,
+    )
+
+
+def process_job(job, progress):
+    try:
+        if worker_pool is not None:
+            # The pool fails an overdue job itself; the margin covers a worker that cannot be terminated.
+            future = worker_pool.submit(job.audio_path, progress=progress, log_id=job.id)
+            result = future.result(timeout=PIPELINE_JOB_TIMEOUT + 60)
+        else:
+            result = run_job(job.audio_path, progress)
+        # Observed here, in the API process, so jobs run by pool workers reach /metrics too.
+        stage_metrics.observe(result["timings"])
+        return result
+    finally:
+        job.workspace.cleanup()
+
+
+job_manager = JobManager(
+    process_job,
+    workers=PIPELINE_PROCESSES or int(os.getenv("PIPELINE_WORKERS", "1")),
+    max_queue=int(os.getenv("PIPELINE_MAX_QUEUE", "16")),
+)
+
+streaming_hub = StreamingHub(
+    get_streaming_backend(),
+    max_sessions=int(os.getenv("STREAMING_MAX_SESSIONS", "64")),
+    ring_seconds=float(os.getenv("STREAMING_RING_SECONDS", "30")),
+)
+
+
+@asynccontextmanager
+async def lifespan(app):
+    if worker_pool is not None:
+        # Models are loaded here, before the workers fork, so they share the weights.
+        worker_pool.start()
+    elif PRELOAD_CHUNK_POOL:
+        # Pool workers transcribe inline; only thread-mode jobs use the window pool.
+        await run_in_threadpool(WhisperTranscriber(None, huggingface_token).warm_chunk_pool)
+    await job_manager.start()
+    yield
+    await streaming_hub.stop()
+    await job_manager.stop()
+    if worker_pool is not None:
+        worker_pool.stop()
+    shutdown_pools()
+
+
+app = FastAPI(lifespan=lifespan)
+app.mount("/static", StaticFiles(directory="static"), name="static")
+
+
+def _save_upload(file):
+    workspace = JobWorkspace()
+    suffix = os.path.splitext(file.filename or "")[1] or ".wav"
+    workspace.write_stream(f"upload{suffix}", file.file)
+    audio_path = workspace.path(f"upload{suffix}")
+    try:
+        audio_info = probe_audio(audio_path)
+    except AudioProbeError:
+        # Formats without a header probe (e.g. m4a) are still decoded by ffmpeg later.
+        audio_info = None
+    return workspace, audio_path, audio_info
+
+
+async def _submit(file):
+    workspace, audio_path, audio_info = await run_in_threadpool(_save_upload, file)
+    if MAX_AUDIO_SECONDS and audio_info is not None and audio_info.duration > MAX_AUDIO_SECONDS:
+        workspace.cleanup()
+        raise HTTPException(
+            status_code=413,
+            detail=f"Audio is {audio_info.duration:.0f}s long; the limit is {MAX_AUDIO_SECONDS:.0f}s.",
+        )
+    job = Job(audio_path, job_id=workspace.job_id, workspace=workspace, audio_info=audio_info)
+    try:
+        return job_manager.submit(job)
+    except QueueFullError as e:
+        workspace.cleanup()
+        raise HTTPException(status_code=503, detail=str(e))
+
+
+def _event_stream(job):
+    async def stream():
+        async for message in job_manager.events(job):
+            yield f"data: status: {message}\n\n"
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Job-Id": job.id},
+    )
+
+
+def _get_job(job_id):
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="No such job.")
+    return job
+
+
+@app.get("/")
+async def index():
+    return FileResponse("static/index.html")
+
+
+@app.post("/upload/")
+async def upload(file: UploadFile = File(...)):
+    """Queue a job and return its id; progress is available from GET /transcribe/."""
+    job = await _submit(file)
+    return {"job_id": job.id}
+
+
+@app.post("/transcribe/")
+async def transcribe_upload(file: UploadFile = File(...)):
+    """Queue a job and stream its progress as Server-Sent Events."""
+    job = await _submit(file)
+    return _event_stream(job)
+
+
+@app.get("/transcribe/")
+async def transcribe_events(job_id: str):
+    return _event_stream(_get_job(job_id))
+
+
+@app.get("/health")
+async def health():
+    return {
+        "queued_jobs": sum(1 for job in job_manager.jobs.values() if job.status == "queued"),
+        "running_jobs": sum(1 for job in job_manager.jobs.values() if job.status == "running"),
+        "worker_pool": worker_pool.health() if worker_pool is not None else None,
+    }
+
+
+@app.get("/jobs/{job_id}")
+async def job_status(job_id: str):
+    job = _get_job(job_id)
+    return {
+        "job_id": job.id,
+        "status": job.status,
+        "events": job.events,
+        "error": job.error,
+        "audio": job.audio_info._asdict() if job.audio_info is not None else None,
+        "timings": job.result.get("timings") if job.result is not None else None,
+    }
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Per-stage pipeline histograms in the Prometheus text format."""
+    return PlainTextResponse(stage_metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/transcription/")
+async def transcription(job_id: str):
+    job = _get_job(job_id)
+    if job.result is None:
+        return {"error": job.error or "Transcription is not ready yet."}
+    return {"conversation": job.result["conversation"]}
+
+
+@app.get("/summary/")
+async def summary(job_id: str):
+    job = _get_job(job_id)
+    if job.result is None:
+        return {"error": job.error or "Summary is not ready yet."}
+    return job.result["summary_data"]
+
+
+@app.get("/stats/")
+async def stats(job_id: str):
+    job = _get_job(job_id)
+    if job.result is None:
+        return {"error": job.error or "Stats are not ready yet."}
+    return {
+        "audio_duration": job.result["audio_duration"],
+        "total_words": job.result["total_words"],
+        "words_by_speaker": job.result["words_by_speaker"],
+        "analytics": job.result.get("analytics"),
+    }
+
+
+async def _send_transcripts(websocket, session):
+    while True:
+        event = await session.events.get()
+        if event is None:
+            return
+        await websocket.send_json(event)
+
+
+@app.websocket("/ws/transcribe")
+async def stream_transcription(websocket: WebSocket):
+    """
+    Live captions: the client sends binary frames of 16 kHz mono int16 PCM and
+    receives {"type": "partial" | "final", "text", ...} messages. Sending the
+    text message "stop" flushes the last final and returns the session metrics.
+    """
+    await websocket.accept()
+    try:
+        session = await streaming_hub.open_session()
+    except TooManySessionsError as e:
+        await websocket.close(code=1013, reason=str(e))
+        return
+
+    sender = asyncio.create_task(_send_transcripts(websocket, session))
+    connected = True
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                connected = False
+                break
+            if message.get("bytes"):
+                await session.feed(message["bytes"])
+            elif message.get("text") == "stop":
+                break
+    except WebSocketDisconnect:
+        connected = False
+    finally:
+        summary = await streaming_hub.close_session(session)
+        if connected:
+            await sender
+            await websocket.send_text(json.dumps({"type": "metrics", **summary}))
+            await websocket.close()
+        else:
+            sender.cancel()
+
+
+@app.get("/streaming/sessions")
+async def streaming_sessions():
+    return streaming_hub.stats()
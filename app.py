@@ -1,11 +1,12 @@
 import streamlit as st
-import json
 import os
+import queue
+import threading
 from src.logger import logging
-from src.dairization import WhisperTranscriber
+from src.pipeline import run_pipeline
+from src.result_store import get_result_store
 from dotenv import load_dotenv
-from src.summarization import summarise_transcript
-from src.utils import extract_audio_duration, count_words, display_conversation, extract_speaker_texts
+from src.workspace import JobWorkspace
 import pandas as pd
 
 load_dotenv()
@@ -13,6 +14,32 @@ load_dotenv()
 huggingface_token = os.getenv("HUGGINGFACEHUB_API_TOKEN")
 groq_api_key = os.getenv("GROQ_API_KEY")
 
+def script_thread_progress():
+    """
+    Progress callback for run_pipeline that only writes to the page from the script thread.
+
+    Stage messages may come from the pipeline's diarization thread, which has no
+    ScriptRunContext. They are queued and written on the next message from the
+    script thread, or by the returned flush() once the pipeline is done.
+    """
+    script_thread = threading.current_thread()
+    pending = queue.SimpleQueue()
+
+    def flush():
+        while True:
+            try:
+                message = pending.get_nowait()
+            except queue.Empty:
+                return
+            st.markdown(f"✅ {message}" if message.endswith("!") else message)
+
+    def progress(message):
+        pending.put(message)
+        if threading.current_thread() is script_thread:
+            flush()
+
+    return progress, flush
+
 def show_transcription(conversation):
     st.subheader("Transcription")
     for entry in conversation:
@@ -25,7 +52,7 @@ def show_summary(summary_data):
 
     st.table(summary_df)
 
-def show_stats(audio_duration, total_words, words_by_speaker):
+def show_stats(audio_duration, total_words, words_by_speaker, analytics=None):
     # Creating a DataFrame to compile the statistics
     stat_data = {
         'Audio Duration (m)': [audio_duration],
@@ -36,6 +63,19 @@ def show_stats(audio_duration, total_words, words_by_speaker):
     for speaker, word_count in words_by_speaker.items():
         stat_data[f'Words by {speaker}'] = [word_count]
 
+    # Timing-based analytics from the word-level timestamps
+    if analytics:
+        for speaker, row in analytics['speakers'].items():
+            stat_data[f'Talk Time by {speaker} (m)'] = [round(row['talk_time_s'] / 60, 2)]
+            stat_data[f'Talk Ratio of {speaker}'] = [row['talk_ratio']]
+            stat_data[f'Words per Minute by {speaker}'] = [row['words_per_minute']]
+            stat_data[f'Longest Monologue by {speaker} (s)'] = [row['longest_monologue_s']]
+            stat_data[f'Interruptions by {speaker}'] = [row['interruptions']]
+            stat_data[f'Response Latency of {speaker} (s)'] = [row['mean_response_latency_s']]
+        stat_data['Silence Ratio'] = [analytics['silence_ratio']]
+        stat_data['Overlaps'] = [analytics['overlap_count']]
+        stat_data['Interruptions'] = [analytics['interruption_count']]
+
     stats_df = pd.DataFrame(stat_data)
     stats_df.to_csv("output.csv", index=False)
     st.subheader("Statistics")
@@ -82,64 +122,32 @@ def main(huggingface_token,groq_api_key):
     audio_file = st.file_uploader("Upload an audio file (.wav or .mp3)", type=['wav', 'mp3'])
 
     if audio_file is not None:
-        # Save uploaded audio file
-        with open("uploaded_audio.wav", "wb") as f:
-            f.write(audio_file.getbuffer())
-
-        transcriber = WhisperTranscriber("uploaded_audio.wav", huggingface_token)
-
-        transcriber.start_process()  # Record start time
-        if 'model_loaded' not in st.session_state:
-            with st.spinner("Loading model..."):
-                transcriber.load_model()
-                st.session_state.model_loaded = True  # Track model loading status
-                st.markdown("✅ Model Loaded successfully!")  # Immediate feedback
-
         if 'conversation' not in st.session_state:
-            with st.spinner("Transcribing audio..."):
-                transcriber.transcribe_audio()
-                st.markdown("✅ Transcribing completed!")  # Immediate feedback
-
-            with st.spinner("Aligning transcription..."):
-                transcriber.align_transcription()
-                st.markdown("✅ Alignment completed!")  # Immediate feedback
-
-            with st.spinner("Diarizing audio..."):
-                final_result, uniq_speakers = transcriber.diarize_audio()
-                st.markdown("✅ Diarization completed!")  # Immediate feedback
-
-            # Save results to JSON
-            transcriber.save_to_json(final_result)
-            conversation = display_conversation(filename='data.json', uniq_speakers=uniq_speakers)
-            speaker_texts = extract_speaker_texts(conversation)
-            print(speaker_texts)
-            individual_summary = {}
-            for speaker, speeches in speaker_texts.items():
-                individual_summary[speaker] = summarise_transcript(groq_api_key=groq_api_key, mp3file_path="uploaded_audio.wav", transcript=speeches)
-                
-            print(individual_summary)
-            summary_content = summarise_transcript(groq_api_key=groq_api_key, mp3file_path="uploaded_audio.wav", transcript=conversation)
-            
-            # Create a DataFrame for displaying summaries
-            summary_data = {
-                "Speaker": list(individual_summary.keys()) + ["Total Summary"],
-                "Summary": list(individual_summary.values()) + [summary_content]
-            }
-            print(summary_data)
-            logging.info(f"summary data: {summary_data}")
-            # Gathered data from previous steps
-            audio_duration = extract_audio_duration('uploaded_audio.wav')
-            total_words, words_by_speaker = count_words(conversation)
-            elapsed_time = transcriber.end_process()  # Record end time and calculate elapsed time
-            st.success(f"Audio processing complete in {elapsed_time:.2f} seconds!")
+            # Each upload gets its own scratch directory, so concurrent users never overwrite each other's files
+            workspace = JobWorkspace()
+            try:
+                suffix = os.path.splitext(audio_file.name)[1] or ".wav"
+                audio_path = workspace.write_bytes(f"uploaded_audio{suffix}", audio_file.getbuffer())
+                # The same pipeline as the API: shared models, concurrent diarization, stored results
+                progress, flush_progress = script_thread_progress()
+                with st.spinner("Transcribing, aligning, diarizing and summarising audio..."):
+                    try:
+                        result = run_pipeline(audio_path, huggingface_token, groq_api_key,
+                                              result_store=get_result_store(), progress=progress)
+                    finally:
+                        flush_progress()
+            finally:
+                workspace.cleanup()
+
+            timings = result.pop("timings")
+            st.success(f"Audio processing complete in {timings['total_seconds']:.2f} seconds!")
+            with st.expander("Stage timings"):
+                st.table(pd.DataFrame(timings["stages"]))
+            logging.info("summary data: %s", result["summary_data"], extra={"verbose": True})
 
             # Store results in session state for future use
-            st.session_state.conversation = conversation
-            st.session_state.summary_data = summary_data
-            st.session_state.audio_duration = audio_duration
-            st.session_state.total_words = total_words
-            st.session_state.words_by_speaker = words_by_speaker
-        
+            st.session_state.update(result)
+
         col1, col2 = st.columns(2)
     
         with col1:
@@ -169,7 +177,8 @@ def main(huggingface_token,groq_api_key):
             elif st.session_state.selected_section == "📊Stats":
                 show_stats(st.session_state.audio_duration, 
                            st.session_state.total_words, 
-                           st.session_state.words_by_speaker)
+                           st.session_state.words_by_speaker,
+                           st.session_state.get('analytics'))
 
 if __name__ == "__main__":
     main(huggingface_token,groq_api_key)
\ No newline at end of file
@@ -0,0 +1,189 @@
+"""
+Deterministic stand-ins for the models and services the pipeline calls.
+
+Everything here is seeded, so two runs on the same machine do the same work.
+"""
+import asyncio
+import bisect
+import json
+import sys
+import types
+import numpy as np
+
+SAMPLE_RATE = 16000
+WORDS_PER_SECOND = 2.5
+WORDS_PER_SEGMENT = 12
+VOCABULARY = (
+    "the call today about account billing support order delivery customer issue refund plan team "
+    "price update schedule thanks please number week problem service contract question answer"
+).split()
+
+
+def synthetic_audio(seconds, seed=0):
+    """Speech-like float32 audio: tones with a syllable-rate envelope, plus a little noise."""
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(seconds * SAMPLE_RATE), dtype=np.float32) / SAMPLE_RATE
+    envelope = 0.5 + 0.5 * np.sin(2 * np.pi * 4 * t)
+    audio = 0.3 * envelope * np.sin(2 * np.pi * 220 * t) + 0.01 * rng.standard_normal(t.size).astype(np.float32)
+    return audio.astype(np.float32)
+
+
+def write_wav(path, samples):
+    import wave
+
+    with wave.open(path, "wb") as file:
+        file.setnchannels(1)
+        file.setsampwidth(2)
+        file.setframerate(SAMPLE_RATE)
+        file.writeframes((np.clip(samples, -1, 1) * 32767).astype("<i2").tobytes())
+
+
+def synthetic_result(n_words, n_speakers=2, seed=0):
+    """
+    A diarized whisperx-style result ({"segments", "word_segments"}) with n_words words.
+
+    Speakers change every one to four segments, like a two-party call.
+    """
+    rng = np.random.default_rng(seed)
+    words = rng.integers(0, len(VOCABULARY), n_words)
+    segments, word_segments = [], []
+    speaker, turn_left, clock = 0, 0, 0.0
+    for start in range(0, n_words, WORDS_PER_SEGMENT):
+        if turn_left == 0:
+            speaker = (speaker + 1) % n_speakers
+            turn_left = int(rng.integers(1, 5))
+        turn_left -= 1
+        label = f"SPEAKER_{speaker:02d}"
+        segment_words = []
+        for index in words[start:start + WORDS_PER_SEGMENT]:
+            word = {"word": VOCABULARY[index], "start": round(clock, 3), "end": round(clock + 0.3, 3),
+                    "score": 0.9, "speaker": label}
+            clock += 1 / WORDS_PER_SECOND
+            segment_words.append(word)
+        word_segments.extend(segment_words)
+        segments.append({
+            "start": segment_words[0]["start"],
+            "end": segment_words[-1]["end"],
+            "text": " " + " ".join(word["word"] for word in segment_words) + ".",
+            "words": segment_words,
+            "speaker": label,
+        })
+    return {"segments": segments, "word_segments": word_segments}
+
+
+def speakers_of(result):
+    return list(dict.fromkeys(segment["speaker"] for segment in result["segments"]))
+
+
+# -- whisperx -----------------------------------------------------------------------------
+
+class _Speakers:
+    def __init__(self, labels):
+        self._labels = labels
+
+    def unique(self):
+        return np.array(list(dict.fromkeys(self._labels)))
+
+
+class FakeDiarization:
+    """Speaker turns with the `.speaker.unique()` accessor the pipeline reads."""
+
+    def __init__(self, turns):
+        self.turns = turns  # (start, end, speaker)
+        self.starts = [start for start, _, _ in turns]
+        self.speaker = _Speakers([speaker for _, _, speaker in turns])
+
+
+def window_energy(samples, window):
+    """RMS of each window, computed one window at a time so the fakes stay small in memory."""
+    return [float(np.sqrt(np.dot(part, part) / max(len(part), 1)))
+            for part in (samples[i:i + window] for i in range(0, max(len(samples), 1), window))]
+
+
+class FakeWhisperModel:
+    """Emits WORDS_PER_SECOND words per second of audio after one pass over the samples."""
+
+    def transcribe(self, samples, batch_size=16, **kwargs):
+        # Touch the audio like a real model would, one 30 s window at a time.
+        energy = window_energy(samples, 30 * SAMPLE_RATE)
+        n_words = int(len(samples) / SAMPLE_RATE * WORDS_PER_SECOND)
+        result = synthetic_result(n_words, n_speakers=1)
+        segments = [{"start": s["start"], "end": s["end"], "text": s["text"]} for s in result["segments"]]
+        return {"language": "en", "segments": segments, "energy": energy}
+
+
+def _align(segments, model, metadata, samples, device, return_char_alignments=False):
+    aligned, word_segments = [], []
+    for segment in segments:
+        words = segment["text"].split()
+        step = (segment["end"] - segment["start"]) / max(len(words), 1)
+        timed = [{"word": word, "start": round(segment["start"] + i * step, 3),
+                  "end": round(segment["start"] + (i + 1) * step, 3), "score": 0.9}
+                 for i, word in enumerate(words)]
+        aligned.append({**segment, "words": timed})
+        word_segments.extend(timed)
+    return {"segments": aligned, "word_segments": word_segments}
+
+
+class _FakeDiarizationPipeline:
+    def __init__(self, use_auth_token=None, device="cpu"):
+        pass
+
+    def __call__(self, samples, min_speakers=2, max_speakers=2):
+        # Per-frame energy stands in for speaker embeddings; turns alternate every four seconds.
+        turn_seconds = 4
+        energy = window_energy(samples, SAMPLE_RATE // 2)
+        duration = len(samples) / SAMPLE_RATE
+        turns = [(start, min(start + turn_seconds, duration), f"SPEAKER_{i % max_speakers:02d}")
+                 for i, start in enumerate(range(0, max(len(energy) // 2, 1), turn_seconds))]
+        return FakeDiarization(turns)
+
+
+def _assign_word_speakers(diarization, result):
+    def speaker_at(time):
+        index = max(bisect.bisect_right(diarization.starts, time) - 1, 0)
+        return diarization.turns[index][2]
+
+    for segment in result["segments"]:
+        for word in segment["words"]:
+            word["speaker"] = speaker_at(word["start"])
+        segment["speaker"] = speaker_at(segment["start"])
+    return result
+
+
+def fake_whisperx():
+    """A module with the whisperx functions WhisperTranscriber calls."""
+    module = types.ModuleType("whisperx")
+    module.load_model = lambda *args, **kwargs: FakeWhisperModel()
+    module.load_align_model = lambda language_code, device: ("align-model", {"language": language_code})
+    module.align = _align
+    module.DiarizationPipeline = _FakeDiarizationPipeline
+    module.assign_word_speakers = _assign_word_speakers
+    return module
+
+
+def install_fake_whisperx():
+    sys.modules["whisperx"] = fake_whisperx()
+
+
+# -- LLM ----------------------------------------------------------------------------------
+
+class FakeLLM:
+    """ChatGroq stand-in: waits latency seconds per request and returns a fixed-size summary."""
+
+    def __init__(self, latency=0.002, summary_words=80):
+        self.latency = latency
+        self.summary = "Summary: " + " ".join(VOCABULARY[i % len(VOCABULARY)] for i in range(summary_words))
+        self.requests = 0
+
+    async def ainvoke(self, messages):
+        self.requests += 1
+        # Reading the prompt is the client's only real cost.
+        json.dumps(messages)
+        await asyncio.sleep(self.latency)
+        return types.SimpleNamespace(content=self.summary)
+
+    def invoke(self, messages):
+        self.requests += 1
+        json.dumps(messages)
+        return types.SimpleNamespace(content=self.summary)
@@ -0,0 +1,141 @@
+"""
+Import-time budget for the modules every API process and pipeline worker loads.
+
+Run from the repository root:
+
+    python -m benchmarks.importtime          # check every module against its budget
+    python -m benchmarks.importtime -v       # also list the slowest imports of each module
+
+Each module is imported in a fresh interpreter with `-X importtime`, from an
+empty working directory. A module fails when its cumulative import time
+(median of --repeat runs) is over budget, when importing it loads one of the
+HEAVY_MODULES that must only be imported on first use, or when the import
+leaves files behind or starts threads.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Mounted by api at import, so it is linked into the otherwise empty working directory.
+WORKDIR_LINKS = ("static",)
+
+# Milliseconds of cumulative import time allowed per module. numpy alone is ~80 ms.
+BUDGETS_MS = {
+    "src.logger": 60,
+    "src.utils": 250,
+    "src.summarization": 150,
+    "src.dairization": 250,
+    "src.pipeline": 300,
+    "src.worker_pool": 100,
+    "src.s3_syncer": 100,
+    "src.result_store": 100,
+    "src.streaming": 250,
+    "api": 900,
+}
+
+# Packages that cost hundreds of milliseconds or open connections; import them where they are used.
+HEAVY_MODULES = (
+    "langchain_groq", "langchain_core", "boto3", "pytube", "assemblyai", "deepgram", "whisperx", "torch",
+    "moviepy", "pydub", "sounddevice", "soundfile", "zstandard",
+)
+
+# A plain import statement: importlib.import_module() bypasses the timing done by -X importtime.
+_PROBE = """
+import {module}
+import json, os, sys, threading
+print(json.dumps({{
+    "modules": sorted(name for name in sys.modules if name.split(".")[0] in {heavy!r}),
+    "threads": [thread.name for thread in threading.enumerate() if thread is not threading.main_thread()],
+    "files": sorted(os.listdir(".")),
+}}))
+"""
+
+
+def parse_importtime(stderr):
+    """(self_us, cumulative_us, depth, name) for every line -X importtime wrote."""
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        entries.append((int(self_us), int(cumulative_us), depth, name.strip()))
+    return entries
+
+
+def profile(module, workdir):
+    env = dict(os.environ, PYTHONPATH=ROOT + os.pathsep + os.environ.get("PYTHONPATH", ""))
+    probe = _PROBE.format(module=module, heavy=HEAVY_MODULES)
+    completed = subprocess.run([sys.executable, "-X", "importtime", "-c", probe], cwd=workdir, env=env,
+                               capture_output=True, text=True)
+    if completed.returncode != 0:
+        error = completed.stderr.strip().splitlines()[-1] if completed.stderr.strip() else "unknown error"
+        return None, None, error
+    entries = parse_importtime(completed.stderr)
+    # The module's own line comes last among the top-level entries it caused.
+    total_us = next(cumulative for _, cumulative, depth, name in reversed(entries)
+                    if depth <= 1 and name == module)
+    return total_us, entries, json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def check(module, budget_ms, repeat, verbose):
+    totals, entries, state = [], None, None
+    for _ in range(repeat):
+        # A fresh, empty directory each time, so files created on import are noticed.
+        with tempfile.TemporaryDirectory(prefix="importtime-") as workdir:
+            for name in WORKDIR_LINKS:
+                os.symlink(os.path.join(ROOT, name), os.path.join(workdir, name))
+            total_us, entries, state = profile(module, workdir)
+        if total_us is None:
+            return [f"import failed: {state}"], None
+        totals.append(total_us / 1000)
+
+    median_ms = statistics.median(totals)
+    problems = []
+    if median_ms > budget_ms:
+        problems.append(f"{median_ms:.0f} ms is over the {budget_ms:.0f} ms budget")
+    if state["modules"]:
+        problems.append(f"imports {', '.join(sorted({name.split('.')[0] for name in state['modules']}))} eagerly")
+    created = [name for name in state["files"] if name not in WORKDIR_LINKS]
+    if created:
+        problems.append(f"creates {', '.join(created)} on import")
+    if state["threads"]:
+        problems.append(f"starts threads {', '.join(state['threads'])} on import")
+
+    if verbose or problems:
+        slowest = sorted(entries, reverse=True)[:5]
+        for self_us, cumulative_us, _, name in slowest:
+            print(f"    {name:<40} self {self_us / 1000:7.1f} ms  cumulative {cumulative_us / 1000:7.1f} ms")
+    return problems, median_ms
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("modules", nargs="*", help="Modules to check; defaults to every module with a budget")
+    parser.add_argument("--repeat", type=int, default=3, help="Fresh interpreters per module")
+    parser.add_argument("--budget-scale", type=float, default=1.0, help="Multiply every budget, e.g. on slow CI hosts")
+    parser.add_argument("-v", "--verbose", action="store_true", help="List the slowest imports of every module")
+    args = parser.parse_args(argv)
+
+    failed = []
+    for module in args.modules or BUDGETS_MS:
+        budget_ms = BUDGETS_MS.get(module, min(BUDGETS_MS.values())) * args.budget_scale
+        problems, median_ms = check(module, budget_ms, args.repeat, args.verbose)
+        timing = f"{median_ms:7.0f} ms" if median_ms is not None else f"{'-':>10}"
+        print(f"{module:<20} {timing}  budget {budget_ms:5.0f} ms  {'; '.join(problems) or 'ok'}")
+        if problems:
+            failed.append(module)
+
+    if failed:
+        print(f"{len(failed)} module(s) failed: {', '.join(failed)}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
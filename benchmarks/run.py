@@ -0,0 +1,331 @@
+"""
+Offline benchmarks for the transcription pipeline and its text utilities.
+
+Run from the repository root:
+
+    python -m benchmarks.run                 # compare against benchmarks/baseline.json
+    python -m benchmarks.run --update        # record a new baseline
+    python -m benchmarks.run -k count_words --max-words 10000
+
+whisperx and the LLM are replaced by the deterministic fakes in
+benchmarks/fakes.py, so the numbers measure this repository's code (data
+handling, concurrency, serialisation) and not model inference. Each case is
+timed `repeat` times after one warm-up run; its peak memory is measured with
+tracemalloc in a separate run so tracing does not distort the timings.
+
+The exit status is 1 when a case is slower or uses more memory than its
+baseline by more than the tolerances stored in the baseline file.
+"""
+import os
+
+# Benchmarks would otherwise write every pipeline log line to logs/.
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+import argparse
+import json
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import namedtuple
+from benchmarks import fakes
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_PATH = os.path.join(ROOT, "benchmarks", "baseline.json")
+DATA_JSON = os.path.join(ROOT, "data.json")
+
+# Transcript sizes for the text utilities; None is the recorded 29-segment data.json call.
+TEXT_SIZES = (("data.json", None), ("1k", 1000), ("10k", 10000), ("100k", 100000))
+# Audio lengths for the WhisperTranscriber stages.
+AUDIO_SIZES = (("1min", 60), ("10min", 600), ("30min", 1800))
+
+# A case regresses when it is this much slower (or larger) than the baseline...
+TIME_TOLERANCE = 0.5
+MEMORY_TOLERANCE = 0.25
+# ...and the difference is above these floors, which absorb timer and allocator noise.
+MIN_TIME_DELTA = 0.005
+MIN_MEMORY_DELTA = 1024 * 1024
+
+Case = namedtuple("Case", ["name", "words", "setup"])
+
+
+class Skip(Exception):
+    pass
+
+
+def _transcript(size, words):
+    if words is None:
+        with open(DATA_JSON) as file:
+            return json.load(file)
+    return fakes.synthetic_result(words)
+
+
+def _conversation(size, words):
+    from src.utils import build_conversation
+
+    result = _transcript(size, words)
+    return result, build_conversation(uniq_speakers=fakes.speakers_of(result), result=result)
+
+
+# -- cases --------------------------------------------------------------------------------
+# Each setup prepares its inputs untimed and returns the zero-argument callable to time.
+
+def _display_conversation(size, words, workdir):
+    from src.utils import display_conversation
+
+    result = _transcript(size, words)
+    path = os.path.join(workdir, f"display-{size}.json")
+    with open(path, "w") as file:
+        json.dump(result, file)
+    return lambda: display_conversation(path, fakes.speakers_of(result))
+
+
+def _count_words(size, words, workdir):
+    from src.utils import count_words
+
+    _, conversation = _conversation(size, words)
+    return lambda: count_words(conversation)
+
+
+def _extract_speaker_texts(size, words, workdir):
+    from src.utils import extract_speaker_texts
+
+    _, conversation = _conversation(size, words)
+    return lambda: extract_speaker_texts(conversation)
+
+
+def _save_transcription(size, words, workdir):
+    from src.utils import save_transcription
+
+    _, conversation = _conversation(size, words)
+    return lambda: save_transcription(conversation, os.path.join(workdir, f"transcriptions-{size}"))
+
+
+def _save_to_json(size, words, workdir):
+    from src.dairization import WhisperTranscriber
+
+    result = _transcript(size, words)
+    transcriber = WhisperTranscriber(None, None)
+    return lambda: transcriber.save_to_json(result, os.path.join(workdir, f"data-{size}.json"))
+
+
+def _save_columnar(size, words, workdir):
+    from src.dairization import WhisperTranscriber
+
+    result = _transcript(size, words)
+    transcriber = WhisperTranscriber(None, None)
+    return lambda: transcriber.save_columnar(result, os.path.join(workdir, f"data-{size}.ctr"))
+
+
+def _summarise(size, words, workdir):
+    from src import summarization
+
+    _, conversation = _conversation(size, words)
+    llm = fakes.FakeLLM()
+    summarization.get_llm = lambda *args, **kwargs: llm
+    speaker_texts, lines = conversation.speaker_texts(), conversation.to_lines()
+    return lambda: summarization.summarise_conversation(None, speaker_texts, lines, use_cache=False)
+
+
+TEXT_CASES = (
+    ("utils.display_conversation", _display_conversation),
+    ("utils.count_words", _count_words),
+    ("utils.extract_speaker_texts", _extract_speaker_texts),
+    ("utils.save_transcription", _save_transcription),
+    ("transcriber.save_to_json", _save_to_json),
+    ("transcriber.save_columnar", _save_columnar),
+    ("summarization.fan_out", _summarise),
+)
+
+
+def _load_model(workdir):
+    from src.dairization import WhisperTranscriber
+    from src.model_registry import ModelRegistry
+
+    fakes.install_fake_whisperx()
+
+    def load():
+        # A fresh registry each time, so the load is not served from the cache.
+        transcriber = WhisperTranscriber(None, None, registry=ModelRegistry())
+        transcriber.load_model()
+        transcriber.release_models()
+    return load
+
+
+def _stage(seconds, workdir, stage):
+    from src.audio_buffer import AudioBuffer
+    from src.dairization import WhisperTranscriber
+    from src.model_registry import ModelRegistry
+
+    if stage == "decode":
+        if shutil.which("ffmpeg") is None:
+            raise Skip("ffmpeg is not installed")
+        path = os.path.join(workdir, f"audio-{seconds}.wav")
+        fakes.write_wav(path, fakes.synthetic_audio(seconds))
+        return lambda: AudioBuffer.from_file(path, tmp_dir=workdir).close()
+
+    fakes.install_fake_whisperx()
+    transcriber = WhisperTranscriber(None, None, registry=ModelRegistry(),
+                                     audio_buffer=AudioBuffer(fakes.synthetic_audio(seconds)))
+    transcriber.load_model()
+    if stage == "run_concurrent":
+        return transcriber.run_concurrent
+    if stage == "transcribe":
+        return transcriber.transcribe_audio
+    transcriber.transcribe_audio()
+    if stage == "align":
+        return transcriber.align_transcription
+    if stage == "diarize":
+        return transcriber.run_diarization
+    transcriber.align_transcription()
+    transcriber.run_diarization()
+    return transcriber.assign_speakers
+
+
+STAGES = ("decode", "transcribe", "align", "diarize", "assign_speakers", "run_concurrent")
+
+
+def all_cases(workdir):
+    cases = [Case("transcriber.load_model", None, lambda: _load_model(workdir))]
+    for size, words in TEXT_SIZES:
+        for name, setup in TEXT_CASES:
+            cases.append(Case(f"{name}[{size}]", words,
+                              lambda setup=setup, size=size, words=words: setup(size, words, workdir)))
+    for size, seconds in AUDIO_SIZES:
+        for stage in STAGES:
+            cases.append(Case(f"transcriber.{stage}[{size}]", int(seconds * fakes.WORDS_PER_SECOND),
+                              lambda seconds=seconds, stage=stage: _stage(seconds, workdir, stage)))
+    return cases
+
+
+# -- measurement --------------------------------------------------------------------------
+
+def measure(fn, repeat):
+    fn()
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        fn()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return {
+        "seconds": statistics.median(timings),
+        "min_seconds": min(timings),
+        "peak_bytes": peak,
+        "repeat": repeat,
+    }
+
+
+def compare(result, baseline, time_tolerance, memory_tolerance):
+    """Reasons the result regressed against its baseline entry (empty when it did not)."""
+    reasons = []
+    slower = result["seconds"] - baseline["seconds"]
+    if slower > MIN_TIME_DELTA and result["seconds"] > baseline["seconds"] * (1 + time_tolerance):
+        reasons.append(f"time {baseline['seconds'] * 1000:.1f} -> {result['seconds'] * 1000:.1f} ms")
+    larger = result["peak_bytes"] - baseline["peak_bytes"]
+    if larger > MIN_MEMORY_DELTA and result["peak_bytes"] > baseline["peak_bytes"] * (1 + memory_tolerance):
+        reasons.append(f"peak {baseline['peak_bytes'] / 2 ** 20:.1f} -> {result['peak_bytes'] / 2 ** 20:.1f} MiB")
+    return reasons
+
+
+def environment():
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def load_baseline(path):
+    if not os.path.exists(path):
+        return None
+    with open(path) as file:
+        return json.load(file)
+
+
+def run(cases, repeat, baseline, time_tolerance, memory_tolerance):
+    results, regressions = {}, []
+    expected = baseline["results"] if baseline else {}
+    print(f"{'case':<44} {'median ms':>10} {'peak MiB':>9}  status")
+    for case in cases:
+        try:
+            fn = case.setup()
+        except (Skip, ImportError) as e:
+            print(f"{case.name:<44} {'':>10} {'':>9}  skipped: {e}")
+            continue
+        result = measure(fn, repeat)
+        results[case.name] = result
+
+        status = "new"
+        if case.name in expected:
+            reasons = compare(result, expected[case.name], time_tolerance, memory_tolerance)
+            ratio = result["seconds"] / expected[case.name]["seconds"] if expected[case.name]["seconds"] else 1.0
+            status = f"REGRESSED ({'; '.join(reasons)})" if reasons else f"ok x{ratio:.2f}"
+            if reasons:
+                regressions.append(case.name)
+        print(f"{case.name:<44} {result['seconds'] * 1000:>10.2f} {result['peak_bytes'] / 2 ** 20:>9.2f}  {status}")
+    return results, regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="Baseline JSON to compare against or update")
+    parser.add_argument("--update", action="store_true", help="Write the results as the new baseline")
+    parser.add_argument("-k", "--filter", default=None, help="Only run cases whose name contains this text")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed runs per case")
+    parser.add_argument("--max-words", type=int, default=None, help="Skip inputs longer than this many words")
+    parser.add_argument("--output", default=None, help="Also write the results to this JSON file")
+    parser.add_argument("--time-tolerance", type=float, default=None)
+    parser.add_argument("--memory-tolerance", type=float, default=None)
+    args = parser.parse_args(argv)
+
+    baseline = load_baseline(args.baseline)
+    tolerance = (baseline or {}).get("tolerance", {})
+    time_tolerance = args.time_tolerance if args.time_tolerance is not None else tolerance.get("time", TIME_TOLERANCE)
+    memory_tolerance = (args.memory_tolerance if args.memory_tolerance is not None
+                        else tolerance.get("memory", MEMORY_TOLERANCE))
+    if baseline and baseline.get("environment", {}).get("machine") != environment()["machine"]:
+        print("Warning: the baseline was recorded on a different machine type.", file=sys.stderr)
+
+    with tempfile.TemporaryDirectory(prefix="benchmarks-") as workdir:
+        cases = [case for case in all_cases(workdir)
+                 if (args.filter is None or args.filter in case.name)
+                 and (args.max_words is None or case.words is None or case.words <= args.max_words)]
+        results, regressions = run(cases, args.repeat, None if args.update else baseline,
+                                   time_tolerance, memory_tolerance)
+
+    report = {
+        "environment": environment(),
+        "tolerance": {"time": time_tolerance, "memory": memory_tolerance},
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(report, file, indent=2, sort_keys=True)
+    if args.update:
+        if baseline is not None and (args.filter or args.max_words):
+            # A partial run only replaces the cases it measured.
+            report["results"] = {**baseline["results"], **results}
+        with open(args.baseline, "w") as file:
+            json.dump(report, file, indent=2, sort_keys=True)
+        print(f"Baseline written to {args.baseline}.")
+        return 0
+
+    if regressions:
+        print(f"{len(regressions)} case(s) regressed: {', '.join(regressions)}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
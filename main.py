@@ -1,37 +1,60 @@
 import streamlit as st
-import numpy as np
-import sounddevice as sd
-from scipy.io import wavfile
 import os
+import atexit
+import functools
 from dotenv import load_dotenv
-from src.summarization import summarise_transcript
-from deepgram import DeepgramClient, PrerecordedOptions
+from src.summarization import summarise_conversation
 from src.utils import count_words
-import io
-from datetime import datetime
+from src.logger import logging
+from src.archive import TranscriptArchive
+from src.workspace import JobWorkspace
+from src.recorder import SegmentRecorder
 from src.s3_syncer import S3Sync
 import time
-import re
+import uuid
 import pandas as pd
 
 # Load environment variables
 load_dotenv()
 
-# Initialize the Deepgram client
 DEEPGRAM_API_KEY = os.getenv("DEEPGRAM_API_KEY")
 GROQ_API = os.getenv("GROQ_API_KEY")
 AWS_ACCESS_KEY_ID = os.getenv("AWS_ACCESS_KEY_ID")
 AWS_SECRET_ACCESS_KEY = os.getenv("AWS_SECRET_ACCESS_KEY")
 AWS_REGION = os.getenv("AWS_REGION")
-deepgram = DeepgramClient(DEEPGRAM_API_KEY)
 TRAINING_BUCKET_NAME = "focus-transcribe"
-timestamp = datetime.now()
-timestamp = timestamp.strftime("%m_%d_%y_%H_%M_%S")
+# S3Sync builds its boto3 client on the first upload
 s3_sync = S3Sync(AWS_ACCESS_KEY_ID,AWS_SECRET_ACCESS_KEY,AWS_REGION)
 
+
+@st.cache_resource
+def get_deepgram():
+    """The Deepgram client, created on the first transcription and shared by every session."""
+    from deepgram import DeepgramClient
+    return DeepgramClient(DEEPGRAM_API_KEY)
+
+
+ARCHIVE_PREFIX = "transcription"
+
+
+@st.cache_resource
+def get_archive():
+    """One archive per server process, shared by every browser session."""
+    archive = TranscriptArchive(
+        os.getenv("ARCHIVE_DIR", "archive"),
+        uploader=lambda path, key, metadata: s3_sync.upload_object(
+            path, TRAINING_BUCKET_NAME, key, metadata=metadata, content_type="application/x-ndjson"),
+        prefix=ARCHIVE_PREFIX,
+    )
+    atexit.register(archive.close)
+    return archive
+
+
+# Seal the open bundle once it is older than the time limit, even if no new session arrives
+get_archive().roll()
+
 # Audio recording parameters
 SAMPLE_RATE = 16000  # 16 kHz sample rate for better compatibility
-CHANNELS = 1  # Mono channel
 
 # Store speaker-specific recordings and transcriptions
 if 'speakers_data' not in st.session_state:
@@ -40,44 +63,40 @@ if 'selected_speaker' not in st.session_state:
     st.session_state.selected_speaker = None
 if 'conversation' not in st.session_state:
     st.session_state.conversation = []
-
-def transcribe_audio(audio_data):
-    byte_io = io.BytesIO()
-    wavfile.write(byte_io, SAMPLE_RATE, audio_data)
-    audio_bytes = byte_io.getvalue()
-
-    source = {"buffer": audio_bytes, "mimetype": "audio/wav"}
+if 'session_id' not in st.session_state:
+    st.session_state.session_id = uuid.uuid4().hex
+if 'recorder' not in st.session_state:
+    st.session_state.recorder = None
+if 'recording_speaker' not in st.session_state:
+    # Speaker the running recorder belongs to; the selection may change while it records
+    st.session_state.recording_speaker = None
+if 'recordings_workspace' not in st.session_state:
+    # Segment files of every recording in this browser session
+    st.session_state.recordings_workspace = JobWorkspace()
+
+def transcribe_audio(segment, deepgram):
+    from deepgram import PrerecordedOptions
+
+    with open(segment.path, 'rb') as audio_file:
+        source = {"buffer": audio_file.read(), "mimetype": "audio/flac"}
     options = PrerecordedOptions(model="nova", language="en-US")
 
     response = deepgram.listen.prerecorded.v("1").transcribe_file(source, options)
     return response.results.channels[0].alternatives[0].transcript
 
-def save_transcription(conversation):
-    directory = 'transcriptions'
-    if not os.path.exists(directory):
-        os.makedirs(directory)
-
-    full_transcription_file = os.path.join(directory, 'transcription_with_speakers.txt')
-    no_speakers_file = os.path.join(directory, 'transcription_with_no_speakers.txt')
-
-    # Empty the existing files if present
-    open(full_transcription_file, 'w').close()
-    open(no_speakers_file, 'w').close()
-
-    with open(full_transcription_file, 'a') as file_full:
-        with open(no_speakers_file, 'a') as file_no_speakers:
-            for entry in conversation:
-                # Remove HTML tags for full transcription
-                entry_no_tags = re.sub(r'<.*?>', '', entry)
-                file_full.write(entry_no_tags + '\n')
-                
-                # Remove speaker name for no speakers transcription
-                entry_without_speaker = entry_no_tags.split(': ', 1)[-1]
-                file_no_speakers.write(entry_without_speaker + ' ')
-    
-    return directory
-
-
+def stop_recording():
+    """Stop the running recorder and keep its segments under the speaker who started it."""
+    recorder, speaker = st.session_state.recorder, st.session_state.recording_speaker
+    recorder.stop()
+    previous = st.session_state.speakers_data[speaker]['recorder']
+    if previous is not None:
+        # A new take replaces the speaker's last one: free its segment threads and files
+        previous.cleanup()
+    st.session_state.speakers_data[speaker]['duration'] = recorder.duration
+    st.session_state.speakers_data[speaker]['recorder'] = recorder
+    st.session_state.recorder = None
+    st.session_state.recording_speaker = None
+    return speaker
 
 def extract_speaker_texts(conversation):
     speaker_texts = {}
@@ -95,7 +114,7 @@ if 'num_speakers' not in st.session_state:
     if st.button("Create Speaker Buttons"):
         for i in range(num_speakers):
             speaker_name = f"Speaker{i+1}"
-            st.session_state.speakers_data[speaker_name] = {"audio_data": None, "transcript": None, "duration": None}
+            st.session_state.speakers_data[speaker_name] = {"recorder": None, "transcript": None, "duration": None}
 else:
     num_speakers = len(st.session_state.speakers_data)
 
@@ -109,22 +128,31 @@ if st.session_state.selected_speaker:
     
     with col1:
         if st.button("Start Recording"):
-            st.session_state.start_time = time.time()  # Store the start time
-            st.session_state.recording = sd.rec(int(60 * SAMPLE_RATE), samplerate=SAMPLE_RATE, channels=CHANNELS, dtype='int16')
+            if st.session_state.recorder is not None:
+                st.info(f"{stop_recording()} stopped recording.")
+            # Segments are spilled to compressed files and transcribed while recording goes on
+            recorder = SegmentRecorder(
+                os.path.join(st.session_state.recordings_workspace.directory, st.session_state.selected_speaker, str(int(time.time() * 1000))),
+                sample_rate=SAMPLE_RATE,
+                # The client is fetched here, in the script thread; segments are transcribed in worker threads
+                on_segment=functools.partial(transcribe_audio, deepgram=get_deepgram()),
+            )
+            recorder.start()
+            st.session_state.recorder = recorder
+            st.session_state.recording_speaker = st.session_state.selected_speaker
             st.success(f"{st.session_state.selected_speaker} started recording.")
     
     with col2:
         if st.button("Stop Recording"):
-            sd.stop()
-            st.session_state.speakers_data[st.session_state.selected_speaker]['duration'] = time.time() - st.session_state.start_time  # Calculate duration
-            st.session_state.speakers_data[st.session_state.selected_speaker]['audio_data'] = st.session_state.recording[:int(SAMPLE_RATE * st.session_state.speakers_data[st.session_state.selected_speaker]['duration'])].flatten()
-            st.success(f"{st.session_state.selected_speaker} stopped recording.")
+            if st.session_state.recorder is not None:
+                st.success(f"{stop_recording()} stopped recording.")
     
     if st.button("Transcribe"):
-        audio_data = st.session_state.speakers_data[st.session_state.selected_speaker]['audio_data']
-        if audio_data is not None:
+        recorder = st.session_state.speakers_data[st.session_state.selected_speaker]['recorder']
+        if recorder is not None:
             with st.spinner("Transcribing..."):
-                transcript = transcribe_audio(audio_data)
+                # Most segments were already transcribed while recording
+                transcript = ' '.join(text for text in recorder.results() if text)
                 st.session_state.speakers_data[st.session_state.selected_speaker]['transcript'] = transcript
                 st.session_state.conversation.append(f"{st.session_state.selected_speaker}: {transcript}")
                 st.subheader(f"Transcription for {st.session_state.selected_speaker}:")
@@ -140,12 +168,14 @@ if st.button("Show All Transcriptions"):
 # Save transcriptions
 if st.button("Save Transcriptions"):
     if st.session_state.conversation:
-    
-        save_dir = save_transcription(st.session_state.conversation)
-        aws_bucket_url = f"s3://{TRAINING_BUCKET_NAME}/transcription/{timestamp}"
-        s3_sync.sync_folder_to_s3(folder = save_dir,aws_bucket_name=TRAINING_BUCKET_NAME)
-        print("Succesfully transcriptions are saved to s3 bucket")
-        st.success(f"Transcriptions saved in {save_dir}")
+        # Sessions are appended to a compressed bundle that is uploaded once it fills up
+        bundle_name, entry = get_archive().append({
+            "conversation": st.session_state.conversation,
+            "speakers": {speaker: data['duration'] for speaker, data in st.session_state.speakers_data.items()},
+        }, session_id=st.session_state.session_id)
+        logging.info(f"Session {entry['session_id']} archived in {bundle_name}.")
+        # The upload happens when the bundle is sealed, so the session is only queued at this point
+        st.success(f"Transcriptions saved and queued for upload to s3://{TRAINING_BUCKET_NAME}/{ARCHIVE_PREFIX}")
     else:
         st.warning("No transcriptions to save.")
 
@@ -153,15 +183,12 @@ if st.button("Save Transcriptions"):
 if st.button("Generate Summary"):
     if st.session_state.conversation:
         speaker_texts = extract_speaker_texts(st.session_state.conversation)
-        individual_summary = {}
-        for speaker, speeches in speaker_texts.items():
-            individual_summary[speaker] = summarise_transcript(groq_api_key=GROQ_API, transcript=speeches)
-        
-        summary_content = summarise_transcript(groq_api_key=GROQ_API,  transcript=' '.join(st.session_state.conversation))
+        summaries = summarise_conversation(groq_api_key=GROQ_API, speaker_texts=speaker_texts,
+                                           conversation=' '.join(st.session_state.conversation))
         
         summary_data = {
-            "Speaker": list(individual_summary.keys()) + ["Total Summary"],
-            "Summary": list(individual_summary.values()) + [summary_content]
+            "Speaker": list(summaries.keys()),
+            "Summary": list(summaries.values())
         }
         
         st.subheader("Summaries")
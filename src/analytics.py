@@ -0,0 +1,113 @@
+import numpy as np
+from src.logger import logging
+
+
+def word_arrays(word_segments):
+    """
+    Columnar start, end and speaker-code arrays for the timed words, sorted by start.
+
+    Words without timestamps (e.g. numbers whisperx could not align) are left out
+    of the arrays but still counted in word_counts, so counts agree with
+    count_words. Words without a speaker get code -1.
+
+    :return: (start, end, codes, speakers, word_counts) where speakers[code] is the raw
+        speaker id and word_counts[code] counts all of that speaker's words
+    """
+    n = len(word_segments)
+    start = np.fromiter((w.get("start", np.nan) for w in word_segments), dtype=np.float64, count=n)
+    end = np.fromiter((w.get("end", np.nan) for w in word_segments), dtype=np.float64, count=n)
+    index = {None: -1}
+    codes = np.fromiter(
+        (index.setdefault(w.get("speaker"), len(index) - 1) for w in word_segments), dtype=np.int64, count=n
+    )
+    speakers = [speaker for speaker in index if speaker is not None]
+    word_counts = np.bincount(codes[codes >= 0], minlength=len(speakers))
+
+    timed = ~(np.isnan(start) | np.isnan(end))
+    start, end, codes = start[timed], end[timed], codes[timed]
+    order = np.argsort(start, kind="stable")
+    start, end, codes = start[order], end[order], codes[order]
+    return start, end, codes, speakers, word_counts
+
+
+def conversation_analytics(word_segments, audio_duration=None, speaker_labels=None, interruption_threshold=0.3):
+    """
+    Per-speaker and whole-call analytics from word-level timings, in vectorized passes.
+
+    Word counts include words without timestamps; talk time, rates and turns
+    use the timed words only.
+
+    :param word_segments: whisperx word dicts with start, end and speaker
+    :param audio_duration: Call length in seconds; defaults to the end of the last word
+    :param speaker_labels: Optional mapping of raw speaker id to display name
+    :param interruption_threshold: Seconds of overlap before a turn change counts as an interruption
+    :return: Dict with a "speakers" table plus call-level silence ratio, overlaps and interruptions
+    """
+    start, end, codes, speakers, word_counts = word_arrays(word_segments)
+    labels = [(speaker_labels or {}).get(s, s) for s in speakers]
+    n_speakers = len(speakers)
+    if len(start) == 0:
+        table = {label: {"talk_time_s": 0.0, "talk_ratio": 0.0, "words": int(word_counts[code]),
+                         "words_per_minute": 0.0, "longest_monologue_s": 0.0, "interruptions": 0,
+                         "mean_response_latency_s": None}
+                 for code, label in enumerate(labels)}
+        return {"speakers": table, "turns": 0, "silence_ratio": 1.0, "overlap_count": 0, "interruption_count": 0}
+
+    total = float(audio_duration) if audio_duration else float(end.max())
+    assigned = codes >= 0
+    duration = end - start
+
+    timed_words = np.bincount(codes[assigned], minlength=n_speakers)
+    talk_time = np.bincount(codes[assigned], weights=duration[assigned], minlength=n_speakers)
+    total_talk = talk_time.sum()
+
+    # Speech time is the union of word intervals: gaps are starts past the running max end.
+    running_end = np.maximum.accumulate(end)
+    gaps = np.clip(start[1:] - running_end[:-1], 0, None)
+    speech_time = (running_end[-1] - start[0]) - gaps.sum()
+    silence_ratio = max(0.0, 1.0 - speech_time / total) if total > 0 else 0.0
+
+    # Turns are runs of consecutive words by the same assigned speaker.
+    s_start, s_end, s_codes = start[assigned], end[assigned], codes[assigned]
+    boundaries = np.flatnonzero(s_codes[1:] != s_codes[:-1]) + 1
+    turn_index = np.concatenate(([0], boundaries)) if len(s_codes) else np.zeros(0, dtype=np.int64)
+    turn_speaker = s_codes[turn_index]
+    turn_start = s_start[turn_index]
+    turn_end = np.maximum.reduceat(s_end, turn_index) if len(s_codes) else np.zeros(0)
+    turn_length = turn_end - turn_start
+
+    longest = np.zeros(n_speakers)
+    np.maximum.at(longest, turn_speaker, turn_length)
+
+    # At each speaker change: negative gap is an overlap, positive gap is response latency.
+    change_gap = turn_start[1:] - turn_end[:-1]
+    incoming = turn_speaker[1:]
+    overlaps = change_gap < 0
+    interruptions = change_gap < -interruption_threshold
+    interruption_count = np.bincount(incoming[interruptions], minlength=n_speakers)
+    responses = ~overlaps
+    latency_sum = np.bincount(incoming[responses], weights=change_gap[responses], minlength=n_speakers)
+    latency_n = np.bincount(incoming[responses], minlength=n_speakers)
+
+    table = {}
+    for code, label in enumerate(labels):
+        minutes = talk_time[code] / 60
+        table[label] = {
+            "talk_time_s": round(float(talk_time[code]), 2),
+            "talk_ratio": round(float(talk_time[code] / total_talk), 3) if total_talk else 0.0,
+            "words": int(word_counts[code]),
+            "words_per_minute": round(float(timed_words[code] / minutes), 1) if minutes else 0.0,
+            "longest_monologue_s": round(float(longest[code]), 2),
+            "interruptions": int(interruption_count[code]),
+            "mean_response_latency_s": round(float(latency_sum[code] / latency_n[code]), 2) if latency_n[code] else None,
+        }
+
+    analytics = {
+        "speakers": table,
+        "turns": int(len(turn_index)),
+        "silence_ratio": round(float(silence_ratio), 3),
+        "overlap_count": int(overlaps.sum()),
+        "interruption_count": int(interruptions.sum()),
+    }
+    logging.info("Conversation analytics computed for %d words.", len(start))
+    return analytics
@@ -0,0 +1,354 @@
+import gzip
+import io
+import json
+import os
+import socket
+import threading
+import time
+import uuid
+import zlib
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import datetime, timezone
+from src.logger import logging
+
+# Bundles are sealed and uploaded once either limit is reached.
+MAX_BUNDLE_BYTES = 64 * 1024 * 1024
+MAX_BUNDLE_SECONDS = 3600
+INDEX_TYPE = "index"
+BUNDLE_EXTENSIONS = {".jsonl.zst": "zstd", ".jsonl.gz": "gzip"}
+# Paths of the bundles open in this process, which startup recovery must leave alone.
+_open_bundles = set()
+
+
+def _zstd():
+    try:
+        import zstandard
+    except ImportError:
+        return None
+    return zstandard
+
+
+def default_codec():
+    return "zstd" if _zstd() is not None else "gzip"
+
+
+def compress(data, codec):
+    if codec == "zstd":
+        return _zstd().ZstdCompressor(level=6).compress(data)
+    return gzip.compress(data, compresslevel=6, mtime=0)
+
+
+def decompress(data, codec):
+    if codec == "zstd":
+        return _zstd().ZstdDecompressor().decompress(data)
+    return gzip.decompress(data)
+
+
+def _decompressobj(codec):
+    if codec == "zstd":
+        return _zstd().ZstdDecompressor().decompressobj()
+    return zlib.decompressobj(wbits=31)
+
+
+def scan_members(data, codec, chunk_size=64 * 1024):
+    """
+    (offset, length, text) of each complete gzip member or zstd frame in data.
+
+    Stops at the first member that is cut short or corrupt, such as the last
+    write of a process that died.
+    """
+    members, offset, view = [], 0, memoryview(data)
+    while offset < len(data):
+        decompressor, position, parts = _decompressobj(codec), offset, []
+        try:
+            while not decompressor.eof and position < len(data):
+                parts.append(decompressor.decompress(view[position:position + chunk_size]))
+                position = min(position + chunk_size, len(data))
+        except (zlib.error, ValueError, getattr(_zstd(), "ZstdError", ValueError)):
+            break
+        if not decompressor.eof:
+            break
+        end = position - len(decompressor.unused_data)
+        members.append((offset, end - offset, b"".join(parts)))
+        offset = end
+    return members
+
+
+def _bundle_codec(name):
+    return next((codec for extension, codec in BUNDLE_EXTENSIONS.items() if name.endswith(extension)), None)
+
+
+def _owner_alive(name):
+    """Whether the process that opened this bundle (named <time>-<host>-<pid>-<id>.jsonl.*) is still running here."""
+    stem = name[:name.rindex(".jsonl")]
+    try:
+        opened, pid, _ = stem.rsplit("-", 2)
+        host = opened.split("-", 1)[1]
+        pid = int(pid)
+    except (IndexError, ValueError):
+        return False
+    if host != socket.gethostname():
+        # Another host's process may still be writing it; that host recovers its own bundles.
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def partition_key(prefix, opened_at, name):
+    """Hive-style partitioned key, e.g. transcripts/year=2024/month=05/day=01/hour=13/<name>."""
+    return (f"{prefix.strip('/')}/year={opened_at:%Y}/month={opened_at:%m}/day={opened_at:%d}/"
+            f"hour={opened_at:%H}/{name}")
+
+
+class _Bundle:
+    def __init__(self, directory, codec):
+        self.opened_at = datetime.now(timezone.utc)
+        self.opened = time.monotonic()
+        extension = "zst" if codec == "zstd" else "gz"
+        self.name = (f"{self.opened_at:%Y%m%dT%H%M%SZ}-{socket.gethostname()}-{os.getpid()}-"
+                     f"{uuid.uuid4().hex[:8]}.jsonl.{extension}")
+        self.path = os.path.join(directory, self.name)
+        self.file = open(self.path, "wb")
+        _open_bundles.add(self.path)
+        self.size = 0
+        self.index = []
+
+
+class TranscriptArchive:
+    """
+    Appends sessions to compressed JSONL bundles and uploads each bundle once.
+
+    Every record is compressed as its own gzip member or zstd frame, so the
+    bundle is still an ordinary .jsonl.gz/.jsonl.zst file, and any record can
+    be read alone from its byte offset. When a bundle reaches max_bytes or
+    max_age_seconds it is sealed: an index record listing every session's
+    offset and length is appended as the last line, and the file is handed
+    to the uploader under a year/month/day/hour partitioned key. The index
+    offset travels in the object metadata, so readers can fetch the index with
+    one ranged GET.
+
+    Bundles left in the directory by a process that died, or whose upload
+    failed, are sealed and uploaded when the next archive starts.
+    """
+
+    def __init__(self, directory, uploader=None, prefix="transcripts", codec=None,
+                 max_bytes=MAX_BUNDLE_BYTES, max_age_seconds=MAX_BUNDLE_SECONDS, keep_local=False, recover=True):
+        """
+        :param directory: Where open bundles are written
+        :param uploader: Callable(path, key, metadata) storing a sealed bundle, e.g. S3Sync.upload_object
+        :param codec: "zstd" or "gzip"; defaults to zstd when the zstandard package is installed
+        :param keep_local: Keep sealed bundles after they are uploaded, in the uploaded/ subdirectory
+        :param recover: Seal and upload bundles left over from earlier processes, in the background
+        """
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.uploader = uploader
+        self.prefix = prefix
+        self.codec = codec or default_codec()
+        if self.codec == "zstd" and _zstd() is None:
+            raise ValueError("The zstd codec needs the zstandard package.")
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        self.keep_local = keep_local
+        self.sealed = []  # (key, metadata) of every bundle sealed by this archive
+        self.failed = []  # keys of bundles whose upload failed; they are retried by the next archive
+        self._bundle = None
+        self._lock = threading.Lock()
+        self._uploads = ThreadPoolExecutor(max_workers=1) if uploader is not None else None
+        self._pending = set()
+        self._pending_lock = threading.Lock()
+        if self._uploads is not None and recover:
+            self._submit(self.recover)
+
+    def append(self, record, session_id=None):
+        """
+        Add one session to the open bundle, rolling it over first if it is full or old.
+
+        :param record: JSON-serialisable dict describing the session
+        :return: (bundle name, index entry) of the stored record
+        """
+        session_id = session_id or record.get("session_id") or uuid.uuid4().hex
+        created_at = datetime.now(timezone.utc).isoformat()
+        line = json.dumps({"session_id": session_id, "created_at": created_at, **record},
+                          separators=(",", ":")).encode("utf-8") + b"\n"
+        member = compress(line, self.codec)
+
+        with self._lock:
+            if self._bundle is not None and self._should_roll():
+                self._seal()
+            if self._bundle is None:
+                self._bundle = _Bundle(self.directory, self.codec)
+            bundle = self._bundle
+            entry = {"session_id": session_id, "created_at": created_at,
+                     "offset": bundle.size, "length": len(member)}
+            bundle.file.write(member)
+            bundle.file.flush()
+            bundle.size += len(member)
+            bundle.index.append(entry)
+            return bundle.name, entry
+
+    def _should_roll(self):
+        bundle = self._bundle
+        return bundle.size >= self.max_bytes or time.monotonic() - bundle.opened >= self.max_age_seconds
+
+    def roll(self):
+        """Seal the open bundle if it is full or older than max_age_seconds."""
+        with self._lock:
+            if self._bundle is not None and self._should_roll():
+                self._seal()
+
+    def flush(self):
+        """Seal and upload the open bundle now, whatever its size."""
+        with self._lock:
+            if self._bundle is not None:
+                self._seal()
+
+    def _seal(self):
+        bundle, self._bundle = self._bundle, None
+        index_offset = bundle.size
+        index = compress(json.dumps({"type": INDEX_TYPE, "records": bundle.index},
+                                    separators=(",", ":")).encode("utf-8") + b"\n", self.codec)
+        bundle.file.write(index)
+        bundle.file.close()
+        _open_bundles.discard(bundle.path)
+
+        key = partition_key(self.prefix, bundle.opened_at, bundle.name)
+        metadata = {
+            "codec": self.codec,
+            "records": str(len(bundle.index)),
+            "index-offset": str(index_offset),
+            "index-length": str(len(index)),
+        }
+        self.sealed.append((key, metadata))
+        logging.info(f"Sealed bundle {bundle.name}: {len(bundle.index)} sessions, {index_offset + len(index)} bytes.")
+        if self._uploads is not None:
+            self._submit(self._upload, bundle.path, key, metadata)
+
+    def _submit(self, fn, *args):
+        future = self._uploads.submit(fn, *args)
+        with self._pending_lock:
+            self._pending.add(future)
+        future.add_done_callback(self._done)
+
+    def _done(self, future):
+        # Finished uploads are dropped at once, so a long-running server keeps no history of them.
+        with self._pending_lock:
+            self._pending.discard(future)
+
+    def _upload(self, path, key, metadata):
+        try:
+            self.uploader(path, key, metadata)
+        except Exception as e:
+            # The sealed bundle stays on disk; the next archive started on this directory uploads it.
+            self.failed.append(key)
+            logging.info(f"Failed to upload bundle {key}, kept at {path}: {e}")
+            return
+        logging.info(f"Uploaded bundle {key}.")
+        if self.keep_local:
+            # Out of the directory recovery scans, so it is not uploaded again.
+            uploaded = os.path.join(self.directory, "uploaded")
+            os.makedirs(uploaded, exist_ok=True)
+            os.replace(path, os.path.join(uploaded, os.path.basename(path)))
+        else:
+            os.remove(path)
+
+    def recover(self):
+        """
+        Seal and upload the bundles earlier processes left in the directory.
+
+        A bundle whose owner died before sealing it is cut back to its last
+        complete record and sealed here; a sealed bundle whose upload failed
+        is uploaded as it is. Bundles open in a running process are skipped.
+        """
+        for name in sorted(os.listdir(self.directory)):
+            path = os.path.join(self.directory, name)
+            codec = _bundle_codec(name)
+            if codec is None or path in _open_bundles or _owner_alive(name):
+                continue
+            try:
+                key, metadata = self._recover_bundle(path, name, codec)
+            except Exception as e:
+                logging.info(f"Could not recover bundle {name}: {e}")
+                continue
+            if key is not None:
+                self._upload(path, key, metadata)
+
+    def _recover_bundle(self, path, name, codec):
+        with open(path, "rb") as file:
+            data = file.read()
+        members = scan_members(data, codec)
+        records = [json.loads(text) for _, _, text in members]
+        if records and records[-1].get("type") == INDEX_TYPE:
+            index_offset, index_length, _ = members[-1]
+            n_records = len(records[-1]["records"])
+        else:
+            if not records:
+                logging.info(f"Removing bundle {name}: it holds no complete record.")
+                os.remove(path)
+                return None, None
+            index_offset = sum(length for _, length, _ in members)
+            entries = [{"session_id": record.get("session_id"), "created_at": record.get("created_at"),
+                        "offset": offset, "length": length}
+                       for (offset, length, _), record in zip(members, records)]
+            index = compress(json.dumps({"type": INDEX_TYPE, "records": entries},
+                                        separators=(",", ":")).encode("utf-8") + b"\n", codec)
+            # Drop a record that was cut short, then seal the bundle as its owner would have.
+            with open(path, "r+b") as file:
+                file.truncate(index_offset)
+                file.seek(index_offset)
+                file.write(index)
+            index_length, n_records = len(index), len(entries)
+            logging.info(f"Sealed orphaned bundle {name}: {n_records} sessions; "
+                         f"dropped {len(data) - index_offset} trailing bytes.")
+
+        opened_at = datetime.strptime(name.split("-", 1)[0], "%Y%m%dT%H%M%SZ").replace(tzinfo=timezone.utc)
+        metadata = {
+            "codec": codec,
+            "records": str(n_records),
+            "index-offset": str(index_offset),
+            "index-length": str(index_length),
+        }
+        return partition_key(self.prefix, opened_at, name), metadata
+
+    def close(self):
+        """Seal the open bundle and wait for every upload to finish; failed uploads were logged as they happened."""
+        self.flush()
+        if self._uploads is not None:
+            with self._pending_lock:
+                pending = list(self._pending)
+            wait(pending)
+            self._uploads.shutdown(wait=True)
+            self._uploads = None
+
+
+def read_record(data, entry, codec):
+    """Decode one record from bundle bytes (or a ranged GET of exactly that record)."""
+    if len(data) > entry["length"]:
+        data = data[entry["offset"]:entry["offset"] + entry["length"]]
+    return json.loads(decompress(data, codec))
+
+
+def read_index(path, codec=None, index_offset=None):
+    """
+    Index of a sealed local bundle.
+
+    With index_offset (from the object metadata) only the index member is
+    read; without it the whole bundle is decompressed to find the last line.
+    """
+    codec = codec or ("zstd" if path.endswith(".zst") else "gzip")
+    with open(path, "rb") as file:
+        if index_offset is not None:
+            file.seek(int(index_offset))
+            return json.loads(decompress(file.read(), codec))["records"]
+        data = file.read()
+    if codec == "zstd":
+        reader = _zstd().ZstdDecompressor().stream_reader(io.BytesIO(data), read_across_frames=True)
+        text = reader.read()
+    else:
+        text = gzip.decompress(data)
+    return json.loads(text.splitlines()[-1])["records"]
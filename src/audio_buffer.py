@@ -0,0 +1,96 @@
+import os
+import tempfile
+import numpy as np
+from src.ingest import BYTES_PER_SAMPLE, SAMPLE_RATE, IngestStats, iter_pcm, log_ingest
+from src.logger import logging
+
+# Decodes longer than this are spilled to disk and memory-mapped (~10 minutes of audio).
+MEMMAP_THRESHOLD_SECONDS = 600
+
+
+class AudioBuffer:
+    """
+    Audio decoded once to 16 kHz mono float32 and shared by every pipeline stage.
+
+    Short inputs live in a regular numpy array. Long inputs are written to a
+    temporary file and memory-mapped copy-on-write, so transcription, alignment
+    and diarization all read the same pages instead of decoding the file again.
+    """
+
+    def __init__(self, samples, sample_rate=SAMPLE_RATE, backing_file=None, ingest_stats=None):
+        self.samples = samples
+        self.sample_rate = sample_rate
+        self.backing_file = backing_file
+        self.ingest_stats = ingest_stats  # IngestStats of the decode, when built by from_file
+
+    @classmethod
+    def from_file(cls, file_path, memmap_threshold_seconds=MEMMAP_THRESHOLD_SECONDS, tmp_dir=None):
+        """Decode file_path, or any source ffmpeg can open, with a single streaming ffmpeg run."""
+        logging.info(f"Decoding {file_path} into a shared audio buffer.")
+        threshold_samples = int(memmap_threshold_seconds * SAMPLE_RATE)
+        stats = IngestStats(file_path)
+        chunks, buffered, spill = [], 0, None
+
+        try:
+            for chunk in iter_pcm(file_path, stats=stats):
+                if spill is not None:
+                    chunk.tofile(spill)
+                    continue
+                chunks.append(chunk)
+                buffered += len(chunk)
+                if buffered > threshold_samples:
+                    # Too long to keep in RAM: move what we have to disk and keep streaming there.
+                    spill = tempfile.NamedTemporaryFile(suffix=".f32", dir=tmp_dir, delete=False)
+                    for buffered_chunk in chunks:
+                        buffered_chunk.tofile(spill)
+                    chunks = []
+        except Exception:
+            if spill is not None:
+                spill.close()
+                os.remove(spill.name)
+            raise
+        log_ingest(stats)
+
+        if spill is None:
+            samples = np.concatenate(chunks) if chunks else np.zeros(0, dtype=np.float32)
+            return cls(samples, ingest_stats=stats)
+
+        spill.close()
+        n_samples = os.path.getsize(spill.name) // BYTES_PER_SAMPLE
+        samples = np.memmap(spill.name, dtype=np.float32, mode="c", shape=(n_samples,))
+        logging.info(f"Audio buffer memory-mapped from {spill.name} ({n_samples} samples).")
+        return cls(samples, backing_file=spill.name, ingest_stats=stats)
+
+    @property
+    def duration(self):
+        return len(self.samples) / float(self.sample_rate)
+
+    @property
+    def is_memmapped(self):
+        return self.backing_file is not None
+
+    def view(self, start=None, end=None):
+        """Zero-copy slice of the samples between start and end seconds."""
+        start_idx = 0 if start is None else max(int(start * self.sample_rate), 0)
+        end_idx = len(self.samples) if end is None else min(int(end * self.sample_rate), len(self.samples))
+        return self.samples[start_idx:end_idx]
+
+    def close(self):
+        """Release the samples and delete the backing file, if any."""
+        # Outstanding views keep the mapping alive; unlinking the file is still safe.
+        self.samples = np.zeros(0, dtype=np.float32)
+        if self.backing_file is not None:
+            try:
+                os.remove(self.backing_file)
+            except OSError:
+                pass
+            self.backing_file = None
+
+    def __len__(self):
+        return len(self.samples)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
@@ -0,0 +1,298 @@
+import os
+import struct
+import threading
+from collections import OrderedDict, namedtuple
+from src.logger import logging
+
+# Everything a caller needs to admit or schedule a file, read from headers only.
+AudioInfo = namedtuple("AudioInfo", ["format", "duration", "sample_rate", "channels"])
+
+# How far past the ID3v2 tag we look for the first MP3 frame.
+MP3_SYNC_SEARCH_BYTES = 64 * 1024
+# Ogg pages are at most ~64 KiB, so the last page starts within this tail.
+OGG_TAIL_BYTES = 66 * 1024
+
+
+class AudioProbeError(ValueError):
+    pass
+
+
+def _read_at(file, offset, size):
+    file.seek(offset)
+    return file.read(size)
+
+
+def _probe_wav(file, file_size):
+    header = _read_at(file, 0, 12)
+    if header[8:12] != b"WAVE":
+        raise AudioProbeError("RIFF file is not WAVE.")
+
+    offset = 12
+    fmt = None
+    while offset + 8 <= file_size:
+        chunk_id, chunk_size = struct.unpack("<4sI", _read_at(file, offset, 8))
+        body = offset + 8
+        if chunk_id == b"fmt ":
+            _, channels, sample_rate, byte_rate, block_align = struct.unpack("<HHIIH", _read_at(file, body, 14))
+            fmt = (channels, sample_rate, byte_rate or sample_rate * block_align)
+        elif chunk_id == b"data":
+            if fmt is None:
+                raise AudioProbeError("WAV data chunk comes before its fmt chunk.")
+            channels, sample_rate, byte_rate = fmt
+            # Streamed or truncated WAVs carry a bogus size; trust the file instead.
+            data_size = min(chunk_size, file_size - body)
+            return AudioInfo("wav", data_size / byte_rate, sample_rate, channels)
+        offset = body + chunk_size + (chunk_size & 1)
+    raise AudioProbeError("WAV file has no data chunk.")
+
+
+def _probe_flac(file, start):
+    offset = start + 4
+    while True:
+        block_header = _read_at(file, offset, 4)
+        if len(block_header) < 4:
+            raise AudioProbeError("FLAC file has no STREAMINFO block.")
+        block_type = block_header[0] & 0x7F
+        length = int.from_bytes(block_header[1:4], "big")
+        if block_type == 0:
+            info = int.from_bytes(_read_at(file, offset + 4, 34)[10:18], "big")
+            sample_rate = info >> 44
+            channels = ((info >> 41) & 0x7) + 1
+            total_samples = info & 0xFFFFFFFFF
+            duration = total_samples / sample_rate if sample_rate else 0.0
+            return AudioInfo("flac", duration, sample_rate, channels)
+        if block_header[0] & 0x80:
+            raise AudioProbeError("FLAC file has no STREAMINFO block.")
+        offset += 4 + length
+
+
+def _probe_ogg(file, file_size):
+    page = _read_at(file, 0, 27 + 255)
+    n_segments = page[26]
+    packet = _read_at(file, 27 + n_segments, 19)
+    if packet.startswith(b"\x01vorbis"):
+        channels = packet[11]
+        (sample_rate,) = struct.unpack("<I", packet[12:16])
+        granule_rate, pre_skip, codec = sample_rate, 0, "vorbis"
+    elif packet.startswith(b"OpusHead"):
+        channels = packet[9]
+        pre_skip, sample_rate = struct.unpack("<HI", packet[10:16])
+        # Opus granule positions always count 48 kHz samples.
+        granule_rate, codec = 48000, "opus"
+    else:
+        raise AudioProbeError("Unsupported Ogg codec.")
+
+    tail_start = max(0, file_size - OGG_TAIL_BYTES)
+    tail = _read_at(file, tail_start, OGG_TAIL_BYTES)
+    last_page = tail.rfind(b"OggS")
+    if last_page < 0 or last_page + 14 > len(tail):
+        raise AudioProbeError("Ogg file has no final page.")
+    (granule,) = struct.unpack("<q", tail[last_page + 6:last_page + 14])
+    duration = max(granule - pre_skip, 0) / granule_rate
+    return AudioInfo(f"ogg/{codec}", duration, sample_rate, channels)
+
+
+_MP3_BITRATES = {
+    (1, 1): (0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448),
+    (1, 2): (0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384),
+    (1, 3): (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    (2, 1): (0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256),
+    (2, 2): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+    (2, 3): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+_MP3_SAMPLE_RATES = {1: (44100, 48000, 32000), 2: (22050, 24000, 16000), 2.5: (11025, 12000, 8000)}
+_MP3_VERSIONS = {0: 2.5, 2: 2, 3: 1}
+
+
+def _mp3_frame(header):
+    """Decode a 4-byte MPEG audio frame header, or return None if it is not one."""
+    if len(header) < 4 or header[0] != 0xFF or header[1] & 0xE0 != 0xE0:
+        return None
+    version = _MP3_VERSIONS.get((header[1] >> 3) & 0x3)
+    layer = 4 - ((header[1] >> 1) & 0x3)
+    bitrate_index = header[2] >> 4
+    rate_index = (header[2] >> 2) & 0x3
+    if version is None or layer == 4 or bitrate_index in (0, 15) or rate_index == 3:
+        return None
+
+    bitrate = _MP3_BITRATES[(1 if version == 1 else 2, layer)][bitrate_index] * 1000
+    sample_rate = _MP3_SAMPLE_RATES[version][rate_index]
+    padding = (header[2] >> 1) & 0x1
+    channels = 1 if header[3] >> 6 == 3 else 2
+    if layer == 1:
+        samples_per_frame = 384
+        frame_length = (12 * bitrate // sample_rate + padding) * 4
+    else:
+        samples_per_frame = 1152 if layer == 2 or version == 1 else 576
+        frame_length = samples_per_frame // 8 * bitrate // sample_rate + padding
+    return version, bitrate, sample_rate, channels, samples_per_frame, frame_length
+
+
+def _probe_mp3(file, start, file_size):
+    window = _read_at(file, start, MP3_SYNC_SEARCH_BYTES)
+    position = window.find(b"\xFF")
+    while position >= 0:
+        frame = _mp3_frame(window[position:position + 4])
+        # Require the next frame header too, so stray 0xFF bytes are not taken for a sync.
+        if frame is not None:
+            next_frame = start + position + frame[5]
+            following = _read_at(file, next_frame, 4)
+            # A last frame may only be followed by the end of the file or an ID3v1 tag.
+            at_end = next_frame == file_size or (next_frame == file_size - 128 and following[:3] == b"TAG")
+            if at_end or _mp3_frame(following) is not None:
+                break
+        position = window.find(b"\xFF", position + 1)
+    else:
+        raise AudioProbeError("No MPEG audio frame found.")
+
+    version, bitrate, sample_rate, channels, samples_per_frame, frame_length = frame
+    first_frame = start + position
+    frame_data = _read_at(file, first_frame, max(frame_length, 4 + 32 + 18))
+
+    # VBR files put the frame count in a Xing/Info tag after the side info,
+    # or in a Fraunhofer VBRI tag at a fixed offset.
+    side_info = (32 if channels == 2 else 17) if version == 1 else (17 if channels == 2 else 9)
+    xing = 4 + side_info
+    frames = None
+    if frame_data[xing:xing + 4] in (b"Xing", b"Info"):
+        (flags,) = struct.unpack(">I", frame_data[xing + 4:xing + 8])
+        if flags & 0x1:
+            (frames,) = struct.unpack(">I", frame_data[xing + 8:xing + 12])
+    elif frame_data[36:40] == b"VBRI":
+        (frames,) = struct.unpack(">I", frame_data[50:54])
+
+    if frames is not None:
+        duration = frames * samples_per_frame / sample_rate
+    else:
+        # Constant bitrate: the audio bytes divided by the byte rate, minus an ID3v1 tag.
+        end = file_size - (128 if file_size >= 128 and _read_at(file, file_size - 128, 3) == b"TAG" else 0)
+        duration = (end - first_frame) * 8 / bitrate
+    return AudioInfo("mp3", duration, sample_rate, channels)
+
+
+# Containers whose payload can hold 0xFF bytes that look like MPEG frame syncs, by their magic.
+_OTHER_CONTAINERS = (
+    (4, b"ftyp", "MP4/M4A"),
+    (0, b"\x1aE\xdf\xa3", "Matroska/WebM"),
+    (0, b"FORM", "AIFF"),
+    (0, b"caff", "CAF"),
+    (0, b"#!AMR", "AMR"),
+    (0, b"0&\xb2u\x8ef\xcf\x11", "ASF/WMA"),
+)
+
+
+def _other_container(header):
+    for offset, magic, name in _OTHER_CONTAINERS:
+        if header[offset:offset + len(magic)] == magic:
+            return name
+    return None
+
+
+def _id3v2_size(header):
+    if header[:3] != b"ID3" or len(header) < 10:
+        return 0
+    size = 0
+    for byte in header[6:10]:
+        size = (size << 7) | (byte & 0x7F)
+    footer = 10 if header[5] & 0x10 else 0
+    return 10 + size + footer
+
+
+def _probe(file_path):
+    file_size = os.path.getsize(file_path)
+    with open(file_path, "rb") as file:
+        header = file.read(12)
+        if header[:4] in (b"RIFF", b"RF64"):
+            return _probe_wav(file, file_size)
+        if header[:4] == b"OggS":
+            return _probe_ogg(file, file_size)
+
+        start = _id3v2_size(header[:10])
+        if start:
+            header = _read_at(file, start, 4)
+        if header[:4] == b"fLaC":
+            return _probe_flac(file, start)
+        if not start:
+            container = _other_container(header)
+            if container is not None:
+                raise AudioProbeError(f"Unsupported container: {container}.")
+        return _probe_mp3(file, start, file_size)
+
+
+def cache_key(file_path):
+    """
+    (path, size, mtime) of a file: changes whenever a probe result could, for the cost of one stat.
+    """
+    stat = os.stat(file_path)
+    return os.path.realpath(file_path), stat.st_size, stat.st_mtime_ns
+
+
+class ProbeCache:
+    """Thread-safe LRU of AudioInfo keyed by cache_key()."""
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            info = self._entries.get(key)
+            if info is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return info
+
+    def set(self, key, info):
+        with self._lock:
+            self._entries[key] = info
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+probe_cache = ProbeCache()
+
+
+def probe_audio(file_path, cache=probe_cache):
+    """
+    Duration, sample rate and channel count of an audio file, from its headers only.
+
+    Supports WAV/RIFF, MP3 (Xing/Info and VBRI tags, else constant bitrate),
+    FLAC and Ogg Vorbis/Opus. Nothing is decoded, so the cost is a few small
+    reads regardless of the recording's length.
+
+    :param cache: ProbeCache to consult, or None to always re-read the headers
+    :raises FileNotFoundError: if file_path does not exist
+    :raises AudioProbeError: if the format is not recognised or the headers are broken
+    """
+    if not os.path.isfile(file_path):
+        raise FileNotFoundError(f"{file_path} does not exist.")
+
+    key = cache_key(file_path) if cache is not None else None
+    if key is not None:
+        info = cache.get(key)
+        if info is not None:
+            return info
+
+    try:
+        info = _probe(file_path)
+    except (struct.error, IndexError, ZeroDivisionError) as e:
+        raise AudioProbeError(f"Could not read the headers of {file_path}: {e}")
+    logging.info("Probed %s: %s", file_path, info)
+
+    if key is not None:
+        cache.set(key, info)
+    return info
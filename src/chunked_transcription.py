@@ -0,0 +1,253 @@
+import multiprocessing as mp
+import threading
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import nullcontext
+import numpy as np
+from src.logger import logging
+
+FRAME_SECONDS = 0.03
+
+
+def frame_energy(samples, sample_rate, frame_seconds=FRAME_SECONDS):
+    """RMS energy of consecutive non-overlapping frames."""
+    frame = max(int(sample_rate * frame_seconds), 1)
+    n_frames = len(samples) // frame
+    if n_frames == 0:
+        return np.zeros(0, dtype=np.float32)
+    frames = np.asarray(samples[:n_frames * frame], dtype=np.float32).reshape(n_frames, frame)
+    return np.sqrt(np.einsum("ij,ij->i", frames, frames) / frame)
+
+
+def find_windows(samples, sample_rate, target_seconds=300, search_seconds=30, min_silence_seconds=0.3):
+    """
+    Split audio into windows of roughly target_seconds, cutting inside silences.
+
+    Each cut is placed in the middle of the silent run closest to the ideal cut
+    point, within search_seconds of it, so no word is split between windows.
+    Falls back to the quietest frame when there is no silence long enough.
+
+    :return: List of (start_sample, end_sample) tuples covering the whole input
+    """
+    if target_seconds <= 0:
+        raise ValueError(f"target_seconds must be positive, got {target_seconds}.")
+    if search_seconds < 0:
+        raise ValueError(f"search_seconds must not be negative, got {search_seconds}.")
+    total = len(samples)
+    if total <= target_seconds * sample_rate:
+        return [(0, total)]
+
+    frame = max(int(sample_rate * FRAME_SECONDS), 1)
+    energy = frame_energy(samples, sample_rate)
+    # Silence is anything close to the noise floor of the recording.
+    threshold = max(np.percentile(energy, 10) * 2.0, 1e-4)
+    silent = energy <= threshold
+    min_run = max(int(min_silence_seconds / FRAME_SECONDS), 1)
+
+    # Label runs of silent frames once; each cut only looks at a slice of them.
+    edges = np.diff(np.concatenate(([0], silent.astype(np.int8), [0])))
+    run_starts = np.flatnonzero(edges == 1)
+    run_ends = np.flatnonzero(edges == -1)
+    run_lengths = run_ends - run_starts
+
+    cuts = []
+    target_frames = int(target_seconds / FRAME_SECONDS)
+    search_frames = int(search_seconds / FRAME_SECONDS)
+    position = 0
+    while position + target_frames + search_frames < len(energy):
+        ideal = position + target_frames
+        # Never search behind the previous cut, so every window has at least one frame.
+        lo = max(ideal - search_frames, position + 1)
+        hi = max(ideal + search_frames, lo + 1)
+        mask = (run_starts < hi) & (run_ends > lo) & (run_lengths >= min_run)
+        if mask.any():
+            centres = (run_starts[mask] + run_ends[mask]) // 2
+            best = np.flatnonzero(mask)[np.argmin(np.abs(centres - ideal))]
+            start, end = max(run_starts[best], lo), min(run_ends[best], hi)
+            cut = (start + end) // 2
+        else:
+            cut = lo + int(np.argmin(energy[lo:hi]))
+        cuts.append(int(cut))
+        position = cut
+
+    bounds = [0] + [cut * frame for cut in cuts] + [total]
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def offset_segments(segments, offset):
+    """Shift segment (and word) timestamps from window time to global time."""
+    shifted = []
+    for segment in segments:
+        segment = dict(segment)
+        segment["start"] = round(segment["start"] + offset, 3)
+        segment["end"] = round(segment["end"] + offset, 3)
+        if "words" in segment:
+            segment["words"] = [
+                {**word, "start": round(word["start"] + offset, 3), "end": round(word["end"] + offset, 3)}
+                if "start" in word else dict(word)
+                for word in segment["words"]
+            ]
+        shifted.append(segment)
+    return shifted
+
+
+# Set by _init_worker, in chunk-pool worker processes only.
+_worker_model = None
+_worker_batch_size = 16
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def _load_transcriber(model_name, device, compute_type, language):
+    from src.dairization import WhisperTranscriber
+    transcriber = WhisperTranscriber(None, None, device=device, compute_type=compute_type,
+                                     model_name=model_name, language=language)
+    transcriber.load_model()
+    return transcriber
+
+
+def _init_worker(model_name, device, compute_type, language, batch_size):
+    # Pool workers only: the model stays loaded for the life of the worker process.
+    global _worker_model, _worker_batch_size
+    _worker_model = _load_transcriber(model_name, device, compute_type, language).model
+    _worker_batch_size = batch_size
+
+
+def _transcribe_window(index, audio, start, end, offset, model=None, batch_size=None):
+    """Transcribe one window; without a model, use the one _init_worker loaded into this pool worker."""
+    if model is None:
+        model, batch_size = _worker_model, _worker_batch_size
+    if isinstance(audio, str):
+        # Memory-mapped buffers are shared by path instead of being pickled.
+        audio = np.memmap(audio, dtype=np.float32, mode="c")
+    result = model.transcribe(audio[start:end], batch_size=batch_size)
+    return index, offset_segments(result["segments"], offset), result.get("language")
+
+
+def _ready():
+    return True
+
+
+def uses_pool(workers):
+    """Whether windows are sent to a process pool; daemonic processes (e.g. WorkerPool workers) may not start one."""
+    return workers > 1 and not mp.current_process().daemon
+
+
+def _pool_context():
+    # Workers come from a fork server (or are spawned), never forked from the caller: the caller
+    # runs uvicorn, job threads and the diarization thread, and a fork copies locks they hold.
+    if "forkserver" in mp.get_all_start_methods():
+        context = mp.get_context("forkserver")
+        context.set_forkserver_preload(["src.dairization"])
+        return context
+    return mp.get_context("spawn")
+
+
+def get_pool(model_name, device, compute_type, language=None, batch_size=16, workers=2):
+    """
+    The long-lived chunk pool for these model settings, started on first use.
+
+    Every worker has loaded the model before this returns, so jobs never wait
+    for a model load. Call it at startup to pay for the pool before the first
+    long recording arrives.
+    """
+    key = (model_name, device, compute_type, language, batch_size, workers)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=_pool_context(),
+                initializer=_init_worker,
+                initargs=(model_name, device, compute_type, language, batch_size),
+            )
+            # One task per worker starts them all and waits for their model loads.
+            for future in [pool.submit(_ready) for _ in range(workers)]:
+                future.result()
+            _pools[key] = pool
+        return pool
+
+
+def _discard_pool(pool):
+    with _pools_lock:
+        for key, cached in list(_pools.items()):
+            if cached is pool:
+                del _pools[key]
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def shutdown_pools():
+    """Stop every chunk pool and its workers."""
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.shutdown(cancel_futures=True)
+
+
+def transcribe_chunked(audio_buffer, model_name, device, compute_type, language=None, batch_size=16,
+                       target_seconds=300, workers=2, on_window=None, model=None, model_lock=None):
+    """
+    Transcribe a long AudioBuffer window by window across a process pool.
+
+    The pool outlives the call (see get_pool()), so later recordings reuse
+    workers that already hold the model.
+
+    :param on_window: Optional callback on_window(index, segments) called as each window finishes,
+                      with timestamps already in global time
+    :param model: Already loaded model, used when transcribing in this process
+    :param model_lock: The registry's inference lock for model, held for each window
+    :return: Dict with the stitched "segments" and the detected "language"
+    """
+    samples, sample_rate = audio_buffer.samples, audio_buffer.sample_rate
+    windows = find_windows(samples, sample_rate, target_seconds=target_seconds)
+    logging.info(f"Transcribing {len(windows)} windows of about {target_seconds}s with {workers} workers.")
+
+    results = {}
+    languages = Counter()
+
+    def collect(index, segments, detected):
+        results[index] = segments
+        if detected:
+            languages[detected] += 1
+        if on_window is not None:
+            on_window(index, segments)
+
+    if len(windows) == 1 or not uses_pool(workers):
+        # The model is passed along rather than stored in the worker globals, which
+        # concurrent jobs in this process would overwrite.
+        transcriber = None
+        if model is None:
+            transcriber = _load_transcriber(model_name, device, compute_type, language)
+            model = transcriber.model
+            model_lock = transcriber.registry.inference_lock(transcriber.model_key)
+        try:
+            for index, (start, end) in enumerate(windows):
+                # Locked per window, so other jobs sharing the model can run between windows.
+                with model_lock or nullcontext():
+                    window = _transcribe_window(index, samples, start, end, start / sample_rate, model, batch_size)
+                collect(*window)
+        finally:
+            if transcriber is not None:
+                transcriber.release_models()
+    else:
+        pool = get_pool(model_name, device, compute_type, language, batch_size, workers)
+        futures = []
+        for index, (start, end) in enumerate(windows):
+            if audio_buffer.is_memmapped:
+                args = (index, audio_buffer.backing_file, start, end, start / sample_rate)
+            else:
+                args = (index, samples[start:end], 0, end - start, start / sample_rate)
+            futures.append(pool.submit(_transcribe_window, *args))
+        try:
+            for future in as_completed(futures):
+                collect(*future.result())
+        except BrokenProcessPool:
+            # A worker died (e.g. out of memory); the next job starts a fresh pool.
+            _discard_pool(pool)
+            raise
+
+    segments = [segment for index in sorted(results) for segment in results[index]]
+    detected_language = language or (languages.most_common(1)[0][0] if languages else None)
+    return {"segments": segments, "language": detected_language}
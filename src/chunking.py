@@ -0,0 +1,81 @@
+import re
+from functools import lru_cache
+
+SENTENCE_BOUNDARY = re.compile(r'(?<=[.!?])\s+')
+WORD_BOUNDARY = re.compile(r'\s+')
+HTML_TAG = re.compile(r'<.*?>')
+
+
+@lru_cache(maxsize=1)
+def _encoder():
+    # Llama 3 uses a tiktoken-style BPE, so cl100k_base is a close local stand-in.
+    try:
+        import tiktoken
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception:
+        return None
+
+
+def count_tokens(text):
+    """Number of tokens in text, approximated from the word count when tiktoken is unavailable."""
+    encoder = _encoder()
+    if encoder is not None:
+        return len(encoder.encode(text, disallowed_special=()))
+    return int(len(text.split()) * 1.33) + 1
+
+
+def _split_oversized(text, max_tokens):
+    """Break a single turn that is over budget on sentence, then word, boundaries."""
+    pieces = []
+    for sentence in SENTENCE_BOUNDARY.split(text):
+        if count_tokens(sentence) <= max_tokens:
+            pieces.append(sentence)
+            continue
+        words = WORD_BOUNDARY.split(sentence)
+        step = max(int(max_tokens / 1.5), 1)
+        while step > 1 and any(
+            count_tokens(" ".join(words[i:i + step])) > max_tokens for i in range(0, len(words), step)
+        ):
+            step //= 2
+        pieces.extend(" ".join(words[i:i + step]) for i in range(0, len(words), step))
+    return pieces
+
+
+def pack_turns(turns, max_tokens, split_oversized=True):
+    """
+    Greedily pack consecutive turns into chunks of at most max_tokens tokens.
+
+    Chunks only break between turns, so a speaker's turn is never cut in half
+    unless that turn alone exceeds the budget.
+    """
+    chunks = []
+    current, current_tokens = [], 0
+    for turn in turns:
+        turn_tokens = count_tokens(turn)
+        if turn_tokens > max_tokens and split_oversized:
+            if current:
+                chunks.append(current)
+                current, current_tokens = [], 0
+            chunks.extend(pack_turns(_split_oversized(turn, max_tokens), max_tokens, split_oversized=False))
+            continue
+        if current and current_tokens + turn_tokens > max_tokens:
+            chunks.append(current)
+            current, current_tokens = [], 0
+        current.append(turn)
+        current_tokens += turn_tokens
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def split_conversation(conversation, max_tokens):
+    """
+    Split display_conversation output (or a plain transcript string) into
+    token-bounded chunks on speaker-turn boundaries.
+
+    :return: List of chunks, each a list of plain-text turns
+    """
+    if isinstance(conversation, str):
+        conversation = [conversation]
+    turns = [HTML_TAG.sub('', turn).strip() for turn in conversation]
+    return pack_turns([turn for turn in turns if turn], max_tokens)
@@ -0,0 +1,140 @@
+class Turn:
+    """Consecutive segments spoken by one speaker."""
+
+    __slots__ = ("speaker", "label", "start", "end", "word_start", "word_end", "text")
+
+    def __init__(self, speaker, label, start, end, word_start, word_end, text):
+        self.speaker = speaker  # raw diarization id, e.g. SPEAKER_00
+        self.label = label  # display name, e.g. Speaker 1
+        self.start = start
+        self.end = end
+        self.word_start = word_start  # index range into the transcript's words
+        self.word_end = word_end
+        self.text = text
+
+    @property
+    def duration(self):
+        return self.end - self.start
+
+    def __repr__(self):
+        return f"Turn({self.label!r}, {self.start}-{self.end}, {self.text[:30]!r})"
+
+
+class Conversation:
+    """
+    Speaker turns of one call, built once from the diarized segments.
+
+    HTML rendering, stats, summaries and exports all read from this model
+    instead of re-parsing the rendered strings.
+    """
+
+    __slots__ = ("turns", "speaker_labels")
+
+    def __init__(self, turns, speaker_labels):
+        self.turns = turns
+        self.speaker_labels = speaker_labels
+
+    @classmethod
+    def _build(cls, rows, uniq_speakers=None):
+        """
+        One linear pass over rows of (speaker, text, start, end, n_words).
+
+        Text parts of a turn are collected in a list and joined once, so long
+        monologues do not cost quadratic string concatenation.
+        """
+        speaker_labels = {}
+        if uniq_speakers is not None:
+            speaker_labels = {speaker: f"Speaker {i + 1}" for i, speaker in enumerate(uniq_speakers)}
+
+        turns = []
+        current = None
+        parts = []
+        word_index = 0
+
+        def close():
+            if current is not None:
+                current.text = " ".join(parts).strip()
+                turns.append(current)
+
+        for speaker, text, start, end, n_words in rows:
+            text = text.strip()
+            if current is not None and speaker == current.speaker:
+                parts.append(text)
+                current.end = end
+                current.word_end = word_index + n_words
+            else:
+                close()
+                if speaker not in speaker_labels:
+                    speaker_labels[speaker] = f"Speaker {len(speaker_labels) + 1}"
+                current = Turn(speaker, speaker_labels[speaker], start, end,
+                               word_index, word_index + n_words, "")
+                parts = [text]
+            word_index += n_words
+        close()
+        return cls(turns, speaker_labels)
+
+    @classmethod
+    def from_result(cls, result, uniq_speakers=None):
+        """Build from a diarized whisperx result (dict with "segments")."""
+        return cls._build(
+            (
+                (segment.get("speaker"), segment.get("text", ""), segment.get("start"), segment.get("end"),
+                 len(segment.get("words", ())))
+                for segment in result["segments"]
+            ),
+            uniq_speakers,
+        )
+
+    @classmethod
+    def from_columnar(cls, transcript, uniq_speakers=None):
+        """Build from a ColumnarTranscript without materialising word dicts."""
+        word_counts = transcript.segment_word_offsets[1:] - transcript.segment_word_offsets[:-1]
+        return cls._build(
+            (
+                (speaker, text, float(start), float(end), int(n_words))
+                for (speaker, text), start, end, n_words in zip(
+                    transcript.segments(), transcript.segment_start, transcript.segment_end, word_counts
+                )
+            ),
+            uniq_speakers,
+        )
+
+    def __iter__(self):
+        return iter(self.turns)
+
+    def __len__(self):
+        return len(self.turns)
+
+    @property
+    def speakers(self):
+        return list(self.speaker_labels.values())
+
+    def to_html(self):
+        """Lines in the "<strong>Speaker 1:</strong> text" form shown by the UIs."""
+        return [f"<strong>{turn.label}:</strong> {turn.text}" for turn in self.turns]
+
+    def to_lines(self):
+        """Plain "Speaker 1: text" lines, used for summaries and text exports."""
+        return [f"{turn.label}: {turn.text}" for turn in self.turns]
+
+    def speaker_texts(self):
+        texts = {}
+        for turn in self.turns:
+            texts.setdefault(turn.label, []).append(turn.text)
+        return texts
+
+    def word_counts(self):
+        """Total word count and word count per speaker."""
+        per_speaker = {}
+        for turn in self.turns:
+            per_speaker[turn.label] = per_speaker.get(turn.label, 0) + len(turn.text.split())
+        return sum(per_speaker.values()), per_speaker
+
+    def to_dict(self):
+        return {
+            "speakers": self.speaker_labels,
+            "turns": [
+                {slot: getattr(turn, slot) for slot in Turn.__slots__}
+                for turn in self.turns
+            ],
+        }
@@ -2,23 +2,61 @@ import json
 import os
 from dotenv import load_dotenv
 from src.logger import logging
+from src.model_registry import ModelKey, model_registry
+from src.audio_buffer import AudioBuffer
+from src.chunked_transcription import get_pool, transcribe_chunked, uses_pool
+from src.transcript_store import save_columnar
+from src.tracing import JobTrace
 import time
+from concurrent.futures import ThreadPoolExecutor
 load_dotenv()
 
 huggingface_token = os.getenv("HUGGINGFACEHUB_API_TOKEN")
+# Downloaded Whisper models are kept here, one subdirectory per model name.
+WHISPER_MODEL_DIR = os.getenv("WHISPER_MODEL_DIR", "whisper_model")
 
 class WhisperTranscriber:
-    def __init__(self, audio_file,hugging_face_token, device="cpu", compute_type="float32", batch_size=16):
+    def __init__(self, audio_file,hugging_face_token, device="cpu", compute_type="float32", batch_size=16,
+                 model_name="large-v2", language=None, registry=model_registry, audio_buffer=None,
+                 min_speakers=2, max_speakers=2, long_audio_seconds=None, chunk_seconds=300, chunk_workers=2,
+                 trace=None):
         self.audio_file = audio_file
+        self._audio = audio_buffer
         self.device = device
         self.compute_type = compute_type
         self.batch_size = batch_size
+        self.model_name = model_name
+        self.min_speakers = min_speakers
+        # Recordings longer than long_audio_seconds are transcribed in VAD-split windows.
+        self.long_audio_seconds = long_audio_seconds
+        self.chunk_seconds = chunk_seconds
+        self.chunk_workers = chunk_workers
+        self.max_speakers = max_speakers
+        self.language = language
+        self.registry = registry
         self.model = None
+        self._model_keys = []
         self.result_trans = None
         self.result_align = None
         self.diarize_segments = None
         self.hugging_face_token = hugging_face_token
         self.cancel_process = False  # Initialize cancel_process attribute
+        # Per-stage wall time, CPU time and peak memory of this job; see trace.report().
+        self.trace = trace or JobTrace()
+
+    def pipeline_params(self):
+        """Parameters that change the pipeline output, used to key stored results."""
+        return {
+            "model": self.model_name,
+            "language": self.language,
+            "compute_type": self.compute_type,
+            "batch_size": self.batch_size,
+            "min_speakers": self.min_speakers,
+            "max_speakers": self.max_speakers,
+            # Windowing moves segment boundaries and so changes the text.
+            "long_audio_seconds": self.long_audio_seconds,
+            "chunk_seconds": self.chunk_seconds,
+        }
 
     def start_process(self):
         """Record the start time of the processing."""
@@ -33,62 +71,216 @@ class WhisperTranscriber:
             return elapsed_time
         return 0
     
-    def load_model(self):
+    @property
+    def audio(self):
+        """The decoded audio, shared by transcription, alignment and diarization."""
+        if self._audio is None:
+            with self.trace.span("decode"):
+                self._audio = AudioBuffer.from_file(self.audio_file)
+        if self.trace.audio_seconds is None:
+            self.trace.audio_seconds = self._audio.duration
+        return self._audio
+
+    def release_audio(self):
+        if self._audio is not None:
+            self._audio.close()
+            self._audio = None
+
+    def _acquire(self, key, loader):
+        model = self.registry.acquire(key, loader)
+        self._model_keys.append(key)
+        return model
+
+    def release_models(self):
+        """Hand every model this transcriber used back to the registry."""
+        for key in self._model_keys:
+            self.registry.release(key)
+        self._model_keys = []
+        self.model = None
+
+    def _load_whisper_model(self):
         import whisperx
-        logging.info("Load the Whisper model.")
-        
-        model_path = "whisper_model"
-        
+        model_path = os.path.join(WHISPER_MODEL_DIR, self.model_name)
+
         # Check if the model directory exists and contains necessary files
         if os.path.exists(model_path) and os.path.isfile(os.path.join(model_path, 'model.bin')):
             try:
-                self.model = whisperx.load_model(model_path, self.device, compute_type=self.compute_type)
+                model = whisperx.load_model(model_path, self.device, compute_type=self.compute_type, language=self.language)
 
                 logging.info("Model loaded successfully from local directory.")
+                return model
             except Exception as e:
                 logging.info(f"Error loading model from local directory: {e}")
+                raise
         else:
             logging.info("Model not found locally. Downloading...")
             os.makedirs(model_path, exist_ok=True)
             try:
                 # Downloading and saving the model in specified path
-                self.model = whisperx.load_model("large-v2", self.device, compute_type=self.compute_type, download_root=model_path)
+                model = whisperx.load_model(self.model_name, self.device, compute_type=self.compute_type, language=self.language, download_root=model_path)
                 logging.info("Model downloaded and saved successfully.")
+                return model
             except Exception as e:
                 logging.info(f"Error downloading the model: {e}")
+                raise
 
-    def transcribe_audio(self):
-        import whisperx
+    @property
+    def model_key(self):
+        return ModelKey(self.model_name, self.device, self.compute_type, self.language)
+
+    def load_model(self):
+        logging.info("Load the Whisper model.")
+        if self.model is not None:
+            return
+        try:
+            with self.trace.span("load_model"):
+                self.model = self._acquire(self.model_key, self._load_whisper_model)
+        except Exception as e:
+            logging.info(f"Error loading the Whisper model: {e}")
+            raise
+
+    def transcribe_audio(self, on_window=None):
+        """
+        Transcribe the audio, splitting long recordings into windows.
+
+        :param on_window: Optional callback on_window(index, segments) receiving partial
+                          results as each window of a long recording finishes
+        """
         logging.info("Transcribe audio file.")
-        audio = whisperx.load_audio(self.audio_file)
-        self.result_trans = self.model.transcribe(audio, batch_size=self.batch_size)
+        audio = self.audio
+        with self.trace.span("transcribe"):
+            if self._is_long(audio):
+                self.result_trans = transcribe_chunked(
+                    audio, self.model_name, self.device, self.compute_type, language=self.language,
+                    batch_size=self.batch_size, target_seconds=self.chunk_seconds, workers=self.chunk_workers,
+                    on_window=on_window, model=self.model, model_lock=self.registry.inference_lock(self.model_key),
+                )
+                return
+            with self.registry.inference_lock(self.model_key):
+                self.result_trans = self.model.transcribe(audio.samples, batch_size=self.batch_size)
+
+    def _align_key(self, language):
+        return ModelKey("align", self.device, None, language)
+
+    def _align_model(self, language):
+        import whisperx
+        return self._acquire(
+            self._align_key(language),
+            lambda: whisperx.load_align_model(language_code=language, device=self.device),
+        )
+
+    def _diarization_key(self):
+        return ModelKey("diarization", self.device, None, None)
+
+    def _diarization_model(self):
+        import whisperx
+        return self._acquire(
+            self._diarization_key(),
+            lambda: whisperx.DiarizationPipeline(use_auth_token= self.hugging_face_token , device=self.device),
+        )
+
+    def preload(self, languages=("en",)):
+        """
+        Load every model a job needs and keep them referenced until release_models().
+
+        Used by worker pools to load models in the parent before forking.
+        """
+        self.load_model()
+        for language in languages:
+            self._align_model(language)
+        self._diarization_model()
+
+    def _is_long(self, audio):
+        return self.long_audio_seconds is not None and audio.duration > self.long_audio_seconds
+
+    def warm_chunk_pool(self):
+        """Start the process pool long recordings are transcribed in, with the model loaded in every worker."""
+        return get_pool(self.model_name, self.device, self.compute_type, self.language, self.batch_size,
+                        self.chunk_workers)
 
     def align_transcription(self):
         import whisperx
         logging.info("Align the transcription output.")
-        model_a, metadata = whisperx.load_align_model(language_code=self.result_trans["language"], device=self.device)
-        self.result_align = whisperx.align(self.result_trans["segments"], model_a, metadata, self.audio_file, self.device, return_char_alignments=False)
+        audio = self.audio
+        with self.trace.span("align"):
+            language = self.result_trans["language"]
+            model_a, metadata = self._align_model(language)
+            with self.registry.inference_lock(self._align_key(language)):
+                self.result_align = whisperx.align(self.result_trans["segments"], model_a, metadata, audio.samples, self.device, return_char_alignments=False)
 
-    def diarize_audio(self):
-        import whisperx
+    def run_diarization(self):
+        """Find speaker turns; needs only the audio, not the transcript."""
         logging.info("Identify multiple speakers in audio.")
-        diarize_model = whisperx.DiarizationPipeline(use_auth_token= self.hugging_face_token , device=self.device)
-        
-        audio_data = whisperx.load_audio(self.audio_file)
-        self.diarize_segments = diarize_model(audio_data, min_speakers=2, max_speakers=2)
+        audio = self.audio
+        with self.trace.span("diarize"):
+            diarize_model = self._diarization_model()
+            with self.registry.inference_lock(self._diarization_key()):
+                self.diarize_segments = diarize_model(audio.samples, min_speakers=self.min_speakers, max_speakers=self.max_speakers)
         
-        logging.info(self.diarize_segments.speaker.unique())
+        logging.info("Speakers found: %s", self.diarize_segments.speaker.unique())
 
-        uniq_speakers = self.diarize_segments.speaker.unique()
+        return self.diarize_segments.speaker.unique()
+
+    def assign_speakers(self):
+        import whisperx
+        logging.info("Assign speakers to the aligned words.")
+        with self.trace.span("assign_speakers"):
+            return whisperx.assign_word_speakers(self.diarize_segments, self.result_align)
+
+    def diarize_audio(self):
+        uniq_speakers = self.run_diarization()
         
-        final_result = whisperx.assign_word_speakers(self.diarize_segments, self.result_align)
+        final_result = self.assign_speakers()
         
         return final_result, uniq_speakers
 
-    def save_to_json(self, result, filename='data.json'):
+    def run_concurrent(self, on_stage=None, on_window=None):
+        """
+        Run diarization in a background thread while transcription and alignment
+        run in this one, then join both branches for speaker assignment.
+
+        The heavy work in both branches happens in native code that releases the
+        GIL, so wall-clock time is roughly that of the slower branch.
+
+        :param on_stage: Optional callback receiving the name of each finished stage
+        :return: (final_result, uniq_speakers), as from diarize_audio()
+        """
+        def done(stage):
+            if on_stage is not None:
+                on_stage(stage)
+
+        def diarize():
+            uniq_speakers = self.run_diarization()
+            done("diarization")
+            return uniq_speakers
+
+        # Decode before branching so both threads share one buffer, and bring up the window pool
+        # while this is still the only pipeline thread: no process is started once diarization runs.
+        if self._is_long(self.audio) and uses_pool(self.chunk_workers):
+            self.warm_chunk_pool()
+        with ThreadPoolExecutor(max_workers=1, thread_name_prefix="diarization") as executor:
+            diarization = executor.submit(diarize)
+            self.transcribe_audio(on_window=on_window)
+            done("transcription")
+            self.align_transcription()
+            done("alignment")
+            uniq_speakers = diarization.result()
+
+        final_result = self.assign_speakers()
+        done("assignment")
+        return final_result, uniq_speakers
+
+    def save_columnar(self, result, filename='data.ctr'):
+        """Save results in the compact, memory-mappable columnar format."""
+        logging.info("Save transcription results to a columnar transcript file.")
+        with self.trace.span("export"):
+            return save_columnar(result, filename)
+
+    def save_to_json(self, result, filename='data.json', indent=None):
+        """JSON export, kept for compatibility with tools that read data.json."""
         logging.info("Save transcription results to a JSON file.")
-        with open(filename, 'w') as json_file:
-            json.dump(result, json_file, indent=4)
+        with self.trace.span("export"), open(filename, 'w') as json_file:
+            json.dump(result, json_file, indent=indent, separators=None if indent else (',', ':'))
         logging.info(f"Dictionary has been successfully stored in {filename}.")
 
 
@@ -0,0 +1,133 @@
+import subprocess
+import time
+import numpy as np
+from src.logger import logging
+
+SAMPLE_RATE = 16000
+BYTES_PER_SAMPLE = 4  # float32
+
+# Samples handed out per chunk (~30 seconds at 16 kHz, 1.9 MB); this bounds ingest memory.
+CHUNK_SAMPLES = 30 * SAMPLE_RATE
+
+
+class IngestStats:
+    """Throughput of one ffmpeg ingest, filled in while the stream is consumed."""
+
+    def __init__(self, source, sample_rate=SAMPLE_RATE):
+        self.source = source
+        self.sample_rate = sample_rate
+        self.samples = 0
+        self.chunks = 0
+        self.started = time.perf_counter()
+        self.finished = None
+
+    @property
+    def audio_seconds(self):
+        return self.samples / float(self.sample_rate)
+
+    @property
+    def wall_seconds(self):
+        return (self.finished or time.perf_counter()) - self.started
+
+    @property
+    def realtime_factor(self):
+        """Seconds of audio ingested per second of wall time."""
+        wall = self.wall_seconds
+        return self.audio_seconds / wall if wall > 0 else 0.0
+
+    @property
+    def megabytes_per_second(self):
+        wall = self.wall_seconds
+        return self.samples * BYTES_PER_SAMPLE / 1e6 / wall if wall > 0 else 0.0
+
+    def as_dict(self):
+        return {
+            "audio_seconds": round(self.audio_seconds, 2),
+            "wall_seconds": round(self.wall_seconds, 3),
+            "chunks": self.chunks,
+            "realtime_factor": round(self.realtime_factor, 1),
+            "megabytes_per_second": round(self.megabytes_per_second, 1),
+        }
+
+
+def ffmpeg_command(source, sample_rate=SAMPLE_RATE):
+    """ffmpeg invocation that decodes any audio or video source to mono float32 PCM on stdout."""
+    return [
+        "ffmpeg", "-nostdin", "-threads", "0", "-loglevel", "error", "-i", source,
+        "-vn", "-f", "f32le", "-ac", "1", "-ar", str(sample_rate), "-",
+    ]
+
+
+def _read_full(stream, view):
+    """Fill view from stream; returns the number of bytes read, short only at EOF."""
+    filled = 0
+    while filled < len(view):
+        n = stream.readinto(view[filled:])
+        if not n:
+            break
+        filled += n
+    return filled
+
+
+def iter_pcm(source, sample_rate=SAMPLE_RATE, chunk_samples=CHUNK_SAMPLES, stats=None):
+    """
+    Decode source through a single ffmpeg subprocess and yield float32 chunks.
+
+    source can be any local audio or video container, or a URL ffmpeg can
+    open. Every chunk but the last holds exactly chunk_samples samples, and
+    only one chunk is held at a time, so memory stays bounded however long the
+    input is.
+
+    :param stats: Optional IngestStats updated as chunks are produced
+    :raises RuntimeError: if ffmpeg exits with an error
+    """
+    chunk_bytes = chunk_samples * BYTES_PER_SAMPLE
+    process = subprocess.Popen(
+        ffmpeg_command(source, sample_rate), stdout=subprocess.PIPE, stderr=subprocess.DEVNULL
+    )
+    try:
+        while True:
+            buffer = bytearray(chunk_bytes)
+            filled = _read_full(process.stdout, memoryview(buffer))
+            n_samples = filled // BYTES_PER_SAMPLE
+            if n_samples == 0:
+                break
+            if stats is not None:
+                stats.samples += n_samples
+                stats.chunks += 1
+            # A fresh bytearray per chunk keeps the yielded array writable and unshared.
+            yield np.frombuffer(buffer, dtype=np.float32, count=n_samples)
+            if filled < chunk_bytes:
+                break
+    except BaseException:
+        process.kill()
+        raise
+    finally:
+        process.stdout.close()
+        returncode = process.wait()
+        if stats is not None:
+            stats.finished = time.perf_counter()
+
+    if returncode != 0:
+        raise RuntimeError(f"Failed to decode audio: {source}")
+
+
+def log_ingest(stats):
+    logging.info(
+        f"Ingested {stats.source}: {stats.audio_seconds:.1f}s of audio in {stats.wall_seconds:.2f}s "
+        f"({stats.realtime_factor:.0f}x real time, {stats.megabytes_per_second:.1f} MB/s)."
+    )
+
+
+def load_pcm(source, sample_rate=SAMPLE_RATE, chunk_samples=CHUNK_SAMPLES):
+    """
+    Whole source decoded into one float32 array, plus its IngestStats.
+
+    For recordings that may not fit in memory use AudioBuffer.from_file,
+    which spills to a memory-mapped file instead.
+    """
+    stats = IngestStats(source, sample_rate)
+    chunks = list(iter_pcm(source, sample_rate, chunk_samples, stats))
+    samples = np.concatenate(chunks) if chunks else np.zeros(0, dtype=np.float32)
+    log_ingest(stats)
+    return samples, stats
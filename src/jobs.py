@@ -0,0 +1,124 @@
+import asyncio
+import uuid
+from collections import OrderedDict
+from src.logger import job_context, logging
+
+COMPLETE_MESSAGE = "Processing complete!"
+
+
+class QueueFullError(Exception):
+    pass
+
+
+class Job:
+    def __init__(self, audio_path, job_id=None, workspace=None, audio_info=None):
+        self.id = job_id or uuid.uuid4().hex
+        self.audio_path = audio_path
+        self.workspace = workspace
+        self.audio_info = audio_info  # AudioInfo from the upload's headers, when they could be probed
+        self.status = "queued"
+        self.events = []
+        self.result = None
+        self.error = None
+        self._updated = asyncio.Event()
+
+    @property
+    def finished(self):
+        return self.status in ("done", "failed")
+
+
+class JobManager:
+    """
+    Runs pipeline jobs in background threads and fans out their progress.
+
+    The event loop only queues jobs and relays progress messages; the blocking
+    pipeline runs through asyncio.to_thread, so one process can keep serving
+    uploads and SSE streams while jobs are running.
+    """
+
+    def __init__(self, runner, workers=1, max_queue=16, max_jobs=256):
+        """
+        :param runner: Blocking callable runner(job, progress) returning the job result
+        :param workers: Number of jobs processed at the same time
+        :param max_queue: Jobs allowed to wait before submit() refuses new ones
+        :param max_jobs: Finished jobs kept in memory for result lookups
+        """
+        self.runner = runner
+        self.workers = workers
+        self.max_jobs = max_jobs
+        self.jobs = OrderedDict()
+        self._queue = asyncio.Queue(maxsize=max_queue)
+        self._tasks = []
+
+    async def start(self):
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def submit(self, job):
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            raise QueueFullError("Too many jobs are waiting, try again later.")
+        self.jobs[job.id] = job
+        self._trim()
+        self._publish(job, "File uploaded successfully. Waiting for a worker...")
+        return job
+
+    def get(self, job_id):
+        """Look up a job by id; None if it is unknown or was trimmed."""
+        return self.jobs.get(job_id)
+
+    def _trim(self):
+        finished = [job_id for job_id, job in self.jobs.items() if job.finished]
+        for job_id in finished[:max(len(self.jobs) - self.max_jobs, 0)]:
+            del self.jobs[job_id]
+
+    def _publish(self, job, message):
+        job.events.append(message)
+        # Swap in a fresh event so waiters woken now re-arm on the next message.
+        updated, job._updated = job._updated, asyncio.Event()
+        updated.set()
+
+    async def _worker(self):
+        while True:
+            job = await self._queue.get()
+            try:
+                await self._run(job)
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job):
+        loop = asyncio.get_running_loop()
+
+        def progress(message):
+            loop.call_soon_threadsafe(self._publish, job, message)
+
+        job.status = "running"
+        try:
+            # to_thread copies the context, so records logged by the runner carry the job id.
+            with job_context(job.id):
+                job.result = await asyncio.to_thread(self.runner, job, progress)
+            job.status = "done"
+            self._publish(job, COMPLETE_MESSAGE)
+        except Exception as e:
+            logging.info("Job %s failed: %s", job.id, e)
+            job.error = str(e)
+            job.status = "failed"
+            self._publish(job, f"Error: {e}")
+
+    async def events(self, job):
+        """Yield every progress message of job, past and future, until it finishes."""
+        index = 0
+        while True:
+            updated = job._updated
+            while index < len(job.events):
+                yield job.events[index]
+                index += 1
+            if job.finished:
+                return
+            await updated.wait()
@@ -1,25 +1,172 @@
+import copy
+import json
 import logging
+import logging.handlers
+import multiprocessing.util
 import os
-from datetime import datetime
+import queue
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
 
 
-# Creating logs directory to store log in files
-LOG_DIR = "logs"
-LOG_DIR = os.path.join(os.getcwd(), LOG_DIR)
+# Each process writes its own rotating file ({pid} is filled in), since RotatingFileHandler is not
+# safe to share between processes: API workers, pool workers and chunk workers all log.
+LOG_DIR = os.path.join(os.getcwd(), os.getenv("LOG_DIR", "logs"))
+LOG_FILE = os.getenv("LOG_FILE", "app-{pid}.log")
+LOG_MAX_BYTES = int(os.getenv("LOG_MAX_BYTES", str(10 * 1024 * 1024)))
+LOG_BACKUP_COUNT = int(os.getenv("LOG_BACKUP_COUNT", "5"))
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+# One in this many records flagged verbose (large payloads) is written.
+LOG_VERBOSE_SAMPLE_EVERY = int(os.getenv("LOG_VERBOSE_SAMPLE_EVERY", "10"))
+LOG_MAX_MESSAGE_CHARS = int(os.getenv("LOG_MAX_MESSAGE_CHARS", "4000"))
 
-#Creating LOG_DIR if it does not exists.
-os.makedirs(LOG_DIR, exist_ok=True)
+# Job id of whatever the current thread or task is working on; see job_context().
+job_id_var = ContextVar("job_id", default=None)
 
-# Creating file name for log file based on current timestamp
-CURRENT_TIME_STAMP = f"{datetime.now().strftime('%Y-%m-%d-%H-%M-%S')}"
-file_name = f"log_{CURRENT_TIME_STAMP}.log"
 
-#output = log_2023_07_12_4_3_2.log
+@contextmanager
+def job_context(job_id):
+    """Tag every record logged inside the block (and in asyncio.to_thread calls) with job_id."""
+    token = job_id_var.set(job_id)
+    try:
+        yield
+    finally:
+        job_id_var.reset(token)
 
-#Creating file path for projects.
-log_file_path = os.path.join(LOG_DIR, file_name)
 
-logging.basicConfig(filename=log_file_path,
-                    filemode='w',
-                    format='[%(asctime)s] %(name)s - %(levelname)s - %(message)s',
-                    level=logging.INFO)
\ No newline at end of file
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line; truncation and serialisation happen here, in the listener thread."""
+
+    def format(self, record):
+        message = record.getMessage()
+        if len(message) > LOG_MAX_MESSAGE_CHARS:
+            message = f"{message[:LOG_MAX_MESSAGE_CHARS]}... [{len(message) - LOG_MAX_MESSAGE_CHARS} chars truncated]"
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": message,
+            "job_id": getattr(record, "job_id", None),
+            "process": record.process,
+            "thread": record.threadName,
+        }
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class VerboseSampler(logging.Filter):
+    """
+    Keeps one in every `every` records logged with extra={"verbose": True}.
+
+    Runs before anything is formatted, so dropped payloads cost a counter bump.
+    """
+
+    def __init__(self, every=LOG_VERBOSE_SAMPLE_EVERY):
+        super().__init__()
+        self.every = max(every, 1)
+        self._seen = 0
+        # Handlers filter on the logging thread, which may be any of the app's threads.
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        if not getattr(record, "verbose", False):
+            return True
+        with self._lock:
+            seen = self._seen
+            self._seen += 1
+        return seen % self.every == 0
+
+
+class _DeferredQueueHandler(logging.handlers.QueueHandler):
+    """
+    Puts records on an in-process queue; the listener thread writes them.
+
+    Like the stock QueueHandler, the message and traceback are rendered on the
+    calling thread, so arguments mutated after the call are logged as they
+    were. JSON encoding and file I/O are left to the listener, which is
+    started by the first record, and again after a fork.
+    """
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.job_id = job_id_var.get()
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = _exception_formatter.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        _ensure_listener()
+        super().enqueue(record)
+
+    def close(self):
+        # logging.shutdown() closes handlers at exit; drain the queue to disk first.
+        shutdown_logging()
+        super().close()
+
+
+class _RotatingFileHandler(logging.handlers.RotatingFileHandler):
+    """Creates the log directory and file only when the first record is written."""
+
+    def _open(self):
+        os.makedirs(os.path.dirname(self.baseFilename), exist_ok=True)
+        return super()._open()
+
+
+_exception_formatter = logging.Formatter()
+_queue = queue.SimpleQueue()
+_listener = None
+_listener_pid = None
+_listener_lock = threading.Lock()
+
+
+def _ensure_listener():
+    global _listener, _listener_pid
+    if _listener_pid == os.getpid():
+        return
+    with _listener_lock:
+        if _listener_pid == os.getpid():
+            return
+        file_handler = _RotatingFileHandler(
+            os.path.join(LOG_DIR, LOG_FILE.format(pid=os.getpid())),
+            maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT, encoding="utf-8", delay=True,
+        )
+        file_handler.setFormatter(JsonFormatter())
+        _listener = logging.handlers.QueueListener(_queue, file_handler, respect_handler_level=True)
+        _listener.start()
+        _listener_pid = os.getpid()
+        # multiprocessing children leave through os._exit, skipping atexit; its finalizers still run.
+        multiprocessing.util.Finalize(None, shutdown_logging, exitpriority=0)
+
+
+def _after_fork_in_child():
+    # The parent's listener thread does not exist in a forked child; start a fresh one lazily.
+    global _queue, _listener, _listener_pid
+    _queue = queue.SimpleQueue()
+    _handler.queue = _queue
+    _listener, _listener_pid = None, None
+
+
+def shutdown_logging():
+    """Stop the listener after it has written every queued record."""
+    global _listener, _listener_pid
+    if _listener is not None and _listener_pid == os.getpid():
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+    _listener, _listener_pid = None, None
+
+
+_handler = _DeferredQueueHandler(_queue)
+_handler.addFilter(VerboseSampler())
+_root = logging.getLogger()
+_root.addHandler(_handler)
+_root.setLevel(LOG_LEVEL)
+os.register_at_fork(after_in_child=_after_fork_in_child)
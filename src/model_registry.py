@@ -0,0 +1,173 @@
+import threading
+from collections import OrderedDict, namedtuple
+from contextlib import contextmanager
+from src.logger import logging
+
+
+# Models are identified by what actually changes the loaded weights.
+ModelKey = namedtuple("ModelKey", ["name", "device", "compute_type", "language"])
+
+
+def _estimate_size_mb(model):
+    """Best-effort size of a loaded model in MB (torch modules only)."""
+    if isinstance(model, (tuple, list)):
+        # e.g. whisperx.load_align_model() returns (model, metadata).
+        return sum(_estimate_size_mb(part) for part in model)
+    candidates = [model, getattr(model, "model", None)]
+    for candidate in candidates:
+        parameters = getattr(candidate, "parameters", None)
+        if callable(parameters):
+            try:
+                return sum(p.numel() * p.element_size() for p in parameters()) / (1024 * 1024)
+            except Exception:
+                pass
+    return 0.0
+
+
+class _Entry:
+    __slots__ = ("model", "size_mb", "refcount", "lock", "inference", "loaded")
+
+    def __init__(self):
+        self.model = None
+        self.size_mb = 0.0
+        self.refcount = 0
+        self.lock = threading.Lock()  # held while loading
+        self.inference = threading.Lock()  # held while the model is called
+        self.loaded = False
+
+
+class ModelRegistry:
+    """
+    Process-wide cache of loaded models.
+
+    Models are loaded lazily on the first acquire() and shared by every caller
+    asking for the same key. Entries are reference counted; only unreferenced
+    entries are evicted, least recently used first, once either max_models or
+    memory_budget_mb is exceeded.
+
+    A shared model must only be called while holding inference_lock(key):
+    whisperx keeps per-call state on its pipelines and tokenizers, so two
+    threads calling one model at once can mix up each other's results.
+    """
+
+    def __init__(self, max_models=4, memory_budget_mb=None):
+        self.max_models = max_models
+        self.memory_budget_mb = memory_budget_mb
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def acquire(self, key, loader, size_mb=None):
+        """
+        Return the model for key, calling loader() only if it is not cached yet.
+
+        :param key: ModelKey identifying the model
+        :param loader: Zero-argument callable that loads the model
+        :param size_mb: Optional size hint used for the memory budget
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = _Entry()
+                self._entries[key] = entry
+            self._entries.move_to_end(key)
+            entry.refcount += 1
+
+        # Loading happens outside the registry lock so that different models
+        # can load in parallel, while callers of the same key wait on each other.
+        try:
+            with entry.lock:
+                if entry.loaded:
+                    with self._lock:
+                        self.hits += 1
+                    logging.info(f"Model registry hit for {key}.")
+                    return entry.model
+
+                logging.info(f"Model registry miss for {key}, loading.")
+                model = loader()
+                entry.model = model
+                entry.size_mb = size_mb if size_mb is not None else _estimate_size_mb(model)
+                entry.loaded = True
+                with self._lock:
+                    self.misses += 1
+        except Exception:
+            self.release(key)
+            raise
+
+        self._evict()
+        return entry.model
+
+    def release(self, key):
+        """Drop one reference to key; the model stays cached until evicted."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return
+            entry.refcount = max(entry.refcount - 1, 0)
+            if not entry.loaded and entry.refcount == 0:
+                # A failed load leaves nothing worth keeping.
+                del self._entries[key]
+        self._evict()
+
+    @contextmanager
+    def use(self, key, loader, size_mb=None):
+        model = self.acquire(key, loader, size_mb=size_mb)
+        try:
+            yield model
+        finally:
+            self.release(key)
+
+    def inference_lock(self, key):
+        """
+        Lock serializing calls into the model for key.
+
+        The caller must hold a reference from acquire(), which keeps the entry
+        (and so the lock) alive.
+        """
+        with self._lock:
+            return self._entries[key].inference
+
+    def _over_budget(self):
+        loaded = [e for e in self._entries.values() if e.loaded]
+        if self.max_models is not None and len(loaded) > self.max_models:
+            return True
+        if self.memory_budget_mb is not None:
+            return sum(e.size_mb for e in loaded) > self.memory_budget_mb
+        return False
+
+    def _evict(self):
+        with self._lock:
+            while self._over_budget():
+                victim = next(
+                    (k for k, e in self._entries.items() if e.loaded and e.refcount == 0),
+                    None,
+                )
+                if victim is None:
+                    logging.info("Model registry over budget but every model is in use.")
+                    break
+                del self._entries[victim]
+                self.evictions += 1
+                logging.info(f"Evicted {victim} from model registry.")
+
+    def clear(self):
+        """Forget every unreferenced model."""
+        with self._lock:
+            for key in [k for k, e in self._entries.items() if e.refcount == 0]:
+                del self._entries[key]
+
+    def stats(self):
+        with self._lock:
+            loaded = [e for e in self._entries.values() if e.loaded]
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "models": len(loaded),
+                "memory_mb": round(sum(e.size_mb for e in loaded), 1),
+                "in_use": sum(1 for e in self._entries.values() if e.refcount > 0),
+            }
+
+
+model_registry = ModelRegistry()
@@ -0,0 +1,90 @@
+from src.logger import logging
+from src.analytics import conversation_analytics
+from src.dairization import WhisperTranscriber
+from src.result_store import result_key
+from src.summarization import summarise_conversation
+from src.utils import build_conversation, count_words, extract_speaker_texts
+
+STAGE_MESSAGES = {
+    "transcription": "Transcription completed!",
+    "alignment": "Alignment completed!",
+    "diarization": "Diarization completed!",
+}
+
+
+def run_pipeline(audio_path, huggingface_token, groq_api_key, progress=None, result_store=None,
+                 **transcriber_kwargs):
+    """
+    Run transcription, alignment, diarization, summarization and stats for one file.
+
+    :param progress: Optional callable receiving a status message after each stage
+    :param result_store: Optional ResultStore used to skip recordings that were already processed
+    :return: Dict with conversation, summary_data, audio_duration, total_words, words_by_speaker, analytics
+             and timings, the per-stage report of transcriber.trace (not kept in the result store)
+    """
+    def report(message):
+        logging.info(message)
+        if progress is not None:
+            progress(message)
+
+    transcriber = WhisperTranscriber(audio_path, huggingface_token, **transcriber_kwargs)
+    transcriber.start_process()
+    trace = transcriber.trace
+
+    job_key = None
+    if result_store is not None:
+        with open(audio_path, "rb") as file:
+            job_key = result_key(file, **transcriber.pipeline_params())
+        stored = result_store.get(job_key)
+        if stored is not None:
+            report("Loaded stored result for this recording.")
+            return {**stored, "timings": trace.report()}
+
+    try:
+        report("Loading model...")
+        transcriber.load_model()
+        report("Model loaded successfully!")
+
+        # Diarization runs alongside transcription and alignment
+        final_result, uniq_speakers = transcriber.run_concurrent(
+            on_stage=lambda stage: stage in STAGE_MESSAGES and report(STAGE_MESSAGES[stage]),
+            on_window=lambda index, segments: report(f"Transcribed window {index + 1} ({len(segments)} segments)."),
+        )
+
+        # Captured in seconds before the buffer is released; minutes are rounded for display only
+        audio_seconds = transcriber.audio.duration
+    finally:
+        transcriber.release_models()
+        transcriber.release_audio()
+
+    # The result is handed over in memory and one typed model feeds the rendering, summaries and stats
+    conversation_model = build_conversation(uniq_speakers=uniq_speakers, result=final_result)
+
+    with trace.span("summarize"):
+        speaker_texts = extract_speaker_texts(conversation_model)
+        summaries = summarise_conversation(groq_api_key=groq_api_key, speaker_texts=speaker_texts, conversation=conversation_model.to_lines())
+    report("Summarization completed!")
+
+    with trace.span("analytics"):
+        total_words, words_by_speaker = count_words(conversation_model)
+        analytics = conversation_analytics(final_result["word_segments"], audio_duration=audio_seconds,
+                                           speaker_labels=conversation_model.speaker_labels)
+    result = {
+        "conversation": conversation_model.to_html(),
+        "summary_data": {
+            "Speaker": list(summaries.keys()),
+            "Summary": list(summaries.values()),
+        },
+        "audio_duration": round(audio_seconds / 60, 2),
+        "total_words": total_words,
+        "words_by_speaker": words_by_speaker,
+        "analytics": analytics,
+    }
+    if result_store is not None:
+        with trace.span("store"):
+            result_store.put(job_key, result)
+
+    elapsed_time = transcriber.end_process()
+    logging.info(f"Pipeline finished in {elapsed_time:.2f} seconds.")
+    result["timings"] = trace.report()
+    return result
@@ -0,0 +1,170 @@
+import os
+import shutil
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from src.logger import logging
+from src.streaming import PcmRingBuffer
+
+SAMPLE_RATE = 16000
+# Each closed segment is one compressed file, handed to on_segment as soon as it closes.
+SEGMENT_SECONDS = 30
+# Audio the capture callback can get ahead of the writer thread before samples are lost.
+RING_SECONDS = 10
+
+Segment = namedtuple("Segment", ["index", "path", "start", "end"])
+
+
+class SegmentRecorder:
+    """
+    Records from the default input device for as long as needed in constant memory.
+
+    The sounddevice callback only copies each block into a fixed-size ring
+    buffer. A writer thread drains the ring into a FLAC file that is closed
+    every segment_seconds, so memory use does not grow with the length of the
+    recording. Each closed segment is passed to on_segment in a background
+    thread (e.g. to transcribe it) while recording continues.
+    """
+
+    def __init__(self, directory, sample_rate=SAMPLE_RATE, segment_seconds=SEGMENT_SECONDS,
+                 ring_seconds=RING_SECONDS, on_segment=None, segment_workers=1):
+        """
+        :param directory: Where segment files are written
+        :param on_segment: Optional callable(segment) run for every closed segment; see results()
+        :param segment_workers: Threads running on_segment
+        """
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.sample_rate = sample_rate
+        self.segment_samples = int(segment_seconds * sample_rate)
+        self.ring = PcmRingBuffer(ring_seconds, sample_rate)
+        self.on_segment = on_segment
+        self.segments = []
+        self.overflowed = 0  # samples lost because the writer fell a full ring behind
+        self._lock = threading.Lock()
+        self._data_ready = threading.Event()
+        self._stopping = threading.Event()
+        self._stream = None
+        self._writer = None
+        self._position = 0  # absolute sample position written to segment files
+        self._file = None
+        self._file_start = 0
+        self._futures = []
+        self._executor = ThreadPoolExecutor(max_workers=segment_workers) if on_segment else None
+
+    @property
+    def duration(self):
+        """Seconds of audio captured, counted in samples rather than wall-clock time."""
+        return self.ring.total / float(self.sample_rate)
+
+    @property
+    def is_recording(self):
+        return self._stream is not None
+
+    def _callback(self, indata, frames, time_info, status):
+        if status:
+            logging.info(f"Recorder input status: {status}")
+        with self._lock:
+            self.ring.write(indata[:, 0])
+        self._data_ready.set()
+
+    def start(self):
+        import sounddevice as sd
+
+        self._writer = threading.Thread(target=self._write_loop, name="segment-writer", daemon=True)
+        self._writer.start()
+        self._stream = sd.InputStream(samplerate=self.sample_rate, channels=1, dtype="int16",
+                                      callback=self._callback)
+        self._stream.start()
+        logging.info(f"Recording into {self.directory}.")
+
+    def stop(self):
+        """Stop capturing, write out what is buffered and close the last segment."""
+        if self._stream is not None:
+            self._stream.stop()
+            self._stream.close()
+            self._stream = None
+        self._stopping.set()
+        self._data_ready.set()
+        if self._writer is not None:
+            self._writer.join()
+            self._writer = None
+        logging.info(f"Recorded {self.duration:.1f}s in {len(self.segments)} segments "
+                     f"({self.overflowed} samples lost).")
+        return self.segments
+
+    def _write_loop(self):
+        while True:
+            self._data_ready.wait()
+            self._data_ready.clear()
+            self._drain()
+            if self._stopping.is_set():
+                self._drain()
+                self._close_segment()
+                return
+
+    def _drain(self):
+        with self._lock:
+            if self._position < self.ring.start:
+                self.overflowed += self.ring.start - self._position
+                self._position = self.ring.start
+            end = self.ring.total
+            samples = self.ring.read(self._position, end)
+
+        offset = 0
+        while offset < len(samples):
+            if self._file is None:
+                self._open_segment()
+            room = self.segment_samples - (self._position - self._file_start)
+            block = samples[offset:offset + room]
+            self._file.write(block)
+            offset += len(block)
+            self._position += len(block)
+            if self._position - self._file_start >= self.segment_samples:
+                self._close_segment()
+
+    def _open_segment(self):
+        import soundfile as sf
+
+        path = os.path.join(self.directory, f"segment_{len(self.segments):05d}.flac")
+        self._file = sf.SoundFile(path, "w", samplerate=self.sample_rate, channels=1,
+                                  subtype="PCM_16", format="FLAC")
+        self._file_start = self._position
+
+    def _close_segment(self):
+        if self._file is None:
+            return
+        self._file.close()
+        segment = Segment(len(self.segments), self._file.name,
+                          self._file_start / self.sample_rate, self._position / self.sample_rate)
+        self._file = None
+        self.segments.append(segment)
+        if self._executor is not None:
+            self._futures.append(self._executor.submit(self.on_segment, segment))
+
+    def results(self):
+        """on_segment results in segment order; waits for segments still being processed."""
+        return [future.result() for future in self._futures]
+
+    def read(self):
+        """The whole recording as one int16 array (reads the segment files back)."""
+        import soundfile as sf
+
+        parts = [sf.read(segment.path, dtype="int16")[0] for segment in self.segments]
+        return np.concatenate(parts) if parts else np.zeros(0, dtype=np.int16)
+
+    def close(self):
+        if self.is_recording:
+            self.stop()
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+
+    def cleanup(self):
+        """Close the recorder, dropping segments not yet processed, and remove its segment files."""
+        if self.is_recording:
+            self.stop()
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+        shutil.rmtree(self.directory, ignore_errors=True)
+        logging.info(f"Removed recording {self.directory}.")
@@ -0,0 +1,126 @@
+import hashlib
+import json
+import os
+import tempfile
+from src.logger import logging
+
+RESULTS_DIR = os.path.join(os.getcwd(), "results")
+# Bytes hashed at a time when the audio is given as a file.
+HASH_CHUNK_BYTES = 1024 * 1024
+
+
+def result_key(audio, **params):
+    """
+    Content hash of the uploaded audio plus every parameter that changes the output.
+
+    :param audio: Raw bytes (or a buffer) of the uploaded file, or a binary file object,
+                  which is hashed in chunks rather than read whole
+    :param params: Pipeline parameters such as model, compute_type, batch_size and speaker bounds
+    """
+    digest = hashlib.sha256()
+    if hasattr(audio, "readinto"):
+        chunk = bytearray(HASH_CHUNK_BYTES)
+        view = memoryview(chunk)
+        while size := audio.readinto(chunk):
+            digest.update(view[:size])
+    else:
+        digest.update(memoryview(audio))
+    digest.update(json.dumps(params, sort_keys=True).encode("utf-8"))
+    return digest.hexdigest()
+
+
+class LocalResultBackend:
+    """Stores results as JSON files under a directory shared by every process on the host."""
+
+    def __init__(self, root=RESULTS_DIR):
+        # Directories are created by the first put(), not when the store is built at import.
+        self.root = root
+
+    def _path(self, key):
+        # Two-level fan-out keeps directories small.
+        return os.path.join(self.root, key[:2], f"{key}.json")
+
+    def get(self, key):
+        try:
+            with open(self._path(key), "rb") as file:
+                return file.read()
+        except FileNotFoundError:
+            return None
+
+    def put(self, key, payload):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write then rename so concurrent readers never see a partial file.
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(fd, "wb") as file:
+            file.write(payload)
+        os.replace(tmp_path, path)
+
+
+class S3ResultBackend:
+    """Stores results in any S3-compatible bucket."""
+
+    def __init__(self, bucket, prefix="results", s3_client=None):
+        self._s3_client = s3_client
+        self.bucket = bucket
+        self.prefix = prefix.strip("/")
+
+    @property
+    def s3_client(self):
+        # Built on first use: importing boto3 and resolving credentials is slow.
+        if self._s3_client is None:
+            import boto3
+            self._s3_client = boto3.client("s3", endpoint_url=os.getenv("S3_ENDPOINT_URL"))
+        return self._s3_client
+
+    def _key(self, key):
+        return f"{self.prefix}/{key}.json" if self.prefix else f"{key}.json"
+
+    def get(self, key):
+        try:
+            response = self.s3_client.get_object(Bucket=self.bucket, Key=self._key(key))
+        except self.s3_client.exceptions.NoSuchKey:
+            return None
+        return response["Body"].read()
+
+    def put(self, key, payload):
+        self.s3_client.put_object(
+            Bucket=self.bucket, Key=self._key(key), Body=payload, ContentType="application/json"
+        )
+
+
+class ResultStore:
+    """Deduplicates pipeline runs by returning stored results for identical uploads."""
+
+    def __init__(self, backend):
+        self.backend = backend
+
+    def get(self, key):
+        try:
+            payload = self.backend.get(key)
+        except Exception as e:
+            logging.info(f"Result store lookup failed for {key}: {e}")
+            return None
+        if payload is None:
+            return None
+        logging.info(f"Result store hit for {key}.")
+        return json.loads(payload)
+
+    def put(self, key, result):
+        try:
+            self.backend.put(key, json.dumps(result).encode("utf-8"))
+            logging.info(f"Stored pipeline result {key}.")
+        except Exception as e:
+            logging.info(f"Failed to store pipeline result {key}: {e}")
+
+
+def get_result_store():
+    """
+    Build the store from RESULT_STORE_URL: ``s3://bucket/prefix`` or a local
+    directory path. Defaults to the local results/ directory.
+    """
+    url = os.getenv("RESULT_STORE_URL", RESULTS_DIR)
+    if url.startswith("s3://"):
+        bucket, _, prefix = url[len("s3://"):].partition("/")
+        return ResultStore(S3ResultBackend(bucket, prefix or "results"))
+    return ResultStore(LocalResultBackend(url))
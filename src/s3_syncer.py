@@ -1,65 +1,473 @@
+import hashlib
+import json
 import os
-import boto3
-from botocore.exceptions import NoCredentialsError, PartialCredentialsError
+import random
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+# boto3 itself is imported when the first client is built; the exceptions module is cheap.
+from botocore.exceptions import (
+    ClientError,
+    ConnectionClosedError,
+    ConnectTimeoutError,
+    EndpointConnectionError,
+    NoCredentialsError,
+    PartialCredentialsError,
+    ReadTimeoutError,
+)
+from src.logger import logging
+
+MANIFEST_NAME = ".s3sync-manifest.json"
+# Error codes worth retrying; anything else (access denied, missing bucket) fails at once.
+TRANSIENT_ERROR_CODES = {
+    "RequestTimeout", "RequestTimeTooSkewed", "SlowDown", "Throttling", "ThrottlingException",
+    "InternalError", "ServiceUnavailable", "500", "502", "503", "504",
+}
+
+
+def file_sha256(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def local_etag(path, remote_etag, chunk_size=1 << 20):
+    """
+    S3-style ETag of a local file, shaped like remote_etag.
+
+    Single-part ETags are the MD5 of the content. Multipart ETags ("<md5>-<parts>")
+    are the MD5 of the part MD5s, so the part size is guessed from the number
+    of parts; returns None when no common part size fits.
+    """
+    if "-" not in remote_etag:
+        digest = hashlib.md5()
+        with open(path, "rb") as file:
+            for chunk in iter(lambda: file.read(chunk_size), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    parts = int(remote_etag.rsplit("-", 1)[1])
+    size = os.path.getsize(path)
+    mib = 1024 * 1024
+    candidates = [8 * mib, 16 * mib, 5 * mib, -(-size // parts // mib) * mib]
+    for part_size in dict.fromkeys(candidates):
+        if part_size <= 0 or -(-size // part_size) != parts:
+            continue
+        part_digests = []
+        with open(path, "rb") as file:
+            for part in iter(lambda: file.read(part_size), b""):
+                part_digests.append(hashlib.md5(part).digest())
+        etag = f"{hashlib.md5(b''.join(part_digests)).hexdigest()}-{parts}"
+        if etag == remote_etag:
+            return etag
+    return None
+
+
+def _wrapped_client_error(error):
+    """The ClientError boto3 wrapped in an S3UploadFailedError, if it kept one."""
+    while error is not None and not isinstance(error, ClientError):
+        error = error.__cause__ or error.__context__
+    return error
+
+
+def is_transient(error):
+    from boto3.exceptions import S3UploadFailedError
+
+    if isinstance(error, (EndpointConnectionError, ConnectionClosedError, ReadTimeoutError, ConnectTimeoutError)):
+        return True
+    if isinstance(error, S3UploadFailedError):
+        # upload_file raises it from inside `except ClientError`; only the wrapped code says whether to retry.
+        error = _wrapped_client_error(error.__cause__ or error.__context__)
+        if error is None:
+            return False
+    if isinstance(error, ClientError):
+        return error.response.get("Error", {}).get("Code") in TRANSIENT_ERROR_CODES
+    return False
+
+
+def upload_etag(path, transfer_config, chunk_size=1 << 20):
+    """
+    The ETag S3 gives path when it is uploaded with transfer_config.
+
+    Plain uploads get the MD5 of the content, multipart uploads the MD5 of the
+    part MD5s. Encrypted buckets use other ETags; a mismatch only costs one
+    local comparison on the next download sync.
+    """
+    size = os.path.getsize(path)
+    if size < transfer_config.multipart_threshold:
+        digest = hashlib.md5()
+        with open(path, "rb") as file:
+            for chunk in iter(lambda: file.read(chunk_size), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+    part_size = transfer_config.multipart_chunksize
+    part_digests = []
+    with open(path, "rb") as file:
+        for part in iter(lambda: file.read(part_size), b""):
+            part_digests.append(hashlib.md5(part).digest())
+    return f"{hashlib.md5(b''.join(part_digests)).hexdigest()}-{len(part_digests)}"
+
+
+class SyncManifest:
+    """
+    What was last synced for each local file: size, mtime, sha256 and the object's ETag.
+
+    Unchanged size and mtime skip a file without reading it; a changed mtime
+    with the same content hash skips it after one read.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        try:
+            with open(path) as file:
+                self.entries = json.load(file)
+        except (FileNotFoundError, ValueError):
+            self.entries = {}
+
+    def unchanged(self, relative_path, stat, bucket, key):
+        entry = self.entries.get(relative_path)
+        if entry is None or entry.get("bucket") != bucket or entry.get("key") != key:
+            return False, None
+        if entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns:
+            return True, entry["sha256"]
+        return False, entry["sha256"] if entry["size"] == stat.st_size else None
+
+    def record(self, relative_path, stat, sha256, bucket, key, etag):
+        self.entries[relative_path] = {
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "sha256": sha256,
+            "bucket": bucket,
+            "key": key,
+            "etag": etag,
+        }
+
+    def save(self):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        # Write then rename so an interrupted sync never leaves a truncated manifest.
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(fd, "w") as file:
+            json.dump(self.entries, file, indent=1, sort_keys=True)
+        os.replace(tmp_path, self.path)
+
+
+class SyncReport:
+    """Counts and throughput of one sync run."""
+
+    def __init__(self, direction):
+        self.direction = direction
+        self.transferred = 0
+        self.skipped = 0
+        self.failed = []
+        self.bytes = 0
+        self.started = time.perf_counter()
+        self.seconds = 0.0
+
+    def finish(self):
+        self.seconds = time.perf_counter() - self.started
+        logging.info(f"S3 {self.direction}: {self.as_dict()}")
+        return self
+
+    @property
+    def megabytes_per_second(self):
+        return self.bytes / 1e6 / self.seconds if self.seconds > 0 else 0.0
+
+    def as_dict(self):
+        return {
+            "transferred": self.transferred,
+            "skipped": self.skipped,
+            "failed": len(self.failed),
+            "bytes": self.bytes,
+            "seconds": round(self.seconds, 3),
+            "megabytes_per_second": round(self.megabytes_per_second, 2),
+        }
+
 
 class S3Sync:
-    def __init__(self,AWS_ACCESS_KEY_ID,AWS_SECRET_ACCESS_KEY,AWS_REGION):
-        self.s3_client = boto3.client(
-            's3',
-            aws_access_key_id=AWS_ACCESS_KEY_ID,
-            aws_secret_access_key=AWS_SECRET_ACCESS_KEY,
-            region_name=AWS_REGION
+    """
+    Parallel, incremental sync between local folders and S3.
+
+    Pass s3_client to use any S3-compatible endpoint or a local stand-in such
+    as moto; otherwise a client is built from the credentials and the
+    S3_ENDPOINT_URL environment variable on first use, so constructing an
+    S3Sync neither imports boto3 nor resolves credentials.
+    """
+
+    def __init__(self, AWS_ACCESS_KEY_ID=None, AWS_SECRET_ACCESS_KEY=None, AWS_REGION=None, s3_client=None,
+                 max_workers=8, transfer_config=None, max_attempts=5, retry_backoff=0.5,
+                 range_threshold=64 * 1024 * 1024, range_size=16 * 1024 * 1024):
+        """
+        :param max_workers: Files transferred at the same time
+        :param transfer_config: boto3 TransferConfig used for every file (multipart size and concurrency)
+        :param max_attempts: Attempts per file before it is reported as failed
+        :param retry_backoff: First retry delay in seconds; doubles on every attempt
+        :param range_threshold: Objects larger than this are downloaded in ranged GETs
+        :param range_size: Bytes per ranged GET
+        """
+        self.max_workers = max_workers
+        self.max_attempts = max_attempts
+        self.retry_backoff = retry_backoff
+        self.range_threshold = range_threshold
+        self.range_size = range_size
+        self._credentials = (AWS_ACCESS_KEY_ID, AWS_SECRET_ACCESS_KEY, AWS_REGION)
+        self._transfer_config = transfer_config
+        self._s3_client = s3_client
+        self._client_lock = threading.Lock()
+
+    @property
+    def transfer_config(self):
+        if self._transfer_config is None:
+            from boto3.s3.transfer import TransferConfig
+
+            self._transfer_config = TransferConfig(
+                multipart_threshold=16 * 1024 * 1024,
+                multipart_chunksize=16 * 1024 * 1024,
+                max_concurrency=4,
+                use_threads=True,
+            )
+        return self._transfer_config
+
+    @property
+    def s3_client(self):
+        if self._s3_client is None:
+            with self._client_lock:
+                if self._s3_client is None:
+                    import boto3
+                    from botocore.config import Config
+
+                    access_key, secret_key, region = self._credentials
+                    self._s3_client = boto3.client(
+                        's3',
+                        aws_access_key_id=access_key,
+                        aws_secret_access_key=secret_key,
+                        region_name=region,
+                        endpoint_url=os.getenv("S3_ENDPOINT_URL"),
+                        # Enough pooled connections for every worker's multipart threads. Retries are
+                        # left to _with_retries, which knows which errors are worth another attempt.
+                        config=Config(
+                            max_pool_connections=self.max_workers * self.transfer_config.max_request_concurrency,
+                            retries={"total_max_attempts": 1, "mode": "standard"},
+                        ),
+                    )
+        return self._s3_client
+
+    def _with_retries(self, description, fn, *args, **kwargs):
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                return fn(*args, **kwargs)
+            except Exception as e:
+                if attempt == self.max_attempts or not is_transient(e):
+                    raise
+                delay = self.retry_backoff * 2 ** (attempt - 1) * (0.5 + random.random())
+                logging.info(f"{description} failed ({e}); retrying in {delay:.2f}s.")
+                time.sleep(delay)
+
+    def upload_object(self, local_file_path, bucket, key, metadata=None, content_type=None, head_object=False):
+        """
+        Upload one file with retries.
+
+        :param head_object: Fetch the stored object's ETag with a HEAD request and return it
+        :return: The object's ETag when head_object is set, otherwise None
+        """
+        extra_args = {}
+        if metadata:
+            extra_args["Metadata"] = metadata
+        if content_type:
+            extra_args["ContentType"] = content_type
+        self._with_retries(
+            f"Upload of {local_file_path}", self.s3_client.upload_file, local_file_path, bucket, key,
+            ExtraArgs=extra_args or None, Config=self.transfer_config,
         )
+        if not head_object:
+            return None
+        head = self._with_retries(f"HEAD of {key}", self.s3_client.head_object, Bucket=bucket, Key=key)
+        return head["ETag"].strip('"')
 
-    def sync_folder_to_s3(self, folder, aws_bucket_name):
+    def sync_folder_to_s3(self, folder, aws_bucket_name, prefix="", manifest_path=None):
         """
         Sync a local folder to an S3 bucket.
-        
+
+        Files whose size, mtime or content hash match the manifest from the
+        last sync are skipped; the rest are uploaded in parallel.
+
         :param folder: Local folder path to sync
         :param aws_bucket_name: Name of the S3 bucket
+        :param prefix: Key prefix the folder is uploaded under
+        :param manifest_path: Where the sync manifest is kept; defaults to a file inside folder
+        :return: SyncReport with counts and throughput
         """
-        try:
-            for root, _, files in os.walk(folder):
-                for file in files:
-                    local_file_path = os.path.join(root, file)
-                    # Create the relative path for S3
-                    relative_path = os.path.relpath(local_file_path, folder)
-                    s3_file_path = os.path.join(aws_bucket_name, relative_path)
+        manifest_path = manifest_path or os.path.join(folder, MANIFEST_NAME)
+        manifest = SyncManifest(manifest_path)
+        report = SyncReport("upload")
+        prefix = prefix.strip("/")
 
-                    # Upload the file
-                    self.s3_client.upload_file(local_file_path, aws_bucket_name, relative_path)
-                    print(f"Uploaded {local_file_path} to s3://{aws_bucket_name}/{relative_path}")
+        pending = []
+        for root, _, files in os.walk(folder):
+            for file in files:
+                local_file_path = os.path.join(root, file)
+                if os.path.abspath(local_file_path) == os.path.abspath(manifest_path):
+                    continue
+                # Create the relative path for S3
+                relative_path = os.path.relpath(local_file_path, folder).replace(os.sep, "/")
+                key = f"{prefix}/{relative_path}" if prefix else relative_path
+                stat = os.stat(local_file_path)
+                unchanged, known_hash = manifest.unchanged(relative_path, stat, aws_bucket_name, key)
+                if unchanged:
+                    report.skipped += 1
+                    continue
+                sha256 = file_sha256(local_file_path)
+                if sha256 == known_hash:
+                    # Touched but not modified: remember the new mtime and skip it.
+                    entry = manifest.entries[relative_path]
+                    manifest.record(relative_path, stat, sha256, aws_bucket_name, key, entry["etag"])
+                    report.skipped += 1
+                    continue
+                pending.append((local_file_path, relative_path, key, stat, sha256))
+
+        try:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                futures = {
+                    executor.submit(self.upload_object, item[0], aws_bucket_name, item[2]): item for item in pending
+                }
+                for future in as_completed(futures):
+                    local_file_path, relative_path, key, stat, sha256 = futures[future]
+                    try:
+                        future.result()
+                        etag = upload_etag(local_file_path, self.transfer_config)
+                    except (NoCredentialsError, PartialCredentialsError):
+                        raise
+                    except Exception as e:
+                        logging.info(f"Failed to upload {local_file_path}: {e}")
+                        report.failed.append(relative_path)
+                        continue
+                    manifest.record(relative_path, stat, sha256, aws_bucket_name, key, etag)
+                    report.transferred += 1
+                    report.bytes += stat.st_size
+                    logging.info("Uploaded %s to s3://%s/%s", local_file_path, aws_bucket_name, key)
 
         except (NoCredentialsError, PartialCredentialsError) as e:
             print("Credentials not available or incomplete.")
             print(e)
+        finally:
+            manifest.save()
 
-    def sync_folder_from_s3(self, folder, aws_bucket_name):
+        return report.finish()
+
+    def _download(self, bucket, key, etag, size, local_file_path):
+        """Stream one object to local_file_path; large objects are fetched in ranged GETs."""
+        os.makedirs(os.path.dirname(local_file_path) or ".", exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(local_file_path) or ".", suffix=".part")
+        try:
+            with os.fdopen(fd, "wb") as file:
+                if size <= self.range_threshold:
+                    ranges = [None]
+                else:
+                    ranges = [(start, min(start + self.range_size, size) - 1)
+                              for start in range(0, size, self.range_size)]
+                for byte_range in ranges:
+                    self._with_retries(f"Download of {key}", self._fetch, file, bucket, key, etag, byte_range)
+            os.replace(tmp_path, local_file_path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+        return os.stat(local_file_path), file_sha256(local_file_path)
+
+    def _fetch(self, file, bucket, key, etag, byte_range):
+        kwargs = {"Bucket": bucket, "Key": key, "IfMatch": f'"{etag}"'}
+        if byte_range is not None:
+            kwargs["Range"] = f"bytes={byte_range[0]}-{byte_range[1]}"
+        # A retried range starts over at its own offset.
+        file.seek(byte_range[0] if byte_range is not None else 0)
+        file.truncate()
+        body = self.s3_client.get_object(**kwargs)["Body"]
+        for chunk in body.iter_chunks(1 << 20):
+            file.write(chunk)
+
+    def sync_folder_from_s3(self, folder, aws_bucket_name, prefix="", manifest_path=None):
         """
         Sync an S3 bucket to a local folder.
-        
+
+        Every page of the listing is read, and only objects whose size or
+        ETag differ from the local copy are downloaded, in parallel.
+
         :param folder: Local folder path to sync
         :param aws_bucket_name: Name of the S3 bucket
+        :param prefix: Only keys under this prefix are synced, into folder without the prefix
+        :param manifest_path: Where the sync manifest is kept; defaults to a file inside folder
+        :return: SyncReport with counts and throughput
         """
-        try:
-            # List objects in the specified S3 bucket
-            response = self.s3_client.list_objects_v2(Bucket=aws_bucket_name)
-
-            if 'Contents' in response:
-                for obj in response['Contents']:
-                    s3_file_path = obj['Key']
-                    local_file_path = os.path.join(folder, s3_file_path)
+        manifest_path = manifest_path or os.path.join(folder, MANIFEST_NAME)
+        manifest = SyncManifest(manifest_path)
+        report = SyncReport("download")
+        prefix = prefix.strip("/")
+        list_prefix = f"{prefix}/" if prefix else ""
 
-                    # Create directories if they don't exist
-                    os.makedirs(os.path.dirname(local_file_path), exist_ok=True)
-
-                    # Download the file
-                    self.s3_client.download_file(aws_bucket_name, s3_file_path, local_file_path)
-                    print(f"Downloaded s3://{aws_bucket_name}/{s3_file_path} to {local_file_path}")
+        try:
+            pending = []
+            paginator = self.s3_client.get_paginator("list_objects_v2")
+            for page in paginator.paginate(Bucket=aws_bucket_name, Prefix=list_prefix):
+                for obj in page.get("Contents", ()):
+                    key = obj["Key"]
+                    relative_path = key[len(list_prefix):]
+                    if not relative_path or key.endswith("/") or relative_path == MANIFEST_NAME:
+                        continue
+                    local_file_path = os.path.join(folder, *relative_path.split("/"))
+                    etag = obj["ETag"].strip('"')
+                    if self._is_current(manifest, local_file_path, relative_path, aws_bucket_name, key,
+                                        obj["Size"], etag):
+                        report.skipped += 1
+                        continue
+                    pending.append((key, relative_path, local_file_path, etag, obj["Size"]))
 
-            else:
+            if not pending and not report.skipped:
                 print("No files found in the specified S3 bucket.")
 
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                futures = {
+                    executor.submit(self._download, aws_bucket_name, key, etag, size, local_file_path):
+                        (key, relative_path, local_file_path, etag, size)
+                    for key, relative_path, local_file_path, etag, size in pending
+                }
+                for future in as_completed(futures):
+                    key, relative_path, local_file_path, etag, size = futures[future]
+                    try:
+                        stat, sha256 = future.result()
+                    except (NoCredentialsError, PartialCredentialsError):
+                        raise
+                    except Exception as e:
+                        logging.info(f"Failed to download s3://{aws_bucket_name}/{key}: {e}")
+                        report.failed.append(relative_path)
+                        continue
+                    manifest.record(relative_path, stat, sha256, aws_bucket_name, key, etag)
+                    report.transferred += 1
+                    report.bytes += size
+                    logging.info("Downloaded s3://%s/%s to %s", aws_bucket_name, key, local_file_path)
+
         except (NoCredentialsError, PartialCredentialsError) as e:
             print("Credentials not available or incomplete.")
-            print(e)
\ No newline at end of file
+            print(e)
+        finally:
+            manifest.save()
+
+        return report.finish()
+
+    def _is_current(self, manifest, local_file_path, relative_path, bucket, key, size, etag):
+        """Whether the local copy already matches the object, by size and ETag."""
+        try:
+            stat = os.stat(local_file_path)
+        except FileNotFoundError:
+            return False
+        if stat.st_size != size:
+            return False
+        unchanged, _ = manifest.unchanged(relative_path, stat, bucket, key)
+        if unchanged and manifest.entries[relative_path]["etag"] == etag:
+            return True
+        # No usable manifest entry, or the ETag was predicted at upload: compare it with one computed locally.
+        if local_etag(local_file_path, etag) != etag:
+            return False
+        manifest.record(relative_path, stat, file_sha256(local_file_path), bucket, key, etag)
+        return True
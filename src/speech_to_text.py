@@ -8,25 +8,13 @@ from deepgram import (
     LiveOptions,
     Microphone,
 )
+from src.streaming import TranscriptCollector
 
 load_dotenv()
 
-class TranscriptCollector:
-    def __init__(self):
-        self.reset()
-
-    def reset(self):
-        self.transcript_parts = []
-
-    def add_part(self, part):
-        self.transcript_parts.append(part)
-
-    def get_full_transcript(self):
-        return ' '.join(self.transcript_parts)
-
-transcript_collector = TranscriptCollector()
-
 async def get_transcript():
+    # One collector per connection, so concurrent transcriptions never mix sentences.
+    transcript_collector = TranscriptCollector()
     try:
         config = DeepgramClientOptions(options={"keepalive": "true"})
         deepgram_api_key = os.getenv("DEEP_GRAM_API")
@@ -0,0 +1,549 @@
+import abc
+import asyncio
+import bisect
+import os
+import time
+import uuid
+from collections import deque
+import numpy as np
+from src.chunked_transcription import frame_energy
+from src.logger import logging
+from src.model_registry import ModelKey, model_registry
+
+SAMPLE_RATE = 16000
+# Audio kept per session; older samples are overwritten as new frames arrive.
+RING_SECONDS = 30
+# Transcript events waiting for a slow client, per session.
+MAX_EVENTS = 256
+
+
+class TooManySessionsError(Exception):
+    pass
+
+
+class TranscriptCollector:
+    """Parts of the sentence being spoken, joined once the speaker pauses."""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.transcript_parts = []
+
+    def add_part(self, part):
+        self.transcript_parts.append(part)
+
+    def get_full_transcript(self):
+        return ' '.join(self.transcript_parts)
+
+
+class PcmRingBuffer:
+    """
+    Fixed-size ring of int16 PCM addressed by absolute sample position.
+
+    Writes never allocate; once the ring is full the oldest samples are
+    overwritten and only the last max_seconds stay readable.
+    """
+
+    def __init__(self, max_seconds=RING_SECONDS, sample_rate=SAMPLE_RATE):
+        self.sample_rate = sample_rate
+        self.capacity = int(max_seconds * sample_rate)
+        self._data = np.zeros(self.capacity, dtype=np.int16)
+        self.total = 0  # samples written since the session started
+
+    @property
+    def start(self):
+        """Absolute position of the oldest sample still held."""
+        return max(0, self.total - self.capacity)
+
+    @property
+    def dropped(self):
+        return self.start
+
+    def write(self, samples):
+        count = len(samples)
+        # Of a frame longer than the ring only its tail is kept, but every sample counts towards total.
+        samples = samples[-self.capacity:]
+        n = len(samples)
+        offset = (self.total + count - n) % self.capacity
+        first = min(n, self.capacity - offset)
+        self._data[offset:offset + first] = samples[:first]
+        self._data[:n - first] = samples[first:]
+        self.total += count
+
+    def read(self, start, end=None):
+        """Copy of the samples between absolute positions start and end, clamped to what is held."""
+        end = self.total if end is None else min(end, self.total)
+        start = max(start, self.start)
+        if start >= end:
+            return np.zeros(0, dtype=np.int16)
+        lo, hi = start % self.capacity, end % self.capacity or self.capacity
+        if lo < hi:
+            return self._data[lo:hi].copy()
+        return np.concatenate((self._data[lo:], self._data[:hi]))
+
+
+class EventQueue:
+    """
+    Outgoing transcript events of one session, bounded so a slow client cannot grow it.
+
+    A partial replaces a partial still waiting at the end of the queue, since
+    only the newest is worth showing. When the queue is full, the oldest
+    partial is dropped, or the oldest final if there is no partial. None ends
+    the stream and is never dropped.
+    """
+
+    def __init__(self, maxsize=MAX_EVENTS):
+        self.maxsize = maxsize
+        self._items = deque()
+        self._ready = asyncio.Event()
+        self.coalesced = 0
+        self.dropped = 0
+
+    def qsize(self):
+        return len(self._items)
+
+    def put_nowait(self, event):
+        if event is not None:
+            last = self._items[-1] if self._items else None
+            if event["type"] == "partial" and last is not None and last["type"] == "partial":
+                self._items[-1] = event
+                self.coalesced += 1
+                return
+            if len(self._items) >= self.maxsize:
+                victim = next((item for item in self._items if item is not None and item["type"] == "partial"),
+                              self._items[0])
+                self._items.remove(victim)
+                self.dropped += 1
+        self._items.append(event)
+        self._ready.set()
+
+    async def get(self):
+        while not self._items:
+            self._ready.clear()
+            await self._ready.wait()
+        return self._items.popleft()
+
+
+class SessionMetrics:
+    """Counters and transcript latencies of one streaming session."""
+
+    def __init__(self, max_samples=1000):
+        self.started = time.time()
+        self.finished = None
+        self.frames = 0
+        self.bytes_received = 0
+        self.partials = 0
+        self.finals = 0
+        self.partial_latencies = deque(maxlen=max_samples)
+        self.final_latencies = deque(maxlen=max_samples)
+
+    @staticmethod
+    def _latency_summary(latencies):
+        if not latencies:
+            return None
+        values = np.fromiter(latencies, dtype=np.float64) * 1000
+        return {
+            "p50_ms": round(float(np.percentile(values, 50)), 1),
+            "p95_ms": round(float(np.percentile(values, 95)), 1),
+            "max_ms": round(float(values.max()), 1),
+        }
+
+    def summary(self, ring=None):
+        wall = (self.finished or time.time()) - self.started
+        audio_seconds = ring.total / ring.sample_rate if ring is not None else None
+        return {
+            "wall_seconds": round(wall, 2),
+            "audio_seconds": round(audio_seconds, 2) if audio_seconds is not None else None,
+            "dropped_seconds": round(ring.dropped / ring.sample_rate, 2) if ring is not None else None,
+            "frames": self.frames,
+            "bytes_received": self.bytes_received,
+            "partials": self.partials,
+            "finals": self.finals,
+            "partial_latency": self._latency_summary(self.partial_latencies),
+            "final_latency": self._latency_summary(self.final_latencies),
+        }
+
+
+class StreamingSession:
+    """
+    One client connection: its ring buffer, backend stream and outgoing events.
+
+    Latency of a transcript event is the time from the arrival of the frame
+    holding the last sample it covers to the moment the event is emitted.
+    """
+
+    def __init__(self, session_id=None, ring_seconds=RING_SECONDS, sample_rate=SAMPLE_RATE, max_events=MAX_EVENTS):
+        self.id = session_id or uuid.uuid4().hex
+        self.ring = PcmRingBuffer(ring_seconds, sample_rate)
+        self.metrics = SessionMetrics()
+        self.events = EventQueue(max_events)
+        self.stream = None
+        self._remainder = b""
+        # Frame end positions and arrival times, for latency lookups.
+        self._arrival_positions = []
+        self._arrival_times = []
+
+    @property
+    def sample_rate(self):
+        return self.ring.sample_rate
+
+    async def feed(self, data):
+        """Take a frame of little-endian int16 PCM from the client."""
+        self.metrics.frames += 1
+        self.metrics.bytes_received += len(data)
+        data = self._remainder + data
+        usable = len(data) - len(data) % 2
+        self._remainder = data[usable:]
+        if not usable:
+            return
+        chunk = np.frombuffer(data[:usable], dtype="<i2")
+        self.ring.write(chunk)
+        self._record_arrival(self.ring.total, time.perf_counter())
+        await self.stream.on_audio(chunk)
+
+    def _record_arrival(self, position, arrived):
+        self._arrival_positions.append(position)
+        self._arrival_times.append(arrived)
+        # Keep arrivals for the audio the ring still holds.
+        if len(self._arrival_positions) > 4096:
+            keep = bisect.bisect_left(self._arrival_positions, self.ring.start)
+            del self._arrival_positions[:keep]
+            del self._arrival_times[:keep]
+
+    def _arrival_of(self, position):
+        index = bisect.bisect_left(self._arrival_positions, position)
+        if index >= len(self._arrival_times):
+            index = len(self._arrival_times) - 1
+        return self._arrival_times[index] if index >= 0 else None
+
+    def emit(self, kind, text, start=None, end=None):
+        """
+        Queue a "partial" or "final" transcript for the client.
+
+        :param start: Start of the covered audio in stream seconds
+        :param end: End of the covered audio in stream seconds; defaults to everything received
+        """
+        end_position = self.ring.total if end is None else int(end * self.sample_rate)
+        arrived = self._arrival_of(end_position)
+        latency = time.perf_counter() - arrived if arrived is not None else None
+        if kind == "final":
+            self.metrics.finals += 1
+            latencies = self.metrics.final_latencies
+        else:
+            self.metrics.partials += 1
+            latencies = self.metrics.partial_latencies
+        if latency is not None:
+            latencies.append(latency)
+
+        self.events.put_nowait({
+            "type": kind,
+            "text": text,
+            "start": round(start, 3) if start is not None else None,
+            "end": round(end_position / self.sample_rate, 3),
+            "latency_ms": round(latency * 1000, 1) if latency is not None else None,
+        })
+
+    def summary(self):
+        return {
+            "session_id": self.id,
+            **self.metrics.summary(self.ring),
+            "partials_coalesced": self.events.coalesced,
+            "events_dropped": self.events.dropped,
+        }
+
+
+class StreamingBackend(abc.ABC):
+    """
+    Turns a session's audio into partial and final transcripts.
+
+    open() is called once per session and returns an object with async
+    on_audio(chunk) and close() methods; results are reported through
+    session.emit().
+    """
+
+    name = "base"
+
+    @abc.abstractmethod
+    async def open(self, session):
+        """Start transcribing one session; returns its stream."""
+
+    async def aclose(self):
+        """Release resources shared by all sessions, e.g. a loaded model."""
+
+
+class _FakeStream:
+    def __init__(self, backend, session):
+        self.backend = backend
+        self.session = session
+        self.utterance_start = 0
+        self.next_partial = backend.partial_samples
+
+    def _text(self, start, end):
+        samples_per_word = self.backend.samples_per_word
+        return " ".join(f"word{i}" for i in range(start // samples_per_word, end // samples_per_word))
+
+    async def on_audio(self, chunk):
+        backend, session = self.backend, self.session
+        while session.ring.total >= self.next_partial:
+            position = self.next_partial
+            if backend.delay:
+                await asyncio.sleep(backend.delay)
+            if position - self.utterance_start >= backend.final_samples:
+                session.emit("final", self._text(self.utterance_start, position),
+                             self.utterance_start / session.sample_rate, position / session.sample_rate)
+                self.utterance_start = position
+            else:
+                session.emit("partial", self._text(self.utterance_start, position),
+                             self.utterance_start / session.sample_rate, position / session.sample_rate)
+            self.next_partial += backend.partial_samples
+
+    async def close(self):
+        end = self.session.ring.total
+        if end > self.utterance_start:
+            self.session.emit("final", self._text(self.utterance_start, end),
+                              self.utterance_start / self.session.sample_rate, end / self.session.sample_rate)
+
+
+class FakeBackend(StreamingBackend):
+    """
+    Deterministic backend for offline load tests.
+
+    Every partial_seconds of audio yields a partial made of placeholder words
+    numbered by stream position ("word0 word1 ..."), and every final_seconds a
+    final; delay simulates recognition time.
+    """
+
+    name = "fake"
+
+    def __init__(self, partial_seconds=0.5, final_seconds=2.0, words_per_second=2.5, delay=0.0,
+                 sample_rate=SAMPLE_RATE):
+        self.partial_samples = int(partial_seconds * sample_rate)
+        self.final_samples = int(final_seconds * sample_rate)
+        self.samples_per_word = max(int(sample_rate / words_per_second), 1)
+        self.delay = delay
+
+    async def open(self, session):
+        return _FakeStream(self, session)
+
+
+class _WhisperStream:
+    def __init__(self, backend, session):
+        self.backend = backend
+        self.session = session
+        self.utterance_start = 0
+        self.last_run = 0
+        self._task = None
+
+    async def on_audio(self, chunk):
+        step = int(self.backend.step_seconds * self.session.sample_rate)
+        # Skip a step rather than queue one while the previous pass is still running.
+        if self.session.ring.total - self.last_run >= step and (self._task is None or self._task.done()):
+            self.last_run = self.session.ring.total
+            self._task = asyncio.create_task(self._transcribe(self.last_run, flush=False))
+
+    async def _transcribe(self, end, flush):
+        backend, session = self.backend, self.session
+        sample_rate = session.sample_rate
+        start = max(self.utterance_start, session.ring.start)
+        audio = session.ring.read(start, end).astype(np.float32) / 32768.0
+        if len(audio) == 0:
+            return
+
+        tail = frame_energy(audio[-int(backend.silence_seconds * sample_rate):], sample_rate)
+        paused = len(tail) > 0 and float(tail.max()) < backend.silence_threshold
+        final = flush or paused or len(audio) >= backend.max_utterance_seconds * sample_rate
+
+        try:
+            text = await backend.transcribe(audio)
+        except Exception as e:
+            logging.info(f"Streaming session {session.id}: transcription failed: {e}")
+            return
+        if final:
+            self.utterance_start = end
+        if text:
+            session.emit("final" if final else "partial", text, start / sample_rate, end / sample_rate)
+
+    async def close(self):
+        if self._task is not None:
+            await self._task
+        if self.session.ring.total > self.utterance_start:
+            await self._transcribe(self.session.ring.total, flush=True)
+
+
+class WhisperBackend(StreamingBackend):
+    """
+    Local Whisper over a growing utterance window.
+
+    Every step_seconds the current utterance is re-transcribed and sent as a
+    partial. It becomes final after a pause of silence_seconds or once it
+    reaches max_utterance_seconds. The model comes from the shared registry
+    and is used by at most max_concurrency sessions at a time.
+    """
+
+    name = "whisper"
+
+    def __init__(self, model_name="small", device="cpu", compute_type="int8", language="en", batch_size=4,
+                 step_seconds=1.0, max_utterance_seconds=10.0, silence_seconds=0.6, silence_threshold=0.01,
+                 max_concurrency=2, registry=model_registry):
+        self.key = ModelKey(model_name, device, compute_type, language)
+        self.batch_size = batch_size
+        self.step_seconds = step_seconds
+        self.max_utterance_seconds = max_utterance_seconds
+        self.silence_seconds = silence_seconds
+        self.silence_threshold = silence_threshold
+        self.registry = registry
+        self._model = None
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+    def _load(self):
+        import whisperx
+        name, device, compute_type, language = self.key
+        return whisperx.load_model(name, device, compute_type=compute_type, language=language)
+
+    def _model_instance(self):
+        if self._model is None:
+            self._model = self.registry.acquire(self.key, self._load)
+        return self._model
+
+    def _run(self, audio):
+        model = self._model_instance()
+        # The model may be shared with batch jobs and other sessions; one call at a time.
+        with self.registry.inference_lock(self.key):
+            result = model.transcribe(audio, batch_size=self.batch_size, language=self.key.language)
+        return " ".join(segment["text"].strip() for segment in result["segments"])
+
+    async def transcribe(self, audio):
+        async with self._semaphore:
+            return await asyncio.to_thread(self._run, audio)
+
+    async def open(self, session):
+        return _WhisperStream(self, session)
+
+    async def aclose(self):
+        if self._model is not None:
+            self.registry.release(self.key)
+            self._model = None
+
+
+class _DeepgramStream:
+    def __init__(self, connection, session):
+        self.connection = connection
+        self.session = session
+
+    async def on_audio(self, chunk):
+        await self.connection.send(chunk.tobytes())
+
+    async def close(self):
+        await self.connection.finish()
+
+
+class DeepgramBackend(StreamingBackend):
+    """
+    Deepgram live transcription, one socket per session.
+
+    Interim results are sent as partials. Finalized pieces are collected until
+    Deepgram marks the end of speech, then sent as one final.
+    """
+
+    name = "deepgram"
+
+    def __init__(self, api_key=None, model="nova-2", language="en-US"):
+        self.api_key = api_key or os.getenv("DEEPGRAM_API_KEY")
+        self.model = model
+        self.language = language
+
+    async def open(self, session):
+        from deepgram import DeepgramClient, DeepgramClientOptions, LiveOptions, LiveTranscriptionEvents
+
+        config = DeepgramClientOptions(options={"keepalive": "true"})
+        connection = DeepgramClient(self.api_key, config).listen.asynclive.v("1")
+        collector = TranscriptCollector()
+
+        async def on_message(_, result, **kwargs):
+            sentence = result.channel.alternatives[0].transcript
+            end = result.start + result.duration
+            if not result.is_final:
+                session.emit("partial", " ".join(filter(None, (collector.get_full_transcript(), sentence))), end=end)
+                return
+            collector.add_part(sentence)
+            if result.speech_final:
+                session.emit("final", collector.get_full_transcript(), end=end)
+                collector.reset()
+
+        async def on_error(_, error, **kwargs):
+            logging.info(f"Streaming session {session.id}: Deepgram error: {error}")
+
+        connection.on(LiveTranscriptionEvents.Transcript, on_message)
+        connection.on(LiveTranscriptionEvents.Error, on_error)
+        options = LiveOptions(
+            model=self.model,
+            punctuate=True,
+            language=self.language,
+            encoding="linear16",
+            channels=1,
+            sample_rate=session.sample_rate,
+            interim_results=True,
+            endpointing=True,
+        )
+        if await connection.start(options) is False:
+            raise RuntimeError("Could not open the Deepgram live connection.")
+        return _DeepgramStream(connection, session)
+
+
+BACKENDS = {"fake": FakeBackend, "whisper": WhisperBackend, "deepgram": DeepgramBackend}
+
+
+def get_streaming_backend(name=None):
+    """Backend named by name or the STREAMING_BACKEND environment variable (default whisper)."""
+    name = name or os.getenv("STREAMING_BACKEND", "whisper")
+    try:
+        return BACKENDS[name]()
+    except KeyError:
+        raise ValueError(f"Unknown streaming backend {name!r}; expected one of {', '.join(BACKENDS)}.")
+
+
+class StreamingHub:
+    """Open streaming sessions of one process, capped at max_sessions."""
+
+    def __init__(self, backend, max_sessions=64, ring_seconds=RING_SECONDS, history=100, max_events=MAX_EVENTS):
+        self.backend = backend
+        self.max_sessions = max_sessions
+        self.ring_seconds = ring_seconds
+        self.max_events = max_events
+        self.sessions = {}
+        self.finished = deque(maxlen=history)  # summaries of closed sessions
+
+    async def open_session(self):
+        if len(self.sessions) >= self.max_sessions:
+            raise TooManySessionsError("Too many streaming sessions, try again later.")
+        session = StreamingSession(ring_seconds=self.ring_seconds, max_events=self.max_events)
+        session.stream = await self.backend.open(session)
+        self.sessions[session.id] = session
+        logging.info(f"Streaming session {session.id} opened with the {self.backend.name} backend.")
+        return session
+
+    async def close_session(self, session):
+        """Flush the backend, then end the session's event stream."""
+        try:
+            await session.stream.close()
+        finally:
+            session.metrics.finished = time.time()
+            self.sessions.pop(session.id, None)
+            summary = session.summary()
+            self.finished.append(summary)
+            session.events.put_nowait(None)
+            logging.info(f"Streaming session {session.id} closed: {summary}")
+        return summary
+
+    def stats(self):
+        return {
+            "backend": self.backend.name,
+            "active": [session.summary() for session in self.sessions.values()],
+            "finished": list(self.finished),
+        }
+
+    async def stop(self):
+        for session in list(self.sessions.values()):
+            await self.close_session(session)
+        await self.backend.aclose()
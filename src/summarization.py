@@ -1,9 +1,11 @@
-from src.utils import get_transcript_using_assemblyai
-from langchain_groq import ChatGroq
-from langchain_core.prompts import ChatPromptTemplate
+import asyncio
+import threading
+import weakref
+from src.summary_cache import get_summary_cache, make_cache_key
+from src.chunking import pack_turns, split_conversation
+from src.logger import logging
 import os
 from dotenv import load_dotenv
-import assemblyai as aai
 
 load_dotenv()
 
@@ -16,20 +18,72 @@ load_dotenv()
 #     model_name="Llama3-8b-8192"
 # )
 
-def summarise_transcript(groq_api_key,transcript):
+MODEL_NAME = "Llama3-8b-8192"
+SYSTEM_PROMPT = 'You are a helpful assistant who summarises the provided text concisely in no more than 1000 words.'
+USER_PROMPT = """ Summarise the following transcript delimited by 3 backticks without any introductory phrases: {transcript} """
+REDUCE_PROMPT = """ Combine the following partial summaries of consecutive parts of one conversation, delimited by 3 backticks, into a single summary without any introductory phrases: {transcript} """
+TOTAL_SUMMARY_KEY = "Total Summary"
 
-    llm = ChatGroq(
-    groq_api_key=groq_api_key,
-    model_name="Llama3-8b-8192"
-    )
+# Tokens of transcript per request; leaves room in the 8k context for the prompt and the summary.
+CHUNK_TOKEN_BUDGET = 3000
+
+
+# Clients per event loop: the async HTTP pool inside ChatGroq is bound to the loop that first used it.
+_llms = weakref.WeakKeyDictionary()
+_llms_without_loop = {}
+_llms_lock = threading.Lock()
+
+
+def _new_llm(groq_api_key, model_name, base_url):
+    from langchain_groq import ChatGroq
+
+    base_url = base_url or os.getenv("GROQ_BASE_URL")
+    kwargs = {"base_url": base_url} if base_url else {}
+    return ChatGroq(groq_api_key=groq_api_key, model_name=model_name, **kwargs)
+
+
+def get_llm(groq_api_key, model_name=MODEL_NAME, base_url=None):
+    """
+    Return the ChatGroq client shared by every summary on the current event loop.
+
+    One client is kept per event loop, because its async connection pool can
+    only be used from the loop that created it; sync callers outside any loop
+    share another. summarise_conversation() runs every request on one
+    long-lived loop, so in practice all summaries reuse one pool.
+
+    langchain is imported here, on the first summary, because it takes longer
+    to import than the rest of the pipeline put together.
+
+    base_url (or GROQ_BASE_URL) points the client at another OpenAI-compatible
+    endpoint, e.g. a local fake server in tests.
+    """
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        loop = None
+    key = (groq_api_key, model_name, base_url)
+    with _llms_lock:
+        clients = _llms.setdefault(loop, {}) if loop is not None else _llms_without_loop
+        if key not in clients:
+            clients[key] = _new_llm(groq_api_key, model_name, base_url)
+        return clients[key]
+
+
+def _normalise(transcript):
+    if isinstance(transcript, (list, tuple)):
+        return "\n".join(transcript)
+    return transcript
+
+
+def build_messages(transcript, user_prompt=USER_PROMPT):
     # Prepare the prompt for summarization
-    summarise_prompt = f""" Summarise the following transcript delimited by 3 backticks without any introductory phrases: {transcript} """
+    summarise_prompt = user_prompt.format(transcript=_normalise(transcript))
 
     # Create the chat message structure for Groq API
-    messages = [
+    return [
         {
             'role': 'system',
-            'content': 'You are a helpful assistant who summarises the provided text concisely in no more than 1000 words.'
+            'content': SYSTEM_PROMPT
         },
         {
             'role': 'user',
@@ -37,16 +91,145 @@ def summarise_transcript(groq_api_key,transcript):
         },
     ]
 
+
+def _extract_summary(response):
+    # Extract only the content from the response
+    summary_content = response.content
+    return summary_content.split(":", 1)[-1].strip()
+
+
+def _cached(transcript, model_name, use_cache, user_prompt=USER_PROMPT):
+    """Return (cache, key, cached summary or None); cache is None when bypassed."""
+    if not use_cache:
+        return None, None, None
+    cache = get_summary_cache()
+    key = make_cache_key(model_name, SYSTEM_PROMPT, user_prompt, _normalise(transcript))
+    return cache, key, cache.get(key)
+
+
+def summarise_transcript(groq_api_key, transcript, model_name=MODEL_NAME, base_url=None, use_cache=True):
+    cache, key, summary = _cached(transcript, model_name, use_cache)
+    if summary is not None:
+        return summary
+
+    llm = get_llm(groq_api_key, model_name, base_url)
+
     # Get the response from the Llama model
-    response = llm.invoke(messages)
+    response = llm.invoke(build_messages(transcript))
+    summary = _extract_summary(response)
+    if cache is not None:
+        cache.set(key, summary)
+    return summary
 
-    # print(type(response))
 
-    # Extract and print only the content from the response
-    summary_content = response.content
-    summary_content = summary_content.split(":", 1)[-1].strip() 
-    # print("Summary:", summary_content)
-    return summary_content
+async def asummarise_transcript(groq_api_key, transcript, model_name=MODEL_NAME, base_url=None, semaphore=None,
+                                use_cache=True, user_prompt=USER_PROMPT):
+    cache, key, summary = _cached(transcript, model_name, use_cache, user_prompt)
+    if summary is not None:
+        return summary
+
+    llm = get_llm(groq_api_key, model_name, base_url)
+    messages = build_messages(transcript, user_prompt)
+    if semaphore is None:
+        response = await llm.ainvoke(messages)
+    else:
+        async with semaphore:
+            response = await llm.ainvoke(messages)
+    summary = _extract_summary(response)
+    if cache is not None:
+        cache.set(key, summary)
+    return summary
+
+
+async def asummarise_long_transcript(groq_api_key, transcript, model_name=MODEL_NAME, base_url=None, semaphore=None,
+                                     use_cache=True, max_chunk_tokens=CHUNK_TOKEN_BUDGET):
+    """
+    Map-reduce summary for transcripts that do not fit in one request.
+
+    The transcript is split on speaker turns into chunks of max_chunk_tokens,
+    the chunks are summarised in parallel, and the partial summaries are
+    combined level by level until a single summary is left.
+    """
+    chunks = split_conversation(transcript, max_chunk_tokens)
+    if len(chunks) <= 1:
+        return await asummarise_transcript(groq_api_key, transcript, model_name, base_url, semaphore, use_cache)
+
+    prompt = USER_PROMPT
+    level = 0
+    while True:
+        logging.info(f"Summarisation level {level}: {len(chunks)} chunks.")
+        partials = await asyncio.gather(*(
+            asummarise_transcript(groq_api_key, chunk, model_name, base_url, semaphore, use_cache, prompt)
+            for chunk in chunks
+        ))
+        prompt = REDUCE_PROMPT
+        level += 1
+
+        chunks = pack_turns(partials, max_chunk_tokens)
+        if len(chunks) >= len(partials):
+            # Partial summaries are too long to pack; combine them pairwise so each level still shrinks.
+            chunks = [partials[i:i + 2] for i in range(0, len(partials), 2)]
+        if len(chunks) == 1:
+            return await asummarise_transcript(groq_api_key, chunks[0], model_name, base_url, semaphore, use_cache, prompt)
+
+
+async def summarise_conversation_async(groq_api_key, speaker_texts, conversation, max_concurrency=4,
+                                       model_name=MODEL_NAME, base_url=None, use_cache=True,
+                                       max_chunk_tokens=CHUNK_TOKEN_BUDGET):
+    """
+    Summarise every speaker and the whole conversation concurrently.
+
+    Transcripts longer than max_chunk_tokens are summarised with map-reduce.
+
+    :param speaker_texts: Mapping of speaker name to their speeches
+    :param conversation: The full conversation used for the overall summary
+    :param max_concurrency: Maximum number of requests in flight at once
+    :param use_cache: Set to False to bypass the on-disk summary cache
+    :return: Dict keyed by speaker, plus TOTAL_SUMMARY_KEY for the overall summary
+    """
+    semaphore = asyncio.Semaphore(max_concurrency)
+    jobs = dict(speaker_texts)
+    jobs[TOTAL_SUMMARY_KEY] = conversation
+
+    summaries = await asyncio.gather(*(
+        asummarise_long_transcript(groq_api_key, transcript, model_name, base_url, semaphore, use_cache,
+                                   max_chunk_tokens)
+        for transcript in jobs.values()
+    ))
+    return dict(zip(jobs.keys(), summaries))
+
+
+_loop = None
+_loop_pid = None
+_loop_lock = threading.Lock()
+
+
+def _summary_loop():
+    """The event loop every blocking summarise_conversation() call runs on, started on first use."""
+    global _loop, _loop_pid
+    with _loop_lock:
+        # A forked worker inherits the loop object but not the thread running it.
+        if _loop is None or _loop_pid != os.getpid():
+            _loop = asyncio.new_event_loop()
+            _loop_pid = os.getpid()
+            threading.Thread(target=_loop.run_forever, name="summaries", daemon=True).start()
+        return _loop
+
+
+def summarise_conversation(groq_api_key, speaker_texts, conversation, max_concurrency=4,
+                           model_name=MODEL_NAME, base_url=None, use_cache=True,
+                           max_chunk_tokens=CHUNK_TOKEN_BUDGET):
+    """
+    Blocking wrapper around summarise_conversation_async for sync callers such as Streamlit.
+
+    Calls from any thread are submitted to one shared event loop instead of
+    each starting its own with asyncio.run(), so they share one client.
+    """
+    future = asyncio.run_coroutine_threadsafe(summarise_conversation_async(
+        groq_api_key, speaker_texts, conversation, max_concurrency, model_name, base_url, use_cache,
+        max_chunk_tokens
+    ), _summary_loop())
+    return future.result()
 
 
 # Example usage
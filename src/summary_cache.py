@@ -0,0 +1,117 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from src.logger import logging
+
+CACHE_DIR = os.path.join(os.getcwd(), "cache")
+CACHE_PATH = os.path.join(CACHE_DIR, "summaries.sqlite")
+
+
+def make_cache_key(model_name, system_prompt, user_prompt, transcript):
+    """Content address of a summary request."""
+    payload = json.dumps([model_name, system_prompt, user_prompt, transcript], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class SummaryCache:
+    """
+    Persistent summary cache stored in SQLite.
+
+    Entries expire after ttl_seconds and the table is trimmed to max_entries
+    by evicting the least recently used rows.
+    """
+
+    def __init__(self, path=CACHE_PATH, ttl_seconds=7 * 24 * 3600, max_entries=10000):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS summaries ("
+            " key TEXT PRIMARY KEY,"
+            " summary TEXT NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_accessed_at ON summaries(accessed_at)")
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT summary, created_at FROM summaries WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None and self.ttl_seconds is not None and now - row[1] > self.ttl_seconds:
+                self._conn.execute("DELETE FROM summaries WHERE key = ?", (key,))
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE summaries SET accessed_at = ? WHERE key = ?", (now, key))
+            self.hits += 1
+            return row[0]
+
+    def set(self, key, summary):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO summaries (key, summary, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, summary, now, now),
+            )
+            self._evict()
+
+    def _evict(self):
+        if self.ttl_seconds is not None:
+            self._conn.execute("DELETE FROM summaries WHERE created_at < ?", (time.time() - self.ttl_seconds,))
+        if self.max_entries is not None:
+            (count,) = self._conn.execute("SELECT COUNT(*) FROM summaries").fetchone()
+            if count > self.max_entries:
+                self._conn.execute(
+                    "DELETE FROM summaries WHERE key IN ("
+                    " SELECT key FROM summaries ORDER BY accessed_at ASC LIMIT ?)",
+                    (count - self.max_entries,),
+                )
+                logging.info(f"Evicted {count - self.max_entries} summaries from the cache.")
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM summaries")
+
+    def stats(self):
+        with self._lock:
+            (entries,) = self._conn.execute("SELECT COUNT(*) FROM summaries").fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "entries": entries,
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_summary_cache = None
+_summary_cache_lock = threading.Lock()
+
+
+def get_summary_cache():
+    """Process-wide SummaryCache, opened on first use."""
+    global _summary_cache
+    with _summary_cache_lock:
+        if _summary_cache is None:
+            _summary_cache = SummaryCache()
+        return _summary_cache
@@ -0,0 +1,227 @@
+import os
+import resource
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from src.logger import job_id_var, logging
+
+# Set TRACE_MEMORY=1 to measure per-stage peak memory with tracemalloc; it slows allocation-heavy code.
+TRACE_MEMORY = os.getenv("TRACE_MEMORY", "0") == "1"
+
+
+def _process_peak_rss_bytes():
+    """Highest RSS of the process since it started, not of any one stage."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS.
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _rss_bytes():
+    """Current RSS of the process, or None where /proc is not available."""
+    try:
+        with open("/proc/self/statm") as file:
+            return int(file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class _TracedMemory:
+    """
+    tracemalloc shared by every JobTrace in the process.
+
+    Tracing starts with the first traced span and stops after the last one.
+    The peak is only reset when no span is open, so a span's peak is never
+    lowered by another job. A span that overlapped another job's span reports
+    the peak of both and is flagged as shared.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._open = {}  # token -> [trace, shared]
+        self._started = False
+
+    def enter(self, trace):
+        with self._lock:
+            if not self._open:
+                if not tracemalloc.is_tracing():
+                    tracemalloc.start()
+                    self._started = True
+                tracemalloc.reset_peak()
+            token = object()
+            shared = False
+            for entry in self._open.values():
+                if entry[0] is not trace:
+                    entry[1] = shared = True
+            self._open[token] = [trace, shared]
+            return token
+
+    def exit(self, token):
+        """(peak traced bytes, whether another job's span overlapped) of the span."""
+        with self._lock:
+            peak = tracemalloc.get_traced_memory()[1]
+            _, shared = self._open.pop(token)
+            if not self._open and self._started:
+                tracemalloc.stop()
+                self._started = False
+            return peak, shared
+
+
+_traced_memory = _TracedMemory()
+
+
+class JobTrace:
+    """
+    Spans of one pipeline job: wall time, CPU time and memory per stage.
+
+    CPU time and RSS are process-wide, so a stage that overlaps another
+    (diarization runs beside transcription, or another job runs in the same
+    process) also counts the other's CPU and memory. process_peak_rss_bytes is
+    the process high-water mark so far; rss_delta_bytes is how much RSS grew
+    during the stage. With tracemalloc on, the peak of overlapping spans is
+    measured since the first of them started. The real-time factor is filled
+    in once the audio length is known.
+    """
+
+    def __init__(self, job_id=None, trace_memory=TRACE_MEMORY):
+        self.job_id = job_id or job_id_var.get()
+        self.audio_seconds = None
+        self.spans = []
+        self.trace_memory = trace_memory
+        self.started = time.perf_counter()
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def span(self, stage):
+        token = _traced_memory.enter(self) if self.trace_memory else None
+        rss_start = _rss_bytes()
+        wall_start, cpu_start = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            rss_end = _rss_bytes()
+            record = {
+                "stage": stage,
+                "wall_seconds": time.perf_counter() - wall_start,
+                "cpu_seconds": time.process_time() - cpu_start,
+                "rss_delta_bytes": rss_end - rss_start if rss_start is not None and rss_end is not None else None,
+                "process_peak_rss_bytes": _process_peak_rss_bytes(),
+                "peak_traced_bytes": None,
+                "peak_traced_shared": None,
+            }
+            if token is not None:
+                record["peak_traced_bytes"], record["peak_traced_shared"] = _traced_memory.exit(token)
+            with self._lock:
+                self.spans.append(record)
+            logging.info("Stage %s took %.2fs wall, %.2fs CPU.", stage, record["wall_seconds"], record["cpu_seconds"])
+
+    def report(self):
+        """Per-stage timing report, in the order the stages finished."""
+        spans = []
+        for span in self.spans:
+            span = dict(span)
+            span["realtime_factor"] = (span["wall_seconds"] / self.audio_seconds) if self.audio_seconds else None
+            spans.append(span)
+        total = time.perf_counter() - self.started
+        return {
+            "job_id": self.job_id,
+            "audio_seconds": self.audio_seconds,
+            "total_seconds": total,
+            "realtime_factor": total / self.audio_seconds if self.audio_seconds else None,
+            "stages": spans,
+        }
+
+
+class Histogram:
+    """Cumulative Prometheus histogram with one label."""
+
+    def __init__(self, name, help_text, buckets, label="stage"):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(sorted(buckets))
+        self.label = label
+        self._series = {}  # label value -> [bucket counts..., sum, count]
+
+    def observe(self, label_value, value):
+        series = self._series.setdefault(label_value, [0] * len(self.buckets) + [0.0, 0])
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                series[i] += 1
+        series[-2] += value
+        series[-1] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for label_value, series in sorted(self._series.items()):
+            label = f'{self.label}="{label_value}"'
+            for bound, count in zip(self.buckets, series):
+                lines.append(f'{self.name}_bucket{{{label},le="{bound:g}"}} {count}')
+            lines.append(f'{self.name}_bucket{{{label},le="+Inf"}} {series[-1]}')
+            lines.append(f"{self.name}_sum{{{label}}} {series[-2]:.6g}")
+            lines.append(f"{self.name}_count{{{label}}} {series[-1]}")
+        return lines
+
+
+class StageMetrics:
+    """Process-wide histograms of every observed JobTrace, rendered in the Prometheus text format."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.wall = Histogram("pipeline_stage_wall_seconds", "Wall-clock time per pipeline stage.",
+                              (0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800))
+        self.cpu = Histogram("pipeline_stage_cpu_seconds", "Process CPU time per pipeline stage.",
+                             (0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800))
+        memory_buckets = tuple(2 ** power * 1024 * 1024 for power in range(0, 15))
+        self.rss_growth = Histogram("pipeline_stage_rss_growth_bytes",
+                                    "Growth of the process RSS during a pipeline stage (0 when it shrank).",
+                                    memory_buckets)
+        self.traced = Histogram("pipeline_stage_peak_traced_bytes",
+                                "Peak Python allocations during a pipeline stage, with TRACE_MEMORY=1.",
+                                memory_buckets)
+        self.process_peak_rss_bytes = 0
+        self.realtime = Histogram("pipeline_stage_realtime_factor",
+                                  "Processing seconds per second of audio, per pipeline stage.",
+                                  (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2, 5))
+        self.jobs = 0
+        self.audio_seconds = 0.0
+
+    def observe(self, report):
+        """Record a JobTrace.report(); works for reports returned from worker processes too."""
+        with self._lock:
+            self.jobs += 1
+            self.audio_seconds += report.get("audio_seconds") or 0.0
+            for span in report["stages"]:
+                stage = span["stage"]
+                self.wall.observe(stage, span["wall_seconds"])
+                self.cpu.observe(stage, span["cpu_seconds"])
+                if span.get("rss_delta_bytes") is not None:
+                    self.rss_growth.observe(stage, max(span["rss_delta_bytes"], 0))
+                # A peak shared with another job's stage belongs to neither.
+                if span.get("peak_traced_bytes") is not None and not span.get("peak_traced_shared"):
+                    self.traced.observe(stage, span["peak_traced_bytes"])
+                self.process_peak_rss_bytes = max(self.process_peak_rss_bytes,
+                                                  span.get("process_peak_rss_bytes") or 0)
+                if span.get("realtime_factor") is not None:
+                    self.realtime.observe(stage, span["realtime_factor"])
+
+    def render(self):
+        with self._lock:
+            lines = []
+            for histogram in (self.wall, self.cpu, self.rss_growth, self.traced, self.realtime):
+                lines.extend(histogram.render())
+            lines += [
+                "# HELP pipeline_jobs_total Pipeline jobs observed.",
+                "# TYPE pipeline_jobs_total counter",
+                f"pipeline_jobs_total {self.jobs}",
+                "# HELP pipeline_audio_seconds_total Seconds of audio processed.",
+                "# TYPE pipeline_audio_seconds_total counter",
+                f"pipeline_audio_seconds_total {self.audio_seconds:.6g}",
+                "# HELP pipeline_process_peak_rss_bytes Highest RSS any pipeline process reported, since it started.",
+                "# TYPE pipeline_process_peak_rss_bytes gauge",
+                f"pipeline_process_peak_rss_bytes {self.process_peak_rss_bytes}",
+            ]
+            return "\n".join(lines) + "\n"
+
+
+stage_metrics = StageMetrics()
@@ -0,0 +1,209 @@
+import json
+import struct
+import numpy as np
+from src.logger import logging
+
+MAGIC = b"CTRNSCR1"
+VERSION = 1
+ALIGNMENT = 64
+
+# name -> dtype of every column in the file
+COLUMNS = {
+    "word_start": "<f4",
+    "word_end": "<f4",
+    "word_score": "<f4",
+    "word_speaker": "<i2",
+    "word_text_offsets": "<u4",
+    "word_text": "u1",
+    "segment_start": "<f4",
+    "segment_end": "<f4",
+    "segment_speaker": "<i2",
+    "segment_word_offsets": "<u4",
+    "segment_text_offsets": "<u4",
+    "segment_text": "u1",
+}
+
+
+def _string_table(strings):
+    encoded = [s.encode("utf-8") for s in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype="<u4")
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    return offsets, np.frombuffer(b"".join(encoded), dtype="u1")
+
+
+def _number(value):
+    return np.nan if value is None else value
+
+
+def save_columnar(result, path):
+    """
+    Write a whisperx result (segments with aligned, speaker-labelled words) in
+    the columnar format read by ColumnarTranscript.
+
+    Word and segment timings, scores and speaker codes are stored as packed
+    arrays, and all text lives in two UTF-8 string tables.
+    """
+    speakers = {}
+
+    def speaker_code(name):
+        if name is None:
+            return -1
+        return speakers.setdefault(name, len(speakers))
+
+    word_start, word_end, word_score, word_speaker, word_text = [], [], [], [], []
+    segment_start, segment_end, segment_speaker, segment_text = [], [], [], []
+    segment_word_offsets = [0]
+
+    for segment in result["segments"]:
+        segment_start.append(_number(segment.get("start")))
+        segment_end.append(_number(segment.get("end")))
+        segment_speaker.append(speaker_code(segment.get("speaker")))
+        segment_text.append(segment.get("text", ""))
+        for word in segment.get("words", ()):
+            word_start.append(_number(word.get("start")))
+            word_end.append(_number(word.get("end")))
+            word_score.append(_number(word.get("score")))
+            word_speaker.append(speaker_code(word.get("speaker")))
+            word_text.append(word.get("word", ""))
+        segment_word_offsets.append(len(word_text))
+
+    word_text_offsets, word_text_blob = _string_table(word_text)
+    segment_text_offsets, segment_text_blob = _string_table(segment_text)
+    arrays = {
+        "word_start": word_start,
+        "word_end": word_end,
+        "word_score": word_score,
+        "word_speaker": word_speaker,
+        "word_text_offsets": word_text_offsets,
+        "word_text": word_text_blob,
+        "segment_start": segment_start,
+        "segment_end": segment_end,
+        "segment_speaker": segment_speaker,
+        "segment_word_offsets": segment_word_offsets,
+        "segment_text_offsets": segment_text_offsets,
+        "segment_text": segment_text_blob,
+    }
+    arrays = {name: np.asarray(values, dtype=COLUMNS[name]) for name, values in arrays.items()}
+
+    # Lay the columns out at aligned offsets after a JSON header, like .npy does.
+    layout, offset = {}, 0
+    for name, array in arrays.items():
+        offset = -(-offset // ALIGNMENT) * ALIGNMENT
+        layout[name] = [offset, len(array)]
+        offset += array.nbytes
+    header = json.dumps({
+        "version": VERSION,
+        "language": result.get("language"),
+        "speakers": list(speakers),
+        "columns": layout,
+    }).encode("utf-8")
+    data_start = -(-(len(MAGIC) + 4 + len(header)) // ALIGNMENT) * ALIGNMENT
+
+    with open(path, "wb") as file:
+        file.write(MAGIC)
+        file.write(struct.pack("<I", len(header)))
+        file.write(header)
+        for name, array in arrays.items():
+            file.seek(data_start + layout[name][0])
+            file.write(array.tobytes())
+        file.truncate(data_start + offset)
+
+    logging.info(f"Saved {len(word_text)} words in {len(segment_text)} segments to {path}.")
+    return path
+
+
+class ColumnarTranscript:
+    """
+    Memory-mapped, read-only view over a file written by save_columnar().
+
+    Opening the file only parses the small header; columns are numpy views
+    into the mapping and strings are decoded only when asked for.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as file:
+            if file.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"{path} is not a columnar transcript.")
+            (header_len,) = struct.unpack("<I", file.read(4))
+            header = json.loads(file.read(header_len))
+        if header["version"] != VERSION:
+            raise ValueError(f"Unsupported columnar transcript version {header['version']}.")
+
+        self.language = header["language"]
+        self.speakers = header["speakers"]
+        data_start = -(-(len(MAGIC) + 4 + header_len) // ALIGNMENT) * ALIGNMENT
+        self._map = np.memmap(path, dtype="u1", mode="r")
+        for name, (offset, length) in header["columns"].items():
+            dtype = np.dtype(COLUMNS[name])
+            column = self._map[data_start + offset:data_start + offset + length * dtype.itemsize]
+            setattr(self, name, column.view(dtype))
+
+    @property
+    def n_words(self):
+        return len(self.word_start)
+
+    @property
+    def n_segments(self):
+        return len(self.segment_start)
+
+    def speaker_name(self, code):
+        return None if code < 0 else self.speakers[code]
+
+    def word(self, index):
+        return bytes(self.word_text[self.word_text_offsets[index]:self.word_text_offsets[index + 1]]).decode("utf-8")
+
+    def segment_text_at(self, index):
+        start, end = self.segment_text_offsets[index], self.segment_text_offsets[index + 1]
+        return bytes(self.segment_text[start:end]).decode("utf-8")
+
+    def words(self):
+        """All word strings, decoded in one pass over the string table."""
+        blob = bytes(self.word_text)
+        offsets = self.word_text_offsets.tolist()
+        return [blob[offsets[i]:offsets[i + 1]].decode("utf-8") for i in range(self.n_words)]
+
+    def segments(self):
+        """Yield (speaker, text) for every segment without building word dicts."""
+        for index in range(self.n_segments):
+            yield self.speaker_name(int(self.segment_speaker[index])), self.segment_text_at(index)
+
+    def to_dict(self):
+        """Rebuild the whisperx-style result, for JSON export and older callers."""
+        def value(x):
+            return None if np.isnan(x) else round(float(x), 3)
+
+        words = self.words()
+        word_dicts = []
+        for i in range(self.n_words):
+            word = {"word": words[i]}
+            for key, column in (("start", self.word_start), ("end", self.word_end), ("score", self.word_score)):
+                if not np.isnan(column[i]):
+                    word[key] = value(column[i])
+            speaker = self.speaker_name(int(self.word_speaker[i]))
+            if speaker is not None:
+                word["speaker"] = speaker
+            word_dicts.append(word)
+
+        segments = []
+        for index in range(self.n_segments):
+            segment = {
+                "start": value(self.segment_start[index]),
+                "end": value(self.segment_end[index]),
+                "text": self.segment_text_at(index),
+                "words": word_dicts[self.segment_word_offsets[index]:self.segment_word_offsets[index + 1]],
+            }
+            speaker = self.speaker_name(int(self.segment_speaker[index]))
+            if speaker is not None:
+                segment["speaker"] = speaker
+            segments.append(segment)
+        return {"segments": segments, "word_segments": word_dicts}
+
+    def export_json(self, path):
+        with open(path, "w") as json_file:
+            json.dump(self.to_dict(), json_file, separators=(",", ":"))
+        return path
+
+
+def load_columnar(path):
+    return ColumnarTranscript(path)
@@ -1,47 +1,62 @@
 from os import path
-from pydub import AudioSegment
-from pytube import YouTube
-from moviepy.editor import *
 import os
-import assemblyai as aai
 import json
-import wave
 import re
+import wave
+import numpy as np
 from src.logger import logging
+from src.audio_probe import probe_audio
+from src.ingest import SAMPLE_RATE, IngestStats, iter_pcm, log_ingest
+from src.transcript_store import load_columnar
+from src.conversation import Conversation
 
 
 def convertmp3_to_wav(input_file_path, output_file_path):
-    # Convert MP3 to WAV
-    sound = AudioSegment.from_mp3(input_file_path)
-    sound.export(output_file_path, format="wav")
+    """
+    Convert any audio file ffmpeg can read to a 16 kHz mono 16-bit WAV.
+
+    The input is streamed through ffmpeg chunk by chunk, so memory stays
+    bounded. The pipeline itself does not need this: AudioBuffer.from_file
+    reads MP3 and other containers directly.
+    """
+    stats = IngestStats(input_file_path)
+    with wave.open(output_file_path, 'wb') as wav_file:
+        wav_file.setnchannels(1)
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(SAMPLE_RATE)
+        for chunk in iter_pcm(input_file_path, stats=stats):
+            wav_file.writeframes((np.clip(chunk, -1.0, 1.0) * 32767).astype('<i2').tobytes())
+    log_ingest(stats)
 
     return output_file_path
 
 
 def extract_audio_from_youtube(youtube_url):
+    """
+    Download only the audio stream of a YouTube video and return its path.
+
+    The file is kept in its original container (usually mp4/m4a) instead of
+    being re-encoded to mp3; AudioBuffer.from_file decodes it directly.
+    """
+    # Imported on use so the pipeline does not pay for it at startup
+    from pytube import YouTube
+
     try:
         # Create a YouTube object with the provided URL
         video = YouTube(youtube_url)
 
-        # Filter for audio streams and select the first available one
-        audio_stream = video.streams.filter(only_audio=True).first()
+        # Filter for audio streams and select the best available one
+        audio_stream = video.streams.filter(only_audio=True).order_by('abr').desc().first()
 
         # Download the audio stream
-        audio_stream.download()
-
-        video_path =audio_stream.default_filename
-        audio_path = video_path.replace(".mp4",".mp3")
-
-        clip = AudioFileClip(video_path) # type: ignore
-        clip.write_audiofile(audio_path)
-        
-        os.remove(video_path)
-        return audio_path
+        return audio_stream.download()
 
     except Exception as e:
         print(f"An error occurred: {e}")
 
 def get_transcript_using_assemblyai(assembly_api_key, mp3file_path):
+    import assemblyai as aai
+
     aai.settings.api_key = assembly_api_key 
 
     transcriber = aai.Transcriber()
@@ -54,28 +69,24 @@ def get_transcript_using_assemblyai(assembly_api_key, mp3file_path):
     
 
 def extract_audio_duration(file_path):
-    logging.info("Extracts the duration of an audio file in seconds.")
-    
-    if not os.path.isfile(file_path):
-        return 'File does not exist.'
-    
-    try:
-        with wave.open(file_path, 'rb') as audio_file:
-            frames = audio_file.getnframes()
-            rate = audio_file.getframerate()
-            duration_in_seconds = frames / float(rate)
+    """
+    Duration of an audio file in minutes, read from its headers without decoding.
 
-        # Convert duration from seconds to minutes
-        duration_in_minutes = duration_in_seconds / 60
-        
-        logging.info(f"Total Duration: {duration_in_minutes:.2f} minutes")
-        return round(duration_in_minutes, 2)  # Round to 2 decimal places
-    
-    except Exception as e:
-        return str(e)
+    :raises FileNotFoundError: if file_path does not exist
+    :raises AudioProbeError: if the file is not WAV, MP3, FLAC or Ogg
+    """
+    logging.info("Extracts the duration of an audio file in seconds.")
+    duration_in_minutes = probe_audio(file_path).duration / 60
+    logging.info("Total Duration: %.2f minutes", duration_in_minutes)
+    return round(duration_in_minutes, 2)  # Round to 2 decimal places
 
 def count_words(transcript):
     logging.info("Counts total words and words spoken by each speaker.")
+    if isinstance(transcript, Conversation):
+        total_words, speaker_word_count = transcript.word_counts()
+        logging.info("total_words: %s, speaker_work_count: %s", total_words, speaker_word_count)
+        return total_words, speaker_word_count
+
     total_words = 0
     speaker_word_count = {}
 
@@ -94,50 +105,36 @@ def count_words(transcript):
                 speaker_word_count[speaker_name] = 0
             speaker_word_count[speaker_name] += word_count
         
-    logging.info(f"total_words: {total_words}, speaker_work_count: {speaker_word_count}")
+    logging.info("total_words: %s, speaker_work_count: %s", total_words, speaker_word_count)
 
     return total_words, speaker_word_count
 
-def display_conversation(filename='data.json', uniq_speakers=None):
-    logging.info("Display the conversation from the JSON file.")
-    
-    with open(filename, 'r') as file:
-        data = json.load(file)
-
-    # Create dynamic speaker mapping based on unique speakers
-    if uniq_speakers is None:
-        uniq_speakers = list(set(segment['speaker'] for segment in data['segments']))
+def build_conversation(filename='data.json', uniq_speakers=None, result=None):
+    """
+    Build the typed Conversation from a transcript file or an in-memory result.
 
-    speaker_map = {speaker: f"Speaker {i + 1}" for i, speaker in enumerate(uniq_speakers)}
+    :param result: In-memory result from diarize_audio(); when given, filename is not read
+    """
+    logging.info("Build the conversation from the transcript.")
+    if result is not None:
+        return Conversation.from_result(result, uniq_speakers)
+    if filename.endswith('.ctr'):
+        return Conversation.from_columnar(load_columnar(filename), uniq_speakers)
 
-    conversation = []
-    current_speaker = None
-    current_text = ""
+    with open(filename, 'r') as file:
+        return Conversation.from_result(json.load(file), uniq_speakers)
 
-    for segment in data['segments']:
-        speaker = segment['speaker']
-        text = segment['text'].strip()
 
-        if speaker == current_speaker:
-            # If the same speaker continues, append to current text
-            current_text += f" {text}"
-        else:
-            # If a new speaker starts, save the previous text and reset
-            if current_speaker is not None:
-                conversation.append(f"<strong>{speaker_map[current_speaker]}:</strong> {current_text.strip()}")  # Add previous speaker's text
-            
-            # Update to the new speaker
-            current_speaker = speaker
-            current_text = text
-
-    # Don't forget to add the last speaker's text after the loop
-    if current_speaker is not None:
-        conversation.append(f"<strong>{speaker_map[current_speaker]}:</strong> {current_text.strip()}")
-            
-    return conversation
+def display_conversation(filename='data.json', uniq_speakers=None, result=None):
+    """The conversation rendered as "<strong>Speaker 1:</strong> text" lines."""
+    logging.info("Display the conversation from the transcript.")
+    return build_conversation(filename, uniq_speakers, result).to_html()
 
 def extract_speaker_texts(conversation):
     logging.info("Extract individual speaker texts from the conversation output.")
+    if isinstance(conversation, Conversation):
+        return conversation.speaker_texts()
+
     speaker_texts = {}
     speaker_pattern = re.compile(r'<strong>(Speaker \d+):</strong>(.*)')
 
@@ -154,27 +151,26 @@ def extract_speaker_texts(conversation):
 
     return speaker_texts
 
-def save_transcription(conversation):
-    directory = 'transcriptions'
+def save_transcription(conversation, directory='transcriptions'):
     if not os.path.exists(directory):
         os.makedirs(directory)
 
     full_transcription_file = os.path.join(directory, 'transcription_with_speakers.txt')
     no_speakers_file = os.path.join(directory, 'transcription_with_no_speakers.txt')
 
-    # Empty the existing files if present
-    open(full_transcription_file, 'w').close()
-    open(no_speakers_file, 'w').close()
-
-    with open(full_transcription_file, 'a') as file_full:
-        with open(no_speakers_file, 'a') as file_no_speakers:
+    # Opened once in 'w' mode, which also empties what a previous save wrote
+    with open(full_transcription_file, 'w') as file_full, open(no_speakers_file, 'w') as file_no_speakers:
+        if isinstance(conversation, Conversation):
+            file_full.writelines(f"{line}\n" for line in conversation.to_lines())
+            file_no_speakers.writelines(f"{turn.text} " for turn in conversation)
+        else:
             for entry in conversation:
                 # Remove HTML tags for full transcription
                 entry_no_tags = re.sub(r'<.*?>', '', entry)
                 file_full.write(entry_no_tags + '\n')
-                
+
                 # Remove speaker name for no speakers transcription
                 entry_without_speaker = entry_no_tags.split(': ', 1)[-1]
                 file_no_speakers.write(entry_without_speaker + ' ')
-    
+
     return directory
@@ -0,0 +1,451 @@
+import collections
+import itertools
+import multiprocessing as mp
+import os
+import signal
+import threading
+import time
+from concurrent.futures import Future
+from multiprocessing import reduction
+from multiprocessing.connection import Connection, wait
+from src.logger import job_context, logging
+
+
+class PoolFullError(Exception):
+    pass
+
+
+class WorkerCrashedError(Exception):
+    pass
+
+
+def _heartbeat(send, interval, stop):
+    while not stop.wait(interval):
+        try:
+            send("heartbeat")
+        except OSError:
+            # The parent closed the pipe; the main thread finds out on its next send or recv.
+            return
+
+
+def _worker_main(worker_id, job_fn, tasks, events, max_jobs, heartbeat_interval):
+    send_lock = threading.Lock()
+
+    def send(kind, job_id=None, value=None):
+        with send_lock:
+            events.send((kind, worker_id, job_id, value))
+
+    stop = threading.Event()
+    # Heartbeats come from a thread so long-running jobs still report as alive.
+    threading.Thread(target=_heartbeat, args=(send, heartbeat_interval, stop), daemon=True).start()
+    send("ready", value=os.getpid())
+    try:
+        for _ in range(max_jobs):
+            try:
+                item = tasks.recv()
+            except EOFError:
+                return
+            if item is None:
+                return
+            job_id, log_id, payload = item
+
+            def progress(message, job_id=job_id):
+                send("progress", job_id, message)
+
+            try:
+                with job_context(log_id or job_id):
+                    result = job_fn(payload, progress)
+                send("done", job_id, result)
+            except Exception as e:
+                send("failed", job_id, f"{type(e).__name__}: {e}")
+    finally:
+        stop.set()
+
+
+def _fork_server(requests, deaths, job_fn, max_jobs, heartbeat_interval):
+    """
+    Forks every worker from this process, which holds the preloaded models and runs no other thread.
+
+    requests receives a worker id and answers with the new pid, followed by
+    the parent's ends of the worker's task and event pipes as file
+    descriptors. Each worker has pipes of its own, so a worker killed halfway
+    through a read or write can only break its own channel. The exit code of
+    every worker is reported on deaths as (pid, exitcode).
+    """
+    parent_pid = os.getppid()
+    children = set()
+    while True:
+        if requests.poll(0.2):
+            try:
+                request = requests.recv()
+            except EOFError:
+                request = None
+            if request is None:
+                break
+            worker_id = request
+            task_reader, task_writer = mp.Pipe(duplex=False)
+            event_reader, event_writer = mp.Pipe(duplex=False)
+            pid = os.fork()
+            if pid == 0:
+                requests.close()
+                deaths.close()
+                task_writer.close()
+                event_reader.close()
+                code = 0
+                try:
+                    _worker_main(worker_id, job_fn, task_reader, event_writer, max_jobs, heartbeat_interval)
+                except BaseException:
+                    code = 1
+                finally:
+                    # os._exit skips multiprocessing's cleanup: flush the log first.
+                    logging.shutdown()
+                    os._exit(code)
+            task_reader.close()
+            event_writer.close()
+            children.add(pid)
+            requests.send(pid)
+            reduction.send_handle(requests, task_writer.fileno(), parent_pid)
+            reduction.send_handle(requests, event_reader.fileno(), parent_pid)
+            # Closed here so workers forked later do not inherit them.
+            task_writer.close()
+            event_reader.close()
+        while children:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+            if pid == 0:
+                break
+            children.discard(pid)
+            deaths.send((pid, os.waitstatus_to_exitcode(status)))
+    for pid in children:
+        os.kill(pid, signal.SIGTERM)
+
+
+class _ForkedWorker:
+    """
+    Parent-side handle of a worker forked by the fork server.
+
+    The worker is the fork server's child, so its exit is learnt from the
+    server's death reports rather than from waitpid.
+    """
+
+    def __init__(self, pid, pool):
+        self.pid = pid
+        self.exitcode = None
+        self._pool = pool
+
+    def is_alive(self):
+        self._pool._reap()
+        return self.exitcode is None
+
+    def terminate(self):
+        if self.is_alive():
+            try:
+                os.kill(self.pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def join(self, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self.is_alive() and (deadline is None or time.monotonic() < deadline):
+            time.sleep(0.05)
+
+
+class WorkerPool:
+    """
+    Pool of forked worker processes that run pipeline jobs.
+
+    preload() runs in the parent, and a fork server is forked right after it,
+    before the pool starts any thread. Every worker, including replacements
+    started later by the supervisor thread, is forked from that server. So
+    the models are shared copy-on-write, and no worker is forked from the
+    multithreaded parent. Workers exit after max_jobs_per_worker jobs and are
+    replaced, which caps memory growth; workers that die or stop sending
+    heartbeats are replaced too and their in-flight job fails with
+    WorkerCrashedError. A job running longer than job_timeout has its worker
+    terminated and fails with TimeoutError.
+
+    Jobs wait in the parent and are handed to one idle worker at a time over
+    that worker's own pipe. The parent records the job as the worker's
+    current job before sending it, so a worker dying at any point never
+    loses track of its job.
+    """
+
+    def __init__(self, job_fn, workers=2, max_queue=8, max_jobs_per_worker=50, preload=None,
+                 heartbeat_interval=5, heartbeat_timeout=60, job_timeout=None):
+        """
+        :param job_fn: job_fn(payload, progress) run inside a worker; must return something picklable
+        :param max_queue: Jobs allowed to wait; submit() raises PoolFullError beyond that
+        :param preload: Optional callable run once in the parent before forking
+        :param job_timeout: Seconds a job may run before its worker is terminated; None for no limit
+        """
+        self.job_fn = job_fn
+        self.workers = workers
+        self.max_queue = max_queue
+        self.max_jobs_per_worker = max_jobs_per_worker
+        self.preload = preload
+        self.heartbeat_interval = heartbeat_interval
+        self.heartbeat_timeout = heartbeat_timeout
+        self.job_timeout = job_timeout
+
+        self._ctx = mp.get_context("fork")
+        self._waiting = collections.deque()  # (job_id, log_id, payload) not yet handed to a worker
+        self._fork_server = None
+        self._requests = None
+        self._deaths = None
+        self._spawn_lock = threading.Lock()
+        self._by_pid = {}
+        self._processes = {}
+        self._heartbeats = {}
+        self._tasks = {}  # worker id -> parent's end of its task pipe
+        self._events = {}  # worker id -> parent's end of its event pipe, until the collector reads EOF
+        self._retired = []  # event pipes of removed workers, closed by the collector
+        self._current_jobs = {}  # worker id -> id of the job handed to it, None when idle
+        self._dispatched = {}  # worker id -> jobs handed to it
+        self._job_started = {}  # worker id -> when its current job was handed to it
+        self._dead_since = {}
+        self._futures = {}
+        self._progress = {}
+        self._ids = itertools.count()
+        self._worker_ids = itertools.count()
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._threads = []
+        self.recycled = 0
+        self.crashed = 0
+
+    def start(self):
+        if self.preload is not None:
+            logging.info("Preloading models before forking workers.")
+            self.preload()
+        self._requests, server_requests = self._ctx.Pipe()
+        self._deaths, server_deaths = self._ctx.Pipe(duplex=False)
+        self._fork_server = self._ctx.Process(
+            target=_fork_server,
+            args=(server_requests, server_deaths, self.job_fn, self.max_jobs_per_worker, self.heartbeat_interval),
+            daemon=True,
+        )
+        self._fork_server.start()
+        server_requests.close()
+        server_deaths.close()
+        for _ in range(self.workers):
+            self._spawn()
+        self._threads = [
+            threading.Thread(target=self._collect, daemon=True),
+            threading.Thread(target=self._supervise, daemon=True),
+        ]
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def _spawn(self):
+        worker_id = next(self._worker_ids)
+        with self._spawn_lock:
+            self._requests.send(worker_id)
+            process = _ForkedWorker(self._requests.recv(), self)
+            tasks = Connection(reduction.recv_handle(self._requests), readable=False)
+            events = Connection(reduction.recv_handle(self._requests), writable=False)
+            # Registered before _reap() can read the worker's death report.
+            self._by_pid[process.pid] = process
+        with self._lock:
+            self._processes[worker_id] = process
+            self._tasks[worker_id] = tasks
+            self._events[worker_id] = events
+            self._current_jobs[worker_id] = None
+            self._dispatched[worker_id] = 0
+            self._heartbeats[worker_id] = time.monotonic()
+            self._dispatch()
+        logging.info(f"Started worker {worker_id} (pid {process.pid}).")
+
+    def _dispatch(self):
+        """Hand waiting jobs to idle workers; called with self._lock held."""
+        for worker_id, current in self._current_jobs.items():
+            if not self._waiting:
+                return
+            # A worker that has had its max jobs is about to exit; its replacement takes the next one.
+            if current is not None or self._dispatched[worker_id] >= self.max_jobs_per_worker:
+                continue
+            job = self._waiting.popleft()
+            self._current_jobs[worker_id] = job[0]
+            try:
+                self._tasks[worker_id].send(job)
+            except OSError:
+                # The worker is already gone and never saw the job; the supervisor replaces it.
+                self._current_jobs[worker_id] = None
+                self._dispatched[worker_id] = self.max_jobs_per_worker
+                self._waiting.appendleft(job)
+                continue
+            self._dispatched[worker_id] += 1
+            self._job_started[worker_id] = time.monotonic()
+
+    def _reap(self):
+        """Apply the fork server's reports of exited workers."""
+        with self._spawn_lock:
+            while self._deaths.poll():
+                try:
+                    pid, exitcode = self._deaths.recv()
+                except EOFError:
+                    break
+                process = self._by_pid.pop(pid, None)
+                if process is not None:
+                    process.exitcode = exitcode
+
+    def submit(self, payload, progress=None, log_id=None):
+        """
+        Queue a job without blocking.
+
+        :param progress: Optional callable receiving progress messages, called from a pool thread
+        :param log_id: Job id attached to the worker's log records; defaults to the pool's own id
+        :return: concurrent.futures.Future resolved with the job result
+        """
+        job_id = next(self._ids)
+        future = Future()
+        with self._lock:
+            if len(self._waiting) >= self.max_queue:
+                raise PoolFullError("Worker queue is full, try again later.")
+            self._futures[job_id] = future
+            if progress is not None:
+                self._progress[job_id] = progress
+            self._waiting.append((job_id, log_id, payload))
+            self._dispatch()
+        return future
+
+    def _resolve(self, job_id, result=None, error=None):
+        with self._lock:
+            future = self._futures.pop(job_id, None)
+            self._progress.pop(job_id, None)
+        if future is None:
+            return
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def _collect(self):
+        while not self._stopping.is_set():
+            with self._lock:
+                for conn in self._retired:
+                    conn.close()
+                self._retired = []
+                readers = {conn: worker_id for worker_id, conn in self._events.items()}
+            if not readers:
+                time.sleep(0.2)
+                continue
+            for conn in wait(list(readers), timeout=0.2):
+                try:
+                    event = conn.recv()
+                except (EOFError, OSError):
+                    # Everything the worker sent has been read; the supervisor may replace it now.
+                    with self._lock:
+                        if self._events.get(readers[conn]) is conn:
+                            del self._events[readers[conn]]
+                    conn.close()
+                    continue
+                self._handle_event(*event)
+
+    def _handle_event(self, kind, worker_id, job_id, value):
+        with self._lock:
+            # A replaced worker's late events must not bring its bookkeeping back.
+            if worker_id in self._processes:
+                self._heartbeats[worker_id] = time.monotonic()
+                if kind in ("done", "failed") and self._current_jobs[worker_id] == job_id:
+                    self._current_jobs[worker_id] = None
+                    self._job_started.pop(worker_id, None)
+                    self._dispatch()
+        if kind == "progress":
+            callback = self._progress.get(job_id)
+            if callback is not None:
+                callback(value)
+        elif kind == "done":
+            self._resolve(job_id, result=value)
+        elif kind == "failed":
+            self._resolve(job_id, error=RuntimeError(value))
+
+    def _supervise(self):
+        while not self._stopping.wait(self.heartbeat_interval):
+            now = time.monotonic()
+            with self._lock:
+                workers = list(self._processes.items())
+            for worker_id, process in workers:
+                stale = now - self._heartbeats.get(worker_id, now) > self.heartbeat_timeout
+                started = self._job_started.get(worker_id)
+                overdue = self.job_timeout is not None and started is not None and now - started > self.job_timeout
+                if process.is_alive() and not stale and not overdue:
+                    continue
+                if not process.is_alive() and worker_id in self._events:
+                    # Give the collector a moment to drain the worker's last events.
+                    first_seen = self._dead_since.setdefault(worker_id, now)
+                    if now - first_seen < self.heartbeat_interval:
+                        continue
+                if stale and process.is_alive():
+                    logging.info(f"Worker {worker_id} missed its heartbeats, terminating it.")
+                    process.terminate()
+                elif overdue and process.is_alive():
+                    logging.info(f"Worker {worker_id} ran its job past {self.job_timeout}s, terminating it.")
+                    process.terminate()
+                process.join(timeout=5)
+                with self._lock:
+                    del self._processes[worker_id]
+                    self._heartbeats.pop(worker_id, None)
+                    self._dead_since.pop(worker_id, None)
+                    self._dispatched.pop(worker_id, None)
+                    self._job_started.pop(worker_id, None)
+                    self._tasks.pop(worker_id).close()
+                    events = self._events.pop(worker_id, None)
+                    if events is not None:
+                        self._retired.append(events)
+                    job_id = self._current_jobs.pop(worker_id)
+                    lost = job_id is not None and job_id in self._futures
+                if lost and overdue:
+                    self.crashed += 1
+                    self._resolve(job_id, error=TimeoutError(f"Job ran longer than {self.job_timeout}s."))
+                elif lost:
+                    self.crashed += 1
+                    self._resolve(job_id, error=WorkerCrashedError(f"Worker {worker_id} died while running a job."))
+                else:
+                    self.recycled += 1
+                if not self._stopping.is_set():
+                    self._spawn()
+
+    def health(self):
+        now = time.monotonic()
+        with self._lock:
+            return {
+                "workers": {
+                    worker_id: {
+                        "pid": process.pid,
+                        "alive": process.is_alive(),
+                        "last_heartbeat_s": round(now - self._heartbeats.get(worker_id, now), 1),
+                        "busy": self._current_jobs[worker_id] is not None,
+                    }
+                    for worker_id, process in self._processes.items()
+                },
+                "pending_jobs": len(self._futures),
+                "waiting_jobs": len(self._waiting),
+                "recycled": self.recycled,
+                "crashed": self.crashed,
+            }
+
+    def stop(self, timeout=10):
+        self._stopping.set()
+        with self._lock:
+            processes = list(self._processes.values())
+            tasks = list(self._tasks.values())
+        for conn in tasks:
+            try:
+                conn.send(None)
+            except OSError:
+                pass
+        for process in processes:
+            process.join(timeout=timeout)
+            if process.is_alive():
+                process.terminate()
+        for thread in self._threads:
+            thread.join(timeout=timeout)
+        with self._lock:
+            for conn in [*self._tasks.values(), *self._events.values(), *self._retired]:
+                conn.close()
+        if self._fork_server is not None:
+            with self._spawn_lock:
+                self._requests.send(None)
+            self._fork_server.join(timeout=timeout)
+            if self._fork_server.is_alive():
+                self._fork_server.terminate()
@@ -0,0 +1,53 @@
+import os
+import shutil
+import tempfile
+import uuid
+from src.logger import logging
+
+
+class JobWorkspace:
+    """
+    Private scratch directory for one job.
+
+    Every temporary file a job needs (the upload, exports, transcription
+    files) is created inside it, so concurrent jobs on the same host never
+    share paths. The directory is removed by cleanup() or when leaving a
+    ``with`` block.
+    """
+
+    def __init__(self, root=None, job_id=None, keep=False):
+        self.job_id = job_id or uuid.uuid4().hex
+        if root is not None:
+            os.makedirs(root, exist_ok=True)
+        self.directory = tempfile.mkdtemp(prefix=f"job_{self.job_id}_", dir=root)
+        self.keep = keep
+
+    def path(self, *parts):
+        """Path of a file inside the workspace; intermediate directories are created."""
+        path = os.path.join(self.directory, *parts)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        return path
+
+    def write_bytes(self, name, data):
+        path = self.path(name)
+        with open(path, "wb") as file:
+            file.write(data)
+        return path
+
+    def write_stream(self, name, stream, chunk_size=1 << 20):
+        path = self.path(name)
+        with open(path, "wb") as file:
+            shutil.copyfileobj(stream, file, length=chunk_size)
+        return path
+
+    def cleanup(self):
+        if self.keep or not os.path.isdir(self.directory):
+            return
+        shutil.rmtree(self.directory, ignore_errors=True)
+        logging.info(f"Removed workspace {self.directory}.")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.cleanup()
@@ -4,6 +4,11 @@ const transcriptionDiv = document.getElementById('transcription');
 const tabContent = document.getElementById('tab-content');
 const loader = document.getElementById('loader');
 const statusUpdates = document.getElementById('status-updates');
+let currentJobId = null;
+
+function withJob(url) {
+    return currentJobId ? `${url}?job_id=${currentJobId}` : url;
+}
 
 uploadBtn.addEventListener('click', async() => {
     const file = fileUpload.files[0];
@@ -20,10 +25,16 @@ uploadBtn.addEventListener('click', async() => {
         uploadBtn.disabled = true;
         statusUpdates.innerHTML = '';
 
-        // Display success message for file upload
-        statusUpdates.innerHTML += '<p>File uploaded successfully. Processing started...</p>';
+        const uploadResponse = await fetch('/upload/', {
+            method: 'POST',
+            body: formData,
+        });
+        if (!uploadResponse.ok) {
+            throw new Error(`Upload failed with status ${uploadResponse.status}`);
+        }
+        currentJobId = (await uploadResponse.json()).job_id;
 
-        const eventSource = new EventSource('/transcribe/');
+        const eventSource = new EventSource(withJob('/transcribe/'));
 
         eventSource.onmessage = function(event) {
             const data = event.data;
@@ -33,6 +44,10 @@ uploadBtn.addEventListener('click', async() => {
             if (data === 'status: Processing complete!') {
                 eventSource.close();
                 getTranscription();
+            } else if (data.startsWith('status: Error:')) {
+                eventSource.close();
+                loader.style.display = 'none';
+                uploadBtn.disabled = false;
             }
         };
 
@@ -54,7 +69,7 @@ uploadBtn.addEventListener('click', async() => {
 
 async function getTranscription() {
     try {
-        const response = await fetch('/transcription/');
+        const response = await fetch(withJob('/transcription/'));
         const data = await response.json();
         if (data.conversation) {
             displayTranscription(data.conversation);
@@ -80,11 +95,11 @@ async function showTab(tabName) {
     let content = '';
     try {
         if (tabName === 'summary') {
-            const response = await fetch('/summary/');
+            const response = await fetch(withJob('/summary/'));
             const data = await response.json();
             content = displaySummary(data);
         } else if (tabName === 'stats') {
-            const response = await fetch('/stats/');
+            const response = await fetch(withJob('/stats/'));
             const data = await response.json();
             content = displayStats(data);
         }
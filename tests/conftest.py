@@ -0,0 +1,56 @@
+import os
+import sys
+import pytest
+
+# src/ is imported as a namespace package from the repository root, as the apps do.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+
+@pytest.fixture
+def fake_whisperx(tmp_path, monkeypatch):
+    """A fake whisperx module that pool workers, which start in fresh interpreters, import as well."""
+    from src import chunked_transcription
+
+    (tmp_path / "whisperx.py").write_text(
+        "import sys\nfrom benchmarks.fakes import fake_whisperx\nsys.modules[__name__] = fake_whisperx()\n"
+    )
+    monkeypatch.syspath_prepend(str(tmp_path))
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.delitem(sys.modules, "whisperx", raising=False)
+    yield
+    chunked_transcription.shutdown_pools()
+
+
+@pytest.fixture
+def fake_ffmpeg(tmp_path, monkeypatch):
+    """
+    An ffmpeg on PATH that streams its -i file to stdout unchanged.
+
+    Tests write float32 samples with write_pcm(name, samples) and decode the
+    returned path. A missing input fails at once; an input named *corrupt* is
+    streamed and then fails, like a file truncated mid-stream.
+    """
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    script = bin_dir / "ffmpeg"
+    script.write_text(
+        f"#!{sys.executable}\n"
+        "import shutil, sys\n"
+        "source = sys.argv[sys.argv.index('-i') + 1]\n"
+        "try:\n"
+        "    with open(source, 'rb') as file:\n"
+        "        shutil.copyfileobj(file, sys.stdout.buffer)\n"
+        "except OSError:\n"
+        "    sys.exit(1)\n"
+        "sys.exit(1 if 'corrupt' in source else 0)\n"
+    )
+    script.chmod(0o755)
+    monkeypatch.setenv("PATH", f"{bin_dir}{os.pathsep}{os.environ['PATH']}")
+
+    def write_pcm(name, samples):
+        path = tmp_path / name
+        samples.astype("<f4").tofile(path)
+        return str(path)
+
+    return write_pcm
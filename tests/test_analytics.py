@@ -0,0 +1,30 @@
+from src.analytics import conversation_analytics
+from src.utils import count_words
+
+
+def word(text, speaker, start=None, end=None):
+    segment = {"word": text, "speaker": speaker}
+    if start is not None:
+        segment.update(start=start, end=end)
+    return segment
+
+
+def test_untimed_words_are_counted_but_not_timed():
+    words = [
+        word("I", "SPEAKER_00", 0.0, 0.5), word("paid", "SPEAKER_00", 0.5, 1.0), word("250", "SPEAKER_00"),
+        word("ok", "SPEAKER_01", 1.2, 1.5), word("2024", "SPEAKER_01"),
+    ]
+    analytics = conversation_analytics(words, speaker_labels={"SPEAKER_00": "Speaker 1", "SPEAKER_01": "Speaker 2"})
+    speakers = analytics["speakers"]
+
+    total, by_speaker = count_words(["Speaker 1: I paid 250", "Speaker 2: ok 2024"])
+    assert {label: row["words"] for label, row in speakers.items()} == by_speaker
+    assert sum(row["words"] for row in speakers.values()) == total
+    assert speakers["Speaker 1"]["talk_time_s"] == 1.0
+    assert speakers["Speaker 1"]["words_per_minute"] == 120.0
+
+
+def test_words_are_counted_without_any_timestamps():
+    analytics = conversation_analytics([word("hello", "SPEAKER_00"), word("there", "SPEAKER_00")])
+    assert analytics["speakers"]["SPEAKER_00"]["words"] == 2
+    assert analytics["turns"] == 0
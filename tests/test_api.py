@@ -0,0 +1,61 @@
+import os
+import pytest
+from fastapi.testclient import TestClient
+import api
+from src.jobs import Job
+
+
+@pytest.fixture
+def client():
+    return TestClient(api.app)
+
+
+@pytest.mark.parametrize("path", ["/transcribe/", "/transcription/", "/summary/", "/stats/"])
+def test_results_need_a_job_id(client, path):
+    assert client.get(path).status_code == 422
+    assert client.get(path, params={"job_id": "unknown"}).status_code == 404
+
+
+def test_results_are_those_of_the_requested_job(client, monkeypatch):
+    jobs = {}
+    for name in ("first", "second"):
+        job = Job(f"{name}.wav", job_id=name)
+        job.result = {"conversation": [f"Speaker 1: {name}"]}
+        jobs[name] = job
+    monkeypatch.setattr(api.job_manager, "jobs", jobs)
+
+    response = client.get("/transcription/", params={"job_id": "first"})
+    assert response.json() == {"conversation": ["Speaker 1: first"]}
+
+
+@pytest.fixture
+def workspaces(tmp_path, monkeypatch):
+    """Directory every JobWorkspace of the test is created in."""
+    import tempfile
+
+    monkeypatch.setattr(tempfile, "tempdir", str(tmp_path))
+    return tmp_path
+
+
+def test_failed_job_removes_its_workspace(workspaces, monkeypatch):
+    def run_job(audio_path, progress):
+        raise RuntimeError("Failed to decode audio")
+
+    monkeypatch.setattr(api, "run_job", run_job)
+    workspace = api.JobWorkspace()
+    job = Job(workspace.write_bytes("upload.wav", b"RIFF"), workspace=workspace)
+
+    with pytest.raises(RuntimeError):
+        api.process_job(job, progress=lambda message: None)
+    assert not os.path.exists(workspace.directory)
+
+
+def test_rejected_upload_removes_its_workspace(client, workspaces, monkeypatch):
+    def submit(job):
+        raise api.QueueFullError("Too many jobs are waiting, try again later.")
+
+    monkeypatch.setattr(api.job_manager, "submit", submit)
+    response = client.post("/upload/", files={"file": ("call.wav", b"not really audio")})
+
+    assert response.status_code == 503
+    assert os.listdir(workspaces) == []
@@ -0,0 +1,135 @@
+import os
+import socket
+import subprocess
+import sys
+from datetime import datetime, timezone
+import pytest
+from src import archive as archive_module
+from src.archive import TranscriptArchive, read_index, read_record
+
+
+class Uploads:
+    """Uploader that copies each bundle aside, optionally failing."""
+
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.stored = {}
+
+    def __call__(self, path, key, metadata):
+        if self.fail:
+            raise ConnectionError("bucket unreachable")
+        with open(path, "rb") as file:
+            self.stored[key] = (file.read(), metadata)
+
+
+def _dead_pid():
+    process = subprocess.Popen([sys.executable, "-c", "pass"])
+    process.wait()
+    return process.pid
+
+
+def _orphan(directory, data, extension=".jsonl.gz"):
+    """Place bundle bytes under the name a process that has since died would have given them."""
+    name = (f"{datetime.now(timezone.utc):%Y%m%dT%H%M%SZ}-{socket.gethostname()}-{_dead_pid()}-"
+            f"0123abcd{extension}")
+    with open(os.path.join(directory, name), "wb") as file:
+        file.write(data)
+    return name
+
+
+def _records(tmp_path, count):
+    """Bytes of an unsealed gzip bundle with count records."""
+    writer = TranscriptArchive(str(tmp_path / "writer"), codec="gzip")
+    for i in range(count):
+        writer.append({"conversation": [f"Speaker 1: line {i}"]}, session_id=f"s{i}")
+    bundle = writer._bundle
+    bundle.file.close()
+    archive_module._open_bundles.discard(bundle.path)
+    with open(bundle.path, "rb") as file:
+        return file.read()
+
+
+def test_sealed_bundle_round_trip(tmp_path):
+    uploads = Uploads()
+    archive = TranscriptArchive(str(tmp_path / "archive"), uploader=uploads, codec="gzip")
+    entries = [archive.append({"conversation": [f"line {i}"]}, session_id=f"s{i}")[1] for i in range(3)]
+    archive.close()
+
+    [(key, (data, metadata))] = uploads.stored.items()
+    assert key.startswith("transcripts/year=") and metadata["records"] == "3"
+    assert read_record(data, entries[1], "gzip")["conversation"] == ["line 1"]
+    path = tmp_path / "bundle.jsonl.gz"
+    path.write_bytes(data)
+    assert [entry["session_id"] for entry in read_index(str(path), index_offset=metadata["index-offset"])] == \
+        ["s0", "s1", "s2"]
+    assert os.listdir(tmp_path / "archive") == []
+
+
+def test_finished_uploads_are_not_kept(tmp_path):
+    archive = TranscriptArchive(str(tmp_path / "archive"), uploader=Uploads(), codec="gzip", max_bytes=1)
+    for i in range(20):
+        archive.append({"conversation": [f"line {i}"]})
+    archive.flush()
+    archive._uploads.submit(lambda: None).result()
+    assert len(archive._pending) == 0
+    archive.close()
+
+
+def test_failed_upload_is_logged_kept_and_recovered(tmp_path):
+    directory = str(tmp_path / "archive")
+    failing = TranscriptArchive(directory, uploader=Uploads(fail=True), codec="gzip")
+    failing.append({"conversation": ["hello"]}, session_id="s0")
+    failing.close()
+    assert len(failing.failed) == 1
+    [name] = os.listdir(directory)
+    path = os.path.join(directory, name)
+    with open(path, "rb") as file:
+        sealed = file.read()
+    os.remove(path)
+    # As the next process to start on this directory finds it.
+    orphan = _orphan(directory, sealed)
+
+    uploads = Uploads()
+    TranscriptArchive(directory, uploader=uploads, codec="gzip").close()
+    [(key, (data, metadata))] = uploads.stored.items()
+    assert key.endswith(orphan) and data == sealed
+    assert metadata["records"] == "1"
+    assert os.listdir(directory) == []
+
+
+def test_orphaned_bundle_is_sealed_without_its_cut_short_record(tmp_path):
+    directory = tmp_path / "archive"
+    directory.mkdir()
+    complete = _records(tmp_path, 3)
+    name = _orphan(str(directory), complete + archive_module.compress(b'{"session_id":"s3"}\n', "gzip")[:-6])
+
+    uploads = Uploads()
+    TranscriptArchive(str(directory), uploader=uploads, codec="gzip").close()
+
+    [(key, (data, metadata))] = uploads.stored.items()
+    assert key.endswith(name) and metadata["records"] == "3"
+    assert int(metadata["index-offset"]) == len(complete)
+    sealed = tmp_path / name
+    sealed.write_bytes(data)
+    index = read_index(str(sealed))
+    assert [entry["session_id"] for entry in index] == ["s0", "s1", "s2"]
+    assert read_record(data, index[2], "gzip")["conversation"] == ["Speaker 1: line 2"]
+
+
+def test_bundles_of_running_processes_are_left_alone(tmp_path):
+    directory = str(tmp_path / "archive")
+    writer = TranscriptArchive(directory, codec="gzip")
+    writer.append({"conversation": ["still writing"]})
+
+    uploads = Uploads()
+    TranscriptArchive(directory, uploader=uploads, codec="gzip").close()
+    assert uploads.stored == {}
+    writer.close()
+
+
+@pytest.mark.parametrize("count", [0, 1])
+def test_scan_members_stops_at_a_truncated_member(count):
+    members = [archive_module.compress(b'{"n":%d}\n' % i, "gzip") for i in range(count + 1)]
+    data = b"".join(members[:count]) + members[count][:5]
+    assert [text for _, _, text in archive_module.scan_members(data, "gzip")] == \
+        [b'{"n":%d}\n' % i for i in range(count)]
@@ -0,0 +1,56 @@
+import os
+import numpy as np
+import pytest
+from src.audio_buffer import AudioBuffer
+from src.ingest import SAMPLE_RATE
+
+
+def test_short_audio_is_decoded_into_memory(fake_ffmpeg):
+    samples = np.linspace(-1, 1, 3 * SAMPLE_RATE, dtype=np.float32)
+    audio = AudioBuffer.from_file(fake_ffmpeg("call.f32", samples))
+
+    assert not audio.is_memmapped and audio.duration == 3.0
+    assert np.array_equal(audio.samples, samples)
+    assert audio.ingest_stats.samples == len(samples)
+
+
+def test_long_audio_round_trips_through_a_memmap(fake_ffmpeg, tmp_path):
+    samples = np.random.default_rng(0).standard_normal(40 * SAMPLE_RATE).astype(np.float32)
+    spill_dir = tmp_path / "spill"
+    spill_dir.mkdir()
+    audio = AudioBuffer.from_file(fake_ffmpeg("call.f32", samples), memmap_threshold_seconds=10,
+                                  tmp_dir=str(spill_dir))
+
+    assert audio.is_memmapped and isinstance(audio.samples, np.memmap)
+    assert os.path.dirname(audio.backing_file) == str(spill_dir)
+    assert np.array_equal(audio.samples, samples)
+    view = audio.view(12.5, 13)
+    assert np.shares_memory(view, audio.samples) and np.array_equal(view, samples[200000:208000])
+
+    # Copy-on-write: a stage scribbling on its view never reaches the file or other readers.
+    view[:] = 0
+    assert np.array_equal(np.fromfile(audio.backing_file, dtype=np.float32), samples)
+
+
+def test_close_releases_samples_and_deletes_the_backing_file(fake_ffmpeg):
+    samples = np.ones(20 * SAMPLE_RATE, dtype=np.float32)
+    with AudioBuffer.from_file(fake_ffmpeg("call.f32", samples), memmap_threshold_seconds=10) as audio:
+        backing_file = audio.backing_file
+        view = audio.view(0, 1)
+        assert os.path.exists(backing_file)
+
+    assert not os.path.exists(backing_file) and audio.backing_file is None
+    assert len(audio) == 0
+    # Views taken before close keep their pages after the file is unlinked.
+    assert view.sum() == SAMPLE_RATE
+    audio.close()
+
+
+def test_failed_decode_removes_the_spill_file(fake_ffmpeg, tmp_path):
+    spill_dir = tmp_path / "spill"
+    spill_dir.mkdir()
+    source = fake_ffmpeg("corrupt.f32", np.ones(20 * SAMPLE_RATE, dtype=np.float32))
+
+    with pytest.raises(RuntimeError, match="Failed to decode"):
+        AudioBuffer.from_file(source, memmap_threshold_seconds=10, tmp_dir=str(spill_dir))
+    assert os.listdir(spill_dir) == []
@@ -0,0 +1,97 @@
+import os
+import struct
+import wave
+import pytest
+from src.audio_probe import AudioProbeError, ProbeCache, probe_audio
+
+# MPEG-1 Layer III, 128 kbit/s, 44.1 kHz, stereo: 417-byte frames of 1152 samples.
+MP3_HEADER = b"\xff\xfb\x90\x00"
+MP3_FRAME = MP3_HEADER + bytes(413)
+
+
+def _write(path, data):
+    path.write_bytes(data)
+    return str(path)
+
+
+def test_wav(tmp_path):
+    path = str(tmp_path / "call.wav")
+    with wave.open(path, "wb") as file:
+        file.setnchannels(1)
+        file.setsampwidth(2)
+        file.setframerate(16000)
+        file.writeframes(bytes(2 * 16000 * 3))
+
+    info = probe_audio(path, cache=None)
+    assert (info.format, info.duration, info.sample_rate, info.channels) == ("wav", 3.0, 16000, 1)
+
+
+def test_flac(tmp_path):
+    sample_rate, channels, total_samples = 44100, 2, 44100 * 5
+    info = (sample_rate << 44) | ((channels - 1) << 41) | (15 << 36) | total_samples
+    streaminfo = bytes(10) + info.to_bytes(8, "big") + bytes(16)
+    data = b"fLaC" + bytes([0x80]) + len(streaminfo).to_bytes(3, "big") + streaminfo
+
+    info = probe_audio(_write(tmp_path / "call.flac", data), cache=None)
+    assert (info.format, info.duration, info.sample_rate, info.channels) == ("flac", 5.0, 44100, 2)
+
+
+def _ogg_page(granule, payload):
+    return b"OggS" + bytes(2) + struct.pack("<q", granule) + bytes(12) + bytes([1, len(payload)]) + payload
+
+
+def test_ogg_opus(tmp_path):
+    head = b"OpusHead" + bytes([1, 1]) + struct.pack("<HI", 312, 16000) + bytes(3)
+    data = _ogg_page(0, head) + _ogg_page(48000 * 4 + 312, b"audio")
+
+    info = probe_audio(_write(tmp_path / "call.opus", data), cache=None)
+    assert (info.format, info.duration, info.sample_rate, info.channels) == ("ogg/opus", 4.0, 16000, 1)
+
+
+def test_constant_bitrate_mp3_with_tags(tmp_path):
+    id3 = b"ID3\x03\x00\x00" + bytes([0, 0, 0, 10]) + bytes(10)
+    data = id3 + MP3_FRAME * 100 + b"TAG" + bytes(125)
+
+    info = probe_audio(_write(tmp_path / "call.mp3", data), cache=None)
+    assert info.format == "mp3" and (info.sample_rate, info.channels) == (44100, 2)
+    assert info.duration == pytest.approx(100 * 417 * 8 / 128000)
+
+
+def test_variable_bitrate_mp3_uses_the_xing_frame_count(tmp_path):
+    xing = bytearray(MP3_FRAME)
+    xing[36:48] = b"Xing" + struct.pack(">II", 1, 1000)
+    data = bytes(xing) + MP3_FRAME * 3
+
+    info = probe_audio(_write(tmp_path / "call.mp3", data), cache=None)
+    assert info.duration == pytest.approx(1000 * 1152 / 44100)
+
+
+@pytest.mark.parametrize("magic", [b"\x00\x00\x00\x20ftypM4A ", b"\x1aE\xdf\xa3" + bytes(8), b"FORM" + bytes(8)])
+def test_other_containers_with_frame_like_bytes_are_not_mp3(tmp_path, magic):
+    # Payload that would pass the two-consecutive-frames check on its own.
+    path = _write(tmp_path / "call.m4a", magic + bytes(100) + MP3_FRAME * 2)
+    with pytest.raises(AudioProbeError, match="Unsupported container"):
+        probe_audio(path, cache=None)
+
+
+def test_stray_sync_bytes_are_not_a_frame(tmp_path):
+    path = _write(tmp_path / "noise.bin", b"\x01\x02\x03\x04" + b"\xff\xfb\x90\x00" + bytes(50) + b"\xff\x00" * 20)
+    with pytest.raises(AudioProbeError):
+        probe_audio(path, cache=None)
+
+
+def test_cache_is_keyed_on_size_and_mtime(tmp_path):
+    cache = ProbeCache()
+    path = _write(tmp_path / "call.mp3", MP3_FRAME * 10)
+    first = probe_audio(path, cache=cache)
+    assert probe_audio(path, cache=cache) == first
+    assert cache.stats()["hits"] == 1
+
+    _write(tmp_path / "call.mp3", MP3_FRAME * 20)
+    os.utime(path, ns=(0, 1))
+    assert probe_audio(path, cache=cache).duration == pytest.approx(2 * first.duration)
+
+
+def test_single_frame_file_is_mp3(tmp_path):
+    info = probe_audio(_write(tmp_path / "call.mp3", MP3_FRAME), cache=None)
+    assert info.duration == pytest.approx(417 * 8 / 128000)
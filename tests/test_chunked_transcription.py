@@ -0,0 +1,119 @@
+import threading
+import numpy as np
+import pytest
+from benchmarks import fakes
+from src import chunked_transcription
+from src.audio_buffer import AudioBuffer
+from src.chunked_transcription import find_windows
+
+RATE = fakes.SAMPLE_RATE
+
+
+def _speech_with_pauses(seconds, pause_every=10, pause_seconds=1):
+    """Speech-like audio with a silent pause_seconds gap every pause_every seconds."""
+    audio = fakes.synthetic_audio(seconds)
+    for start in range(pause_every, seconds, pause_every):
+        audio[start * RATE:(start + pause_seconds) * RATE] = 0
+    return audio
+
+
+def _assert_covers(windows, total):
+    assert windows[0][0] == 0 and windows[-1][1] == total
+    for (_, end), (start, _) in zip(windows, windows[1:]):
+        assert end == start
+    assert all(start < end for start, end in windows)
+
+
+def test_short_audio_is_one_window():
+    assert find_windows(np.zeros(10 * RATE, dtype=np.float32), RATE, target_seconds=30) == [(0, 10 * RATE)]
+
+
+def test_cuts_land_in_silences():
+    audio = _speech_with_pauses(120)
+    windows = find_windows(audio, RATE, target_seconds=25, search_seconds=8)
+
+    _assert_covers(windows, len(audio))
+    for start, _ in windows[1:]:
+        assert np.abs(audio[start - RATE // 10:start + RATE // 10]).max() == 0
+
+
+def test_search_wider_than_target_still_moves_forward():
+    audio = fakes.synthetic_audio(60)
+    windows = find_windows(audio, RATE, target_seconds=2, search_seconds=10)
+
+    _assert_covers(windows, len(audio))
+    assert len(windows) > 2
+
+
+def test_zero_search_cuts_at_the_target():
+    audio = fakes.synthetic_audio(60)
+    windows = find_windows(audio, RATE, target_seconds=10, search_seconds=0)
+
+    _assert_covers(windows, len(audio))
+    frame = int(RATE * chunked_transcription.FRAME_SECONDS)
+    assert all(abs(end - start - 10 * RATE) <= frame for start, end in windows[:-1])
+
+
+@pytest.mark.parametrize("target, search", [(0, 5), (-1, 5), (30, -1)])
+def test_invalid_arguments(target, search):
+    with pytest.raises(ValueError):
+        find_windows(np.zeros(RATE, dtype=np.float32), RATE, target_seconds=target, search_seconds=search)
+
+
+def test_windows_run_in_a_reused_pool_started_from_a_threaded_process(fake_whisperx):
+    audio = AudioBuffer(_speech_with_pauses(90))
+    stop = threading.Event()
+    busy = threading.Thread(target=stop.wait)
+    busy.start()
+    try:
+        first = chunked_transcription.transcribe_chunked(audio, "tiny", "cpu", "int8", target_seconds=20, workers=2)
+        pool = chunked_transcription.get_pool("tiny", "cpu", "int8", None, 16, 2)
+        second = chunked_transcription.transcribe_chunked(audio, "tiny", "cpu", "int8", target_seconds=20, workers=2)
+    finally:
+        stop.set()
+        busy.join()
+
+    assert pool._mp_context.get_start_method() != "fork"
+    assert chunked_transcription.get_pool("tiny", "cpu", "int8", None, 16, 2) is pool
+    assert first == second
+    starts = [segment["start"] for segment in first["segments"]]
+    assert starts == sorted(starts) and starts[-1] > 60
+
+
+class RecordingModel:
+    def __init__(self, name):
+        self.name = name
+        self.batch_sizes = []
+
+    def transcribe(self, samples, batch_size=16):
+        self.batch_sizes.append(batch_size)
+        return {"segments": [{"start": 0.0, "end": 1.0, "text": self.name}], "language": "en"}
+
+
+def test_inline_windows_use_the_callers_model_not_the_worker_globals():
+    audio = AudioBuffer(_speech_with_pauses(60))
+    models = [RecordingModel("a"), RecordingModel("b")]
+    results = {}
+
+    def run(model, batch_size):
+        results[model.name] = chunked_transcription.transcribe_chunked(
+            audio, "tiny", "cpu", "int8", batch_size=batch_size, target_seconds=20, workers=1, model=model)
+
+    threads = [threading.Thread(target=run, args=(model, batch_size)) for model, batch_size in zip(models, (4, 8))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert chunked_transcription._worker_model is None
+    assert models[0].batch_sizes and set(models[0].batch_sizes) == {4}
+    assert set(models[1].batch_sizes) == {8}
+    assert {segment["text"] for segment in results["a"]["segments"]} == {"a"}
+
+
+def test_inline_model_from_the_registry_is_released(fake_whisperx):
+    from src.model_registry import model_registry
+
+    audio = AudioBuffer(_speech_with_pauses(30))
+    chunked_transcription.transcribe_chunked(audio, "tiny", "cpu", "int8", target_seconds=20, workers=1)
+    assert model_registry.stats()["in_use"] == 0
@@ -0,0 +1,37 @@
+from src.chunking import count_tokens, pack_turns, split_conversation
+
+
+def turn(speaker, words):
+    return f"{speaker}: " + " ".join(f"w{i}" for i in range(words))
+
+
+def test_turns_exactly_at_the_limit_share_a_chunk():
+    first, second, third = turn("A", 40), turn("B", 30), turn("A", 5)
+    limit = count_tokens(first) + count_tokens(second)
+
+    assert pack_turns([first, second, third], limit) == [[first, second], [third]]
+    assert pack_turns([first, second, third], limit - 1) == [[first], [second, third]]
+
+
+def test_turn_exactly_at_the_limit_is_not_split():
+    long_turn = turn("A", 200)
+
+    assert pack_turns([long_turn], count_tokens(long_turn)) == [[long_turn]]
+
+
+def test_oversized_turn_is_split_on_sentences_then_words():
+    sentence = " ".join(f"w{i}" for i in range(30)) + "."
+    long_turn = "A: " + " ".join([sentence] * 4) + " " + " ".join(f"x{i}" for i in range(300))
+    limit = count_tokens(sentence) + 5
+
+    chunks = split_conversation([long_turn], limit)
+    pieces = [piece for chunk in chunks for piece in chunk]
+    assert len(chunks) > 4
+    assert all(sum(count_tokens(piece) for piece in chunk) <= limit for chunk in chunks)
+    assert " ".join(pieces).split() == long_turn.split()
+
+
+def test_display_markup_is_stripped_before_counting():
+    html = ["<p><b>Speaker 1</b>: Hello there.</p>", "<p></p>", "<p><b>Speaker 2</b>: Hi.</p>"]
+
+    assert split_conversation(html, 100) == [["Speaker 1: Hello there.", "Speaker 2: Hi."]]
@@ -0,0 +1,69 @@
+import json
+from src.conversation import Conversation, Turn
+from src.transcript_store import load_columnar, save_columnar
+from src.utils import build_conversation, count_words, extract_speaker_texts, save_transcription
+
+
+def segment(speaker, text, start, end):
+    words = [{"word": word, "start": start, "end": end, "speaker": speaker} for word in text.split()]
+    return {"speaker": speaker, "text": f" {text}", "start": start, "end": end, "words": words}
+
+
+RESULT = {
+    "language": "en",
+    "segments": [
+        segment("SPEAKER_01", "Hello, thanks for calling.", 0.0, 1.5),
+        segment("SPEAKER_01", "How can I help?", 1.5, 2.5),
+        segment("SPEAKER_00", "My order is late.", 3.0, 4.0),
+        segment("SPEAKER_01", "Let me check.", 4.5, 5.0),
+    ],
+}
+
+
+def test_consecutive_segments_merge_into_turns():
+    conversation = Conversation.from_result(RESULT)
+
+    assert [(turn.label, turn.start, turn.end) for turn in conversation] == [
+        ("Speaker 1", 0.0, 2.5), ("Speaker 2", 3.0, 4.0), ("Speaker 1", 4.5, 5.0)]
+    assert conversation.turns[0].text == "Hello, thanks for calling. How can I help?"
+    assert [(turn.word_start, turn.word_end) for turn in conversation] == [(0, 8), (8, 12), (12, 15)]
+
+
+def test_known_speakers_keep_their_order():
+    conversation = Conversation.from_result(RESULT, uniq_speakers=["SPEAKER_00", "SPEAKER_01"])
+
+    assert conversation.speaker_labels == {"SPEAKER_00": "Speaker 1", "SPEAKER_01": "Speaker 2"}
+    assert conversation.to_lines()[1] == "Speaker 1: My order is late."
+
+
+def test_columnar_round_trip_rebuilds_the_same_conversation(tmp_path):
+    in_memory = Conversation.from_result(RESULT)
+    stored = build_conversation(save_columnar(RESULT, str(tmp_path / "call.ctr")))
+
+    assert stored.to_dict() == in_memory.to_dict()
+    assert Conversation.from_columnar(load_columnar(str(tmp_path / "call.ctr"))).to_html() == in_memory.to_html()
+
+
+def test_serialized_forms_agree():
+    conversation = Conversation.from_result(RESULT)
+    data = json.loads(json.dumps(conversation.to_dict()))
+
+    assert data["speakers"] == {"SPEAKER_01": "Speaker 1", "SPEAKER_00": "Speaker 2"}
+    assert [turn["text"] for turn in data["turns"]] == [turn.text for turn in conversation]
+    assert set(data["turns"][0]) == set(Turn.__slots__)
+    assert conversation.to_html()[2] == "<strong>Speaker 1:</strong> Let me check."
+    # Counted from the model, the closing </strong> of each rendered line is not a word.
+    assert count_words(conversation) == (15, {"Speaker 1": 11, "Speaker 2": 4})
+    assert extract_speaker_texts(conversation) == extract_speaker_texts(conversation.to_html())
+
+
+def test_saved_transcription_replaces_an_earlier_save(tmp_path):
+    save_transcription(Conversation.from_result({"segments": RESULT["segments"] * 3}), str(tmp_path))
+    save_transcription(Conversation.from_result(RESULT), str(tmp_path))
+
+    with_speakers = (tmp_path / "transcription_with_speakers.txt").read_text().splitlines()
+    assert with_speakers == Conversation.from_result(RESULT).to_lines()
+    assert (tmp_path / "transcription_with_no_speakers.txt").read_text().startswith("Hello, thanks")
+
+    save_transcription(Conversation.from_result(RESULT).to_html(), str(tmp_path))
+    assert (tmp_path / "transcription_with_speakers.txt").read_text().splitlines() == with_speakers
@@ -0,0 +1,105 @@
+import os
+import threading
+import pytest
+from benchmarks import fakes
+from src import dairization
+from src.audio_buffer import AudioBuffer
+from src.dairization import WhisperTranscriber
+from src.model_registry import ModelRegistry
+from src.result_store import result_key
+
+
+def _transcriber(seconds, **kwargs):
+    return WhisperTranscriber(None, None, model_name="tiny", compute_type="int8", registry=ModelRegistry(),
+                              audio_buffer=AudioBuffer(fakes.synthetic_audio(seconds)), **kwargs)
+
+
+def test_run_concurrent_starts_the_window_pool_before_diarizing(fake_whisperx, monkeypatch):
+    threads_at_pool_start = []
+    get_pool = dairization.get_pool
+
+    def recording_get_pool(*args):
+        threads_at_pool_start.append([thread.name for thread in threading.enumerate()])
+        return get_pool(*args)
+
+    monkeypatch.setattr(dairization, "get_pool", recording_get_pool)
+    transcriber = _transcriber(90, long_audio_seconds=30, chunk_seconds=20, chunk_workers=2)
+    transcriber.load_model()
+    result, speakers = transcriber.run_concurrent()
+
+    assert threads_at_pool_start
+    assert not any(name.startswith("diarization") for name in threads_at_pool_start[0])
+    assert result["segments"] and len(speakers) == 2
+
+
+def test_short_recordings_do_not_start_a_pool(fake_whisperx, monkeypatch):
+    monkeypatch.setattr(dairization, "get_pool", lambda *args: (_ for _ in ()).throw(AssertionError("pool started")))
+    transcriber = _transcriber(20, long_audio_seconds=30, chunk_workers=2)
+    transcriber.load_model()
+    result, _ = transcriber.run_concurrent()
+    assert result["segments"]
+
+
+def test_whisper_models_are_stored_per_name(fake_whisperx, monkeypatch):
+    import whisperx
+
+    roots = []
+
+    def load_model(name, *args, download_root=None, **kwargs):
+        roots.append(download_root)
+
+    monkeypatch.setattr(whisperx, "load_model", load_model)
+    for name in ("tiny", "large-v2"):
+        WhisperTranscriber(None, None, model_name=name, registry=ModelRegistry()).load_model()
+
+    assert roots == [os.path.join(dairization.WHISPER_MODEL_DIR, "tiny"),
+                     os.path.join(dairization.WHISPER_MODEL_DIR, "large-v2")]
+
+
+def test_load_model_failure_is_raised(fake_whisperx, monkeypatch):
+    import whisperx
+
+    def broken(*args, **kwargs):
+        raise OSError("download failed")
+
+    monkeypatch.setattr(whisperx, "load_model", broken)
+    transcriber = WhisperTranscriber(None, None, registry=ModelRegistry())
+    with pytest.raises(OSError):
+        transcriber.load_model()
+    assert transcriber.model is None
+
+
+def test_transcribers_sharing_a_model_call_it_one_at_a_time(fake_whisperx):
+    registry = ModelRegistry()
+    calls = {"active": 0, "overlapped": False}
+
+    class OneCallAtATime:
+        def transcribe(self, samples, batch_size=16):
+            calls["active"] += 1
+            calls["overlapped"] |= calls["active"] > 1
+            threading.Event().wait(0.02)
+            calls["active"] -= 1
+            return {"segments": [], "language": "en"}
+
+    transcribers = [WhisperTranscriber(None, None, model_name="tiny", registry=registry,
+                                       audio_buffer=AudioBuffer(fakes.synthetic_audio(2))) for _ in range(4)]
+    for transcriber in transcribers:
+        transcriber.model = registry.acquire(transcriber.model_key, OneCallAtATime)
+        transcriber._model_keys.append(transcriber.model_key)
+    threads = [threading.Thread(target=transcriber.transcribe_audio) for transcriber in transcribers]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert not calls["overlapped"]
+    assert all(transcriber.result_trans == {"segments": [], "language": "en"} for transcriber in transcribers)
+
+
+def test_windowing_settings_are_part_of_the_result_key():
+    whole = WhisperTranscriber(None, None, long_audio_seconds=None, registry=ModelRegistry()).pipeline_params()
+    chunked = WhisperTranscriber(None, None, long_audio_seconds=600, registry=ModelRegistry()).pipeline_params()
+    shorter = WhisperTranscriber(None, None, long_audio_seconds=600, chunk_seconds=120,
+                                 registry=ModelRegistry()).pipeline_params()
+
+    assert len({result_key(b"audio", **params) for params in (whole, chunked, shorter)}) == 3
@@ -0,0 +1,66 @@
+import time
+import numpy as np
+import pytest
+from src.ingest import BYTES_PER_SAMPLE, IngestStats, ffmpeg_command, iter_pcm, load_pcm
+
+
+def test_chunks_are_full_except_the_last(fake_ffmpeg):
+    samples = np.arange(2500, dtype=np.float32) / 2500
+    stats = IngestStats("call.f32")
+    chunks = list(iter_pcm(fake_ffmpeg("call.f32", samples), chunk_samples=1000, stats=stats))
+
+    assert [len(chunk) for chunk in chunks] == [1000, 1000, 500]
+    assert np.array_equal(np.concatenate(chunks), samples)
+    assert stats.samples == 2500 and stats.chunks == 3 and stats.finished is not None
+    assert stats.as_dict()["audio_seconds"] == round(2500 / 16000, 2)
+
+
+def test_input_of_whole_chunks_ends_without_an_empty_chunk(fake_ffmpeg):
+    chunks = list(iter_pcm(fake_ffmpeg("call.f32", np.ones(2000, dtype=np.float32)), chunk_samples=1000))
+
+    assert [len(chunk) for chunk in chunks] == [1000, 1000]
+
+
+def test_chunks_are_writable_and_unshared(fake_ffmpeg):
+    first, second = iter_pcm(fake_ffmpeg("call.f32", np.ones(20, dtype=np.float32)), chunk_samples=10)
+
+    first[:] = 0
+    assert first.flags.writeable and second.sum() == 10
+    assert not np.shares_memory(first, second)
+
+
+def test_ffmpeg_failure_raises_after_the_stream(fake_ffmpeg):
+    source = fake_ffmpeg("corrupt.f32", np.ones(10, dtype=np.float32))
+    received = []
+
+    with pytest.raises(RuntimeError, match="Failed to decode audio"):
+        for chunk in iter_pcm(source):
+            received.append(chunk)
+    assert len(received) == 1
+
+
+def test_abandoned_stream_stops_ffmpeg(fake_ffmpeg):
+    # 200 kB does not fit in the pipe, so ffmpeg blocks on its write until it is killed.
+    stream = iter_pcm(fake_ffmpeg("call.f32", np.ones(50000, dtype=np.float32)), chunk_samples=100)
+    next(stream)
+    started = time.monotonic()
+    stream.close()
+
+    assert time.monotonic() - started < 5
+
+
+def test_load_pcm_concatenates_the_stream(fake_ffmpeg):
+    samples, stats = load_pcm(fake_ffmpeg("call.f32", np.full(300, 0.5, dtype=np.float32)), chunk_samples=128)
+
+    assert samples.dtype == np.float32 and len(samples) == 300 and stats.chunks == 3
+    assert samples.nbytes == 300 * BYTES_PER_SAMPLE
+
+
+def test_ffmpeg_decodes_to_mono_float32_on_stdout():
+    command = ffmpeg_command("https://example.com/call.mp4", sample_rate=8000)
+
+    assert command[0] == "ffmpeg" and command[-1] == "-"
+    assert command[command.index("-i") + 1] == "https://example.com/call.mp4"
+    assert command[command.index("-f") + 1] == "f32le"
+    assert command[command.index("-ac") + 1] == "1" and command[command.index("-ar") + 1] == "8000"
+    assert "-vn" in command and "-nostdin" in command
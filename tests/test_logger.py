@@ -0,0 +1,59 @@
+import json
+import os
+from src import logger
+
+
+def _records(monkeypatch, tmp_path, log):
+    logger.shutdown_logging()
+    monkeypatch.setattr(logger, "LOG_DIR", str(tmp_path))
+    try:
+        log()
+    finally:
+        logger.shutdown_logging()
+    with open(tmp_path / f"app-{os.getpid()}.log") as file:
+        return [json.loads(line) for line in file]
+
+
+def test_arguments_are_rendered_when_logged(monkeypatch, tmp_path):
+    def log():
+        items = ["first"]
+        logger.logging.warning("items %s", items)
+        items.append("second")
+
+    [record] = _records(monkeypatch, tmp_path, log)
+    assert record["message"] == "items ['first']"
+
+
+def test_records_carry_job_id_and_traceback(monkeypatch, tmp_path):
+    def log():
+        with logger.job_context("job-1"):
+            try:
+                raise ValueError("boom")
+            except ValueError:
+                logger.logging.exception("failed")
+
+    [record] = _records(monkeypatch, tmp_path, log)
+    assert record["job_id"] == "job-1"
+    assert record["process"] == os.getpid()
+    assert "ValueError: boom" in record["exception"]
+
+
+def test_verbose_sampling_is_exact_across_threads():
+    import logging
+    import threading
+
+    sampler = logger.VerboseSampler(every=10)
+    record = logging.LogRecord("app", logging.INFO, __file__, 1, "payload", None, None)
+    record.verbose = True
+    kept = []
+
+    def log():
+        kept.append(sum(sampler.filter(record) for _ in range(20000)))
+
+    threads = [threading.Thread(target=log) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sum(kept) == 8 * 20000 // 10
@@ -0,0 +1,104 @@
+import threading
+import time
+import pytest
+from src.model_registry import ModelKey, ModelRegistry, _estimate_size_mb
+
+
+class Parameter:
+    def __init__(self, count):
+        self.count = count
+
+    def numel(self):
+        return self.count
+
+    def element_size(self):
+        return 4
+
+
+class TorchLikeModel:
+    def __init__(self, megabytes):
+        self._parameters = [Parameter(megabytes * 1024 * 1024 // 4)]
+
+    def parameters(self):
+        return iter(self._parameters)
+
+
+def key(name):
+    return ModelKey(name, "cpu", None, None)
+
+
+def test_same_key_is_loaded_once_and_shared():
+    registry = ModelRegistry()
+    loads = []
+
+    def loader():
+        loads.append(1)
+        time.sleep(0.05)
+        return object()
+
+    models = []
+    threads = [threading.Thread(target=lambda: models.append(registry.acquire(key("a"), loader))) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(loads) == 1
+    assert len({id(model) for model in models}) == 1
+    assert registry.stats()["hits"] == 3 and registry.stats()["in_use"] == 1
+
+
+def test_only_unreferenced_models_are_evicted_least_recently_used_first():
+    registry = ModelRegistry(max_models=2)
+    registry.acquire(key("a"), object)
+    with registry.use(key("b"), object):
+        pass
+    with registry.use(key("c"), object):
+        pass
+
+    assert registry.evictions == 1
+    assert set(registry._entries) == {key("a"), key("c")}
+
+
+def test_memory_budget_counts_both_parts_of_an_align_model():
+    registry = ModelRegistry(max_models=None, memory_budget_mb=5)
+    with registry.use(key("align-en"), lambda: (TorchLikeModel(3), {"language": "en"})):
+        pass
+    assert registry.stats()["memory_mb"] == 3.0
+    with registry.use(key("align-fr"), lambda: (TorchLikeModel(3), {"language": "fr"})):
+        pass
+
+    assert registry.evictions == 1
+    assert set(registry._entries) == {key("align-fr")}
+
+
+def test_size_estimate_of_tuples_and_wrapped_models():
+    class Pipeline:
+        model = TorchLikeModel(2)
+
+    assert _estimate_size_mb((TorchLikeModel(1), {"language": "en"})) == 1.0
+    assert _estimate_size_mb(Pipeline()) == 2.0
+    assert _estimate_size_mb(object()) == 0.0
+
+
+def test_failed_load_is_not_cached():
+    registry = ModelRegistry()
+
+    def broken():
+        raise OSError("download failed")
+
+    with pytest.raises(OSError):
+        registry.acquire(key("a"), broken)
+    assert registry._entries == {}
+    assert registry.acquire(key("a"), lambda: "model") == "model"
+
+
+def test_each_model_has_its_own_inference_lock():
+    registry = ModelRegistry()
+    registry.acquire(key("a"), object)
+    registry.acquire(key("b"), object)
+
+    assert registry.inference_lock(key("a")) is registry.inference_lock(key("a"))
+    with registry.inference_lock(key("a")):
+        assert registry.inference_lock(key("b")).acquire(blocking=False)
+        registry.inference_lock(key("b")).release()
@@ -0,0 +1,24 @@
+from benchmarks import fakes
+from src import pipeline
+from src.audio_buffer import AudioBuffer
+from src.model_registry import ModelRegistry
+
+
+def test_analytics_get_the_unrounded_duration_in_seconds(fake_whisperx, monkeypatch):
+    durations = []
+    analytics = pipeline.conversation_analytics
+
+    def recording_analytics(word_segments, audio_duration=None, **kwargs):
+        durations.append(audio_duration)
+        return analytics(word_segments, audio_duration=audio_duration, **kwargs)
+
+    monkeypatch.setattr(pipeline, "conversation_analytics", recording_analytics)
+    monkeypatch.setattr(pipeline, "summarise_conversation",
+                        lambda groq_api_key, speaker_texts, conversation: {"Total Summary": "summary"})
+    seconds = 75.3
+    audio = AudioBuffer(fakes.synthetic_audio(76)[:int(seconds * fakes.SAMPLE_RATE)])
+
+    result = pipeline.run_pipeline(None, None, None, audio_buffer=audio, registry=ModelRegistry(), model_name="tiny")
+
+    assert durations == [seconds]
+    assert result["audio_duration"] == 1.25
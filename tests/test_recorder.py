@@ -0,0 +1,93 @@
+import os
+import threading
+import numpy as np
+import pytest
+from src.recorder import SegmentRecorder
+
+
+class _RawFile:
+    def __init__(self, name):
+        self.name = name
+        self._blocks = []
+
+    def write(self, block):
+        self._blocks.append(np.array(block, dtype=np.int16))
+
+    def close(self):
+        np.concatenate(self._blocks).tofile(self.name)
+
+
+class RawRecorder(SegmentRecorder):
+    """Writes raw int16 segments, so the ring and segmentation logic runs without soundfile."""
+
+    def _open_segment(self):
+        self._file = _RawFile(os.path.join(self.directory, f"segment_{len(self.segments):05d}.raw"))
+        self._file_start = self._position
+
+
+def start_writer(recorder):
+    # start() also opens a sounddevice stream; the tests feed _callback themselves.
+    recorder._writer = threading.Thread(target=recorder._write_loop, daemon=True)
+    recorder._writer.start()
+
+
+def feed(recorder, samples, block=4):
+    for i in range(0, len(samples), block):
+        recorder._callback(samples[i:i + block].reshape(-1, 1), None, None, None)
+
+
+def read_raw(segments):
+    return np.concatenate([np.fromfile(segment.path, dtype=np.int16) for segment in segments])
+
+
+def test_recording_is_split_into_segments_in_order(tmp_path):
+    recorder = RawRecorder(str(tmp_path / "take"), sample_rate=10, segment_seconds=1, ring_seconds=10,
+                           on_segment=lambda segment: segment.index)
+    start_writer(recorder)
+    feed(recorder, np.arange(25, dtype=np.int16))
+    segments = recorder.stop()
+
+    assert [(segment.start, segment.end) for segment in segments] == [(0.0, 1.0), (1.0, 2.0), (2.0, 2.5)]
+    assert read_raw(segments).tolist() == list(range(25))
+    assert recorder.results() == [0, 1, 2]
+    assert recorder.duration == 2.5 and recorder.overflowed == 0
+    recorder.close()
+
+
+def test_writer_a_full_ring_behind_counts_lost_samples(tmp_path):
+    recorder = RawRecorder(str(tmp_path / "take"), sample_rate=10, segment_seconds=1, ring_seconds=1)
+    feed(recorder, np.arange(25, dtype=np.int16))
+    start_writer(recorder)
+    segments = recorder.stop()
+
+    assert recorder.overflowed == 15
+    assert read_raw(segments).tolist() == list(range(15, 25))
+    assert recorder.duration == 2.5
+
+
+def test_cleanup_removes_the_segments_and_stops_the_workers(tmp_path):
+    release = threading.Event()
+    recorder = RawRecorder(str(tmp_path / "take"), sample_rate=10, segment_seconds=1,
+                           on_segment=lambda segment: release.wait(5))
+    start_writer(recorder)
+    feed(recorder, np.arange(30, dtype=np.int16))
+    recorder.stop()
+    release.set()
+    recorder.cleanup()
+
+    assert not os.path.exists(recorder.directory)
+    with pytest.raises(RuntimeError):
+        recorder._executor.submit(print)
+
+
+def test_segments_are_flac_files(tmp_path):
+    pytest.importorskip("soundfile")
+
+    recorder = SegmentRecorder(str(tmp_path / "take"), sample_rate=16000, segment_seconds=0.5)
+    start_writer(recorder)
+    samples = (np.sin(np.arange(12000) / 10) * 10000).astype(np.int16)
+    feed(recorder, samples, block=1600)
+    segments = recorder.stop()
+
+    assert len(segments) == 2 and all(segment.path.endswith(".flac") for segment in segments)
+    assert recorder.read().tolist() == samples.tolist()
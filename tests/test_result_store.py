@@ -0,0 +1,12 @@
+import io
+from src import result_store
+from src.result_store import result_key
+
+
+def test_file_is_hashed_in_chunks_to_the_same_key(monkeypatch):
+    monkeypatch.setattr(result_store, "HASH_CHUNK_BYTES", 7)
+    audio = bytes(range(256)) * 10
+    params = {"model": "small", "batch_size": 4}
+
+    assert result_key(io.BytesIO(audio), **params) == result_key(audio, **params)
+    assert result_key(io.BytesIO(audio), **params) != result_key(audio, model="large-v2", batch_size=4)
@@ -0,0 +1,198 @@
+import os
+import pytest
+
+boto3 = pytest.importorskip("boto3")
+moto = pytest.importorskip("moto")
+
+from botocore.exceptions import ClientError, EndpointConnectionError  # noqa: E402
+from src.s3_syncer import S3Sync, is_transient  # noqa: E402
+
+
+def _client_error(code):
+    return ClientError({"Error": {"Code": code, "Message": code}}, "PutObject")
+
+
+def _upload_failed(code):
+    """An S3UploadFailedError raised the way boto3's upload_file raises it."""
+    from boto3.exceptions import S3UploadFailedError
+
+    try:
+        try:
+            raise _client_error(code)
+        except ClientError as e:
+            raise S3UploadFailedError(f"Failed to upload: {e}")
+    except S3UploadFailedError as e:
+        return e
+
+
+@pytest.mark.parametrize("error, expected", [
+    (_client_error("SlowDown"), True),
+    (_client_error("503"), True),
+    (_client_error("AccessDenied"), False),
+    (_client_error("NoSuchBucket"), False),
+    (EndpointConnectionError(endpoint_url="http://s3"), True),
+    (ValueError("bad"), False),
+])
+def test_is_transient(error, expected):
+    assert is_transient(error) is expected
+
+
+@pytest.mark.parametrize("code, expected", [
+    ("SlowDown", True), ("InternalError", True), ("NoSuchBucket", False), ("AccessDenied", False),
+])
+def test_upload_failures_are_classified_by_the_wrapped_code(code, expected):
+    assert is_transient(_upload_failed(code)) is expected
+
+
+@pytest.fixture
+def s3(monkeypatch):
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    with moto.mock_aws():
+        client = boto3.client("s3", region_name="us-east-1")
+        client.create_bucket(Bucket="bucket")
+        yield client
+
+
+def _folder(tmp_path):
+    folder = tmp_path / "up"
+    (folder / "sub").mkdir(parents=True)
+    for i in range(3):
+        (folder / "sub" / f"f{i}.txt").write_bytes(os.urandom(100 + i))
+    return str(folder)
+
+
+def test_missing_bucket_is_not_retried(s3, tmp_path):
+    calls = []
+    real_upload = s3.upload_file
+
+    def upload_file(*args, **kwargs):
+        calls.append(args)
+        return real_upload(*args, **kwargs)
+
+    s3.upload_file = upload_file
+    report = S3Sync(s3_client=s3, retry_backoff=0).sync_folder_to_s3(_folder(tmp_path), "missing-bucket")
+
+    assert len(report.failed) == 3
+    assert len(calls) == 3
+
+
+def test_transient_failures_are_retried(s3, tmp_path):
+    attempts = []
+    real_upload = s3.upload_file
+
+    def flaky(*args, **kwargs):
+        attempts.append(args)
+        if len(attempts) % 2:
+            raise _client_error("SlowDown")
+        return real_upload(*args, **kwargs)
+
+    s3.upload_file = flaky
+    report = S3Sync(s3_client=s3, retry_backoff=0).sync_folder_to_s3(_folder(tmp_path), "bucket")
+
+    assert report.transferred == 3 and not report.failed
+    assert len(attempts) == 6
+
+
+def test_uploaded_etags_match_so_the_download_skips_everything(s3, tmp_path):
+    folder = _folder(tmp_path)
+    sync = S3Sync(s3_client=s3, retry_backoff=0)
+    head_object = s3.head_object
+    s3.head_object = lambda **kwargs: pytest.fail("upload sync sent a HEAD request")
+    assert sync.sync_folder_to_s3(folder, "bucket", prefix="p").transferred == 3
+    s3.head_object = head_object
+
+    report = sync.sync_folder_from_s3(folder, "bucket", prefix="p")
+    assert report.transferred == 0 and report.skipped == 3
+
+
+def test_client_does_not_retry_underneath(monkeypatch):
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    client = S3Sync(AWS_REGION="us-east-1").s3_client
+    assert client.meta.config.retries["total_max_attempts"] == 1
+
+
+def _paged(client, page_size):
+    """Make every list_objects_v2 listing come back in pages of page_size keys."""
+    pages = []
+    get_paginator = client.get_paginator
+
+    def paginated(name):
+        paginator = get_paginator(name)
+        paginate = paginator.paginate
+
+        def paginate_in_pages(**kwargs):
+            for page in paginate(PaginationConfig={"PageSize": page_size}, **kwargs):
+                pages.append(page.get("KeyCount", 0))
+                yield page
+
+        paginator.paginate = paginate_in_pages
+        return paginator
+
+    client.get_paginator = paginated
+    return pages
+
+
+def _recorded_gets(client):
+    gets = []
+    get_object = client.get_object
+
+    def recorded(**kwargs):
+        gets.append(kwargs)
+        return get_object(**kwargs)
+
+    client.get_object = recorded
+    return gets
+
+
+def test_download_reads_every_page_of_the_listing(s3, tmp_path):
+    for i in range(10):
+        s3.put_object(Bucket="bucket", Key=f"p/call{i:02d}.json", Body=f"call {i}".encode())
+    s3.put_object(Bucket="bucket", Key="other/skip.json", Body=b"not under the prefix")
+    pages = _paged(s3, page_size=4)
+
+    folder = tmp_path / "down"
+    report = S3Sync(s3_client=s3, retry_backoff=0).sync_folder_from_s3(str(folder), "bucket", prefix="p")
+
+    assert pages == [4, 4, 2]
+    assert report.transferred == 10 and not report.failed
+    assert sorted(os.listdir(folder)) == sorted([f"call{i:02d}.json" for i in range(10)] + [".s3sync-manifest.json"])
+    assert (folder / "call07.json").read_bytes() == b"call 7"
+
+
+def test_unchanged_etags_are_skipped_and_changed_ones_downloaded(s3, tmp_path):
+    for i in range(3):
+        s3.put_object(Bucket="bucket", Key=f"f{i}.txt", Body=os.urandom(200))
+    folder = tmp_path / "down"
+    sync = S3Sync(s3_client=s3, retry_backoff=0)
+    assert sync.sync_folder_from_s3(str(folder), "bucket").transferred == 3
+
+    changed = os.urandom(200)  # same size, so only the ETag tells it apart
+    s3.put_object(Bucket="bucket", Key="f1.txt", Body=changed)
+    gets = _recorded_gets(s3)
+    report = sync.sync_folder_from_s3(str(folder), "bucket")
+
+    assert report.transferred == 1 and report.skipped == 2
+    assert [get["Key"] for get in gets] == ["f1.txt"]
+    assert (folder / "f1.txt").read_bytes() == changed
+
+    # Without a manifest the local copies are recognised by their computed ETag.
+    os.remove(folder / ".s3sync-manifest.json")
+    assert sync.sync_folder_from_s3(str(folder), "bucket").skipped == 3
+
+
+def test_large_objects_are_fetched_in_ranged_gets(s3, tmp_path):
+    body = os.urandom(1000)
+    s3.put_object(Bucket="bucket", Key="big.bin", Body=body)
+    gets = _recorded_gets(s3)
+
+    folder = tmp_path / "down"
+    sync = S3Sync(s3_client=s3, retry_backoff=0, range_threshold=500, range_size=300)
+    assert sync.sync_folder_from_s3(str(folder), "bucket").transferred == 1
+
+    assert [get["Range"] for get in gets] == ["bytes=0-299", "bytes=300-599", "bytes=600-899", "bytes=900-999"]
+    assert all(get["IfMatch"].strip('"') == s3.head_object(Bucket="bucket", Key="big.bin")["ETag"].strip('"')
+               for get in gets)
+    assert (folder / "big.bin").read_bytes() == body
+    assert not [name for name in os.listdir(folder) if name.endswith(".part")]
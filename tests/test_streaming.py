@@ -0,0 +1,75 @@
+import asyncio
+import numpy as np
+import pytest
+from src.streaming import EventQueue, FakeBackend, PcmRingBuffer, StreamingBackend, StreamingHub
+
+
+def event(kind, text):
+    return {"type": kind, "text": text}
+
+
+def drain(queue):
+    return [queue._items.popleft() for _ in range(queue.qsize())]
+
+
+def test_backend_without_open_cannot_be_created():
+    class Incomplete(StreamingBackend):
+        pass
+
+    with pytest.raises(TypeError):
+        Incomplete()
+
+
+def test_waiting_partial_is_replaced_by_the_newer_one():
+    queue = EventQueue(maxsize=8)
+    queue.put_nowait(event("partial", "a"))
+    queue.put_nowait(event("partial", "a b"))
+    queue.put_nowait(event("final", "a b c"))
+    queue.put_nowait(event("partial", "d"))
+
+    assert [item["text"] for item in drain(queue)] == ["a b", "a b c", "d"]
+    assert queue.coalesced == 1 and queue.dropped == 0
+
+
+def test_full_queue_drops_partials_before_finals_and_keeps_the_end():
+    queue = EventQueue(maxsize=3)
+    queue.put_nowait(event("final", "one"))
+    queue.put_nowait(event("partial", "two"))
+    queue.put_nowait(event("final", "two"))
+    queue.put_nowait(event("final", "three"))
+    queue.put_nowait(event("final", "four"))
+    queue.put_nowait(None)
+
+    items = drain(queue)
+    assert [item["text"] for item in items[:-1]] == ["two", "three", "four"]
+    assert items[-1] is None and queue.dropped == 2
+
+
+def test_slow_client_session_stays_bounded():
+    async def run():
+        hub = StreamingHub(FakeBackend(partial_seconds=0.1, final_seconds=1.0), max_events=4)
+        session = await hub.open_session()
+        for _ in range(50):
+            await session.feed(b"\x00\x00" * 1600)
+            assert session.events.qsize() <= 4
+        summary = await hub.close_session(session)
+        events = []
+        while (item := await session.events.get()) is not None:
+            events.append(item)
+        return summary, events
+
+    summary, events = asyncio.run(run())
+    assert summary["events_dropped"] > 0 and summary["partials_coalesced"] > 0
+    assert len(events) == 4 and all(item["type"] == "final" for item in events)
+    assert events[-1]["end"] == 5.0
+
+
+def test_frame_longer_than_the_ring_keeps_absolute_positions():
+    ring = PcmRingBuffer(max_seconds=1, sample_rate=10)
+    ring.write(np.arange(3, dtype=np.int16))
+    ring.write(np.arange(3, 28, dtype=np.int16))
+
+    assert ring.total == 28 and ring.start == 18
+    assert ring.read(0).tolist() == list(range(18, 28))
+    ring.write(np.array([28, 29], dtype=np.int16))
+    assert ring.read(25).tolist() == [25, 26, 27, 28, 29]
@@ -0,0 +1,159 @@
+import asyncio
+import json
+import threading
+import types
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+from src import summarization
+
+SPEAKER_TEXTS = {"Speaker 1": ["Hello there."], "Speaker 2": ["Hi, how are you?"]}
+CONVERSATION = ["Speaker 1: Hello there.", "Speaker 2: Hi, how are you?"]
+
+
+class LoopBoundLLM:
+    """Fails like an httpx async pool does when it is used from a second event loop."""
+
+    def __init__(self):
+        self.loop = None
+
+    async def ainvoke(self, messages):
+        loop = asyncio.get_running_loop()
+        if self.loop is None:
+            self.loop = loop
+        if loop is not self.loop:
+            raise RuntimeError("Event is bound to a different event loop")
+        await asyncio.sleep(0.01)
+        return types.SimpleNamespace(content="Summary: ok")
+
+
+def _run_concurrently(base_url=None, calls=2, threads=4):
+    """summarise_conversation() from several threads at once, as API workers and Streamlit sessions call it."""
+    results, errors = [], []
+
+    def worker():
+        for _ in range(calls):
+            try:
+                results.append(summarization.summarise_conversation(
+                    "key", SPEAKER_TEXTS, CONVERSATION, use_cache=False, base_url=base_url))
+            except Exception as e:
+                errors.append(e)
+
+    pool = [threading.Thread(target=worker) for _ in range(threads)]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    return results, errors
+
+
+def test_concurrent_callers_share_one_loop_bound_client(monkeypatch):
+    created = []
+
+    def new_llm(*args):
+        created.append(LoopBoundLLM())
+        return created[-1]
+
+    monkeypatch.setattr(summarization, "_new_llm", new_llm)
+    results, errors = _run_concurrently()
+
+    assert errors == []
+    assert len(results) == 8
+    assert all(result[summarization.TOTAL_SUMMARY_KEY] == "ok" for result in results)
+    assert len(created) == 1
+
+
+def test_get_llm_is_per_event_loop(monkeypatch):
+    monkeypatch.setattr(summarization, "_new_llm", lambda *args: object())
+
+    async def current():
+        return summarization.get_llm("key")
+
+    first, second = asyncio.run(current()), asyncio.run(current())
+    assert first is not second
+    assert summarization.get_llm("key") is summarization.get_llm("key")
+
+
+class _FakeGroq(BaseHTTPRequestHandler):
+    def do_POST(self):
+        self.rfile.read(int(self.headers["Content-Length"]))
+        body = json.dumps({
+            "id": "chatcmpl-1", "object": "chat.completion", "created": 0, "model": "fake",
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": "Summary: ok"}}],
+            "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2},
+        }).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def test_concurrent_callers_against_a_local_server():
+    pytest.importorskip("langchain_groq")
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _FakeGroq)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        results, errors = _run_concurrently(base_url=f"http://127.0.0.1:{server.server_address[1]}")
+    finally:
+        server.shutdown()
+
+    assert errors == []
+    assert len(results) == 8
+
+
+class RecordingLLM:
+    """Answers every request with a numbered summary and keeps the prompts it was sent."""
+
+    def __init__(self, words=1):
+        self.prompts = []
+        self.words = words
+
+    async def ainvoke(self, messages):
+        self.prompts.append(messages[1]["content"])
+        n = len(self.prompts)
+        return types.SimpleNamespace(content="Summary: " + " ".join([f"s{n}"] * self.words))
+
+
+def _long_transcript(turns, words):
+    return [f"Speaker {i % 2 + 1}: " + " ".join(f"t{i}w{j}" for j in range(words)) for i in range(turns)]
+
+
+def test_long_transcript_is_mapped_over_chunks_then_reduced(monkeypatch):
+    llm = RecordingLLM()
+    monkeypatch.setattr(summarization, "get_llm", lambda *args: llm)
+    transcript = _long_transcript(turns=6, words=50)
+
+    summary = asyncio.run(summarization.asummarise_long_transcript(
+        "key", transcript, use_cache=False, max_chunk_tokens=150))
+
+    *mapped, reduced = llm.prompts
+    assert len(mapped) == 3
+    assert all(prompt.startswith(summarization.USER_PROMPT.split("{")[0]) for prompt in mapped)
+    assert all(turn in mapped[i // 2] for i, turn in enumerate(transcript))
+    assert reduced.startswith(summarization.REDUCE_PROMPT.split("{")[0])
+    assert "s1\ns2\ns3" in reduced
+    assert summary == "s4"
+
+
+def test_partials_too_long_to_pack_are_reduced_pairwise(monkeypatch):
+    llm = RecordingLLM(words=120)
+    monkeypatch.setattr(summarization, "get_llm", lambda *args: llm)
+
+    asyncio.run(summarization.asummarise_long_transcript(
+        "key", _long_transcript(turns=4, words=100), use_cache=False, max_chunk_tokens=150))
+
+    reduce_prompts = [prompt for prompt in llm.prompts if prompt.startswith(summarization.REDUCE_PROMPT.split("{")[0])]
+    # Four map calls, then 4 -> 2 -> 1 partials.
+    assert len(llm.prompts) == 7 and len(reduce_prompts) == 3
+
+
+def test_short_transcript_is_one_request(monkeypatch):
+    llm = RecordingLLM()
+    monkeypatch.setattr(summarization, "get_llm", lambda *args: llm)
+
+    asyncio.run(summarization.asummarise_long_transcript("key", CONVERSATION, use_cache=False))
+    assert len(llm.prompts) == 1
@@ -0,0 +1,53 @@
+from types import SimpleNamespace
+import pytest
+from src import summary_cache
+from src.summary_cache import SummaryCache, make_cache_key
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(summary_cache, "time", SimpleNamespace(time=clock.time))
+    return clock
+
+
+def test_entries_expire_after_the_ttl(clock):
+    cache = SummaryCache(":memory:", ttl_seconds=60)
+    cache.set("a", "summary")
+    clock.now += 59
+    assert cache.get("a") == "summary"
+    clock.now += 2
+    assert cache.get("a") is None
+    assert cache.stats() == {"hits": 1, "misses": 1, "hit_rate": 0.5, "entries": 0}
+
+
+def test_least_recently_used_entry_is_evicted(clock):
+    cache = SummaryCache(":memory:", ttl_seconds=None, max_entries=2)
+    for key in ("a", "b"):
+        cache.set(key, key.upper())
+        clock.now += 1
+    assert cache.get("a") == "A"
+    clock.now += 1
+    cache.set("c", "C")
+
+    assert cache.get("b") is None
+    assert (cache.get("a"), cache.get("c")) == ("A", "C")
+
+
+def test_cache_persists_across_connections(tmp_path):
+    path = str(tmp_path / "cache" / "summaries.sqlite")
+    key = make_cache_key("model", "system", "user", "Speaker 1: hello")
+    cache = SummaryCache(path)
+    cache.set(key, "greeting")
+    cache.close()
+
+    assert SummaryCache(path).get(key) == "greeting"
+    assert key != make_cache_key("model", "system", "user", "Speaker 1: hello!")
@@ -0,0 +1,64 @@
+import threading
+import tracemalloc
+from src.tracing import JobTrace, StageMetrics
+
+
+def test_span_reports_rss_growth_and_the_process_peak():
+    trace = JobTrace("job")
+    with trace.span("decode"):
+        block = bytearray(32 * 1024 * 1024)
+        block[::4096] = b"x" * len(block[::4096])
+    [span] = trace.report()["stages"]
+
+    assert span["rss_delta_bytes"] >= 16 * 1024 * 1024
+    assert span["process_peak_rss_bytes"] >= span["rss_delta_bytes"]
+    assert span["peak_traced_bytes"] is None
+
+
+def test_traced_peak_of_one_job_is_exclusive_and_tracing_stops():
+    trace = JobTrace("job", trace_memory=True)
+    with trace.span("outer"):
+        with trace.span("inner"):
+            data = [0] * 100_000
+        del data
+    assert not tracemalloc.is_tracing()
+    spans = {span["stage"]: span for span in trace.report()["stages"]}
+    assert spans["inner"]["peak_traced_bytes"] >= 800_000
+    assert spans["outer"]["peak_traced_shared"] is False
+
+
+def test_overlapping_jobs_are_flagged_and_kept_out_of_the_histogram():
+    first, second = JobTrace("a", trace_memory=True), JobTrace("b", trace_memory=True)
+    entered, release = threading.Event(), threading.Event()
+
+    def run_first():
+        with first.span("transcribe"):
+            entered.set()
+            release.wait()
+
+    thread = threading.Thread(target=run_first)
+    thread.start()
+    entered.wait()
+    with second.span("transcribe"):
+        pass
+    release.set()
+    thread.join()
+
+    assert not tracemalloc.is_tracing()
+    assert first.report()["stages"][0]["peak_traced_shared"] is True
+    assert second.report()["stages"][0]["peak_traced_shared"] is True
+    metrics = StageMetrics()
+    metrics.observe(first.report())
+    assert "pipeline_stage_peak_traced_bytes_count" not in metrics.render()
+
+
+def test_metrics_render_process_peak_as_a_gauge():
+    trace = JobTrace("job", trace_memory=True)
+    with trace.span("align"):
+        pass
+    metrics = StageMetrics()
+    metrics.observe(trace.report())
+    text = metrics.render()
+
+    assert 'pipeline_stage_peak_traced_bytes_count{stage="align"} 1' in text
+    assert "# TYPE pipeline_process_peak_rss_bytes gauge" in text
@@ -0,0 +1,52 @@
+import json
+import numpy as np
+import pytest
+from src.transcript_store import ALIGNMENT, load_columnar, save_columnar
+
+RESULT = {
+    "language": "en",
+    "segments": [
+        {"start": 0.0, "end": 1.5, "speaker": "SPEAKER_00", "text": " Héllo there",
+         "words": [{"word": "Héllo", "start": 0.0, "end": 0.5, "score": 0.9, "speaker": "SPEAKER_00"},
+                   {"word": "there", "start": 0.6, "end": 1.5, "score": 0.75, "speaker": "SPEAKER_00"}]},
+        {"start": 1.5, "end": 3.25, "text": " 250 dollars",
+         "words": [{"word": "250"},
+                   {"word": "dollars", "start": 2.0, "end": 3.25, "score": 0.5, "speaker": "SPEAKER_01"}]},
+        {"start": 3.5, "end": 4.0, "speaker": "SPEAKER_01", "text": "", "words": []},
+    ],
+}
+
+
+def test_round_trip_rebuilds_the_result(tmp_path):
+    path = save_columnar(RESULT, str(tmp_path / "result.ctr"))
+    transcript = load_columnar(path)
+    rebuilt = transcript.to_dict()
+
+    assert rebuilt["segments"] == RESULT["segments"]
+    assert rebuilt["word_segments"] == [word for segment in RESULT["segments"] for word in segment["words"]]
+    assert transcript.language == "en" and transcript.speakers == ["SPEAKER_00", "SPEAKER_01"]
+    assert list(transcript.segments()) == [("SPEAKER_00", " Héllo there"), (None, " 250 dollars"),
+                                           ("SPEAKER_01", "")]
+
+
+def test_columns_are_aligned_views_of_the_mapping(tmp_path):
+    transcript = load_columnar(save_columnar(RESULT, str(tmp_path / "result.ctr")))
+
+    assert transcript.n_words == 4 and transcript.word(0) == "Héllo"
+    assert np.isnan(transcript.word_start[2]) and transcript.word_speaker[2] == -1
+    for column in (transcript.word_start, transcript.segment_word_offsets, transcript.word_text):
+        assert column.ctypes.data % ALIGNMENT == 0
+        assert not column.flags.writeable
+
+
+def test_exported_json_matches_the_result(tmp_path):
+    transcript = load_columnar(save_columnar(RESULT, str(tmp_path / "result.ctr")))
+    with open(transcript.export_json(str(tmp_path / "result.json"))) as file:
+        assert json.load(file)["segments"] == RESULT["segments"]
+
+
+def test_other_files_are_rejected(tmp_path):
+    path = tmp_path / "result.json"
+    path.write_text("{}")
+    with pytest.raises(ValueError, match="not a columnar transcript"):
+        load_columnar(str(path))
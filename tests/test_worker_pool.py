@@ -0,0 +1,108 @@
+import os
+import time
+import pytest
+from src.worker_pool import PoolFullError, WorkerCrashedError, WorkerPool
+
+
+def job(payload, progress):
+    if payload == "crash":
+        os._exit(1)
+    if payload == "fail":
+        raise ValueError("bad input")
+    if payload == "hang":
+        time.sleep(60)
+    progress(f"working on {payload}")
+    return {"payload": payload, "pid": os.getpid(), "parent": os.getppid()}
+
+
+@pytest.fixture
+def pool():
+    pool = WorkerPool(job, workers=2, max_jobs_per_worker=3, heartbeat_interval=0.1, heartbeat_timeout=5).start()
+    yield pool
+    pool.stop(timeout=5)
+
+
+def _wait_for(condition, timeout=10):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.05)
+
+
+def test_jobs_run_in_workers_forked_by_the_fork_server(pool):
+    messages = []
+    result = pool.submit("a", progress=messages.append).result(timeout=10)
+
+    assert result["payload"] == "a"
+    assert result["parent"] not in (os.getpid(), result["pid"])
+    assert result["parent"] == pool._fork_server.pid
+    _wait_for(lambda: messages == ["working on a"])
+
+
+def test_failed_job_raises_and_keeps_the_worker(pool):
+    with pytest.raises(RuntimeError, match="ValueError: bad input"):
+        pool.submit("fail").result(timeout=10)
+    assert pool.crashed == 0
+
+
+def test_crashed_worker_fails_its_job_and_is_replaced(pool):
+    with pytest.raises(WorkerCrashedError):
+        pool.submit("crash").result(timeout=10)
+    assert pool.crashed == 1
+
+    _wait_for(lambda: len(pool.health()["workers"]) == 2)
+    results = [pool.submit(str(i)).result(timeout=10) for i in range(4)]
+    assert [result["payload"] for result in results] == ["0", "1", "2", "3"]
+    assert all(result["parent"] == pool._fork_server.pid for result in results)
+
+
+def test_workers_are_recycled_after_max_jobs(pool):
+    pids = {pool.submit(str(i)).result(timeout=10)["pid"] for i in range(10)}
+
+    assert len(pids) > 2
+    _wait_for(lambda: pool.recycled >= 2)
+    assert pool.crashed == 0
+
+
+def test_events_from_replaced_workers_are_ignored(pool):
+    pool._handle_event("heartbeat", 999, None, None)
+    pool._handle_event("done", 999, 0, None)
+    pool.submit("a").result(timeout=10)
+
+    with pool._lock:
+        assert 999 not in pool._heartbeats and 999 not in pool._current_jobs
+
+
+def test_every_queued_job_resolves_when_workers_crash(pool):
+    futures = [pool.submit("crash" if i % 3 == 0 else str(i)) for i in range(8)]
+
+    outcomes = []
+    for future in futures:
+        try:
+            outcomes.append(future.result(timeout=20)["payload"])
+        except WorkerCrashedError:
+            outcomes.append("crashed")
+    assert outcomes == ["crashed", "1", "2", "crashed", "4", "5", "crashed", "7"]
+    assert pool.crashed == 3
+
+
+def test_waiting_jobs_are_bounded():
+    pool = WorkerPool(job, workers=1, max_queue=1, heartbeat_interval=0.1).start()
+    try:
+        running = pool.submit("hang")
+        _wait_for(lambda: pool.health()["waiting_jobs"] == 0)
+        pool.submit("a")
+        with pytest.raises(PoolFullError):
+            pool.submit("b")
+    finally:
+        pool.stop(timeout=1)
+
+
+def test_job_past_its_timeout_is_terminated():
+    pool = WorkerPool(job, workers=1, heartbeat_interval=0.1, job_timeout=0.5).start()
+    try:
+        with pytest.raises(TimeoutError):
+            pool.submit("hang").result(timeout=10)
+        assert pool.submit("a").result(timeout=10)["payload"] == "a"
+    finally:
+        pool.stop(timeout=5)
@@ -0,0 +1,34 @@
+import os
+import pytest
+from src.workspace import JobWorkspace
+
+
+def test_workspace_is_removed_when_the_job_fails(tmp_path):
+    with pytest.raises(ValueError):
+        with JobWorkspace(root=str(tmp_path)) as workspace:
+            workspace.write_bytes("upload.wav", b"RIFF")
+            workspace.path("exports", "part.wav")
+            raise ValueError("decode failed")
+
+    assert not os.path.exists(workspace.directory)
+    assert os.listdir(tmp_path) == []
+
+
+def test_kept_workspace_survives_a_failure(tmp_path):
+    with pytest.raises(ValueError):
+        with JobWorkspace(root=str(tmp_path), keep=True) as workspace:
+            path = workspace.write_bytes("upload.wav", b"RIFF")
+            raise ValueError("decode failed")
+
+    assert os.path.exists(path)
+
+
+def test_concurrent_jobs_get_separate_directories(tmp_path):
+    first, second = JobWorkspace(root=str(tmp_path), job_id="same"), JobWorkspace(root=str(tmp_path), job_id="same")
+
+    assert first.directory != second.directory
+    first.cleanup()
+    assert os.path.isdir(second.directory)
+    # Error paths may clean up a workspace that a finally block cleans up again.
+    first.cleanup()
+    second.cleanup()